@@ -1,33 +1,40 @@
 from fastapi import HTTPException, Header, Depends, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-import httpx, os
+import hashlib, logging, time
+from collections import OrderedDict
 from jose import jwt, JWTError
-import json
+from .config import settings
 
 security = HTTPBearer()
+logger = logging.getLogger(__name__)
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
+# Required settings are validated once, by Settings in config.py
+SUPABASE_URL = settings.SUPABASE_URL
+SUPABASE_SERVICE_ROLE_KEY = settings.SUPABASE_SERVICE_ROLE_KEY
+SUPABASE_JWT_SECRET = settings.SUPABASE_JWT_SECRET
 SUPABASE_PROJECT_ID = SUPABASE_URL.split("//")[1].split(".")[0] if SUPABASE_URL else None
 
-if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY or not SUPABASE_JWT_SECRET:
-    raise RuntimeError("Supabase credentials missing in .env")
-
 # ---- Signup / Login (unchanged) ----
-from supabase import create_client, Client
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+_supabase = None
+
+def get_supabase():
+    """supabase-py Client, created on first use to keep it off the cold-start path."""
+    global _supabase
+    if _supabase is None:
+        from supabase import create_client
+        _supabase = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+    return _supabase
 
 def signup(email: str, password: str):
     try:
-        res = supabase.auth.sign_up({"email": email, "password": password})
+        res = get_supabase().auth.sign_up({"email": email, "password": password})
         return {"message": "Signup successful. Verify your email.", "user": res.user}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 def login(email: str, password: str):
     try:
-        res = supabase.auth.sign_in_with_password({"email": email, "password": password})
+        res = get_supabase().auth.sign_in_with_password({"email": email, "password": password})
         return {
             "access_token": res.session.access_token,
             "refresh_token": res.session.refresh_token,
@@ -37,42 +44,68 @@ def login(email: str, password: str):
         raise HTTPException(status_code=400, detail=str(e))
 
 # ---- Verify Token (using HS256 + JWT_SECRET) ----
+ISSUER = f"https://{SUPABASE_PROJECT_ID}.supabase.co/auth/v1"
+
+# sha256(token) -> (user_id, expires_at), oldest first
+_token_cache: "OrderedDict[bytes, tuple[str, float]]" = OrderedDict()
+
+def _cache_get(key: bytes) -> str | None:
+    entry = _token_cache.get(key)
+    if entry is None:
+        return None
+    user_id, expires_at = entry
+    if expires_at <= time.time():
+        del _token_cache[key]
+        return None
+    _token_cache.move_to_end(key)
+    return user_id
+
+def _cache_put(key: bytes, user_id: str, exp: float | None):
+    expires_at = time.time() + settings.AUTH_CACHE_TTL
+    if exp is not None:
+        expires_at = min(expires_at, float(exp))
+    _token_cache[key] = (user_id, expires_at)
+    _token_cache.move_to_end(key)
+    while len(_token_cache) > settings.AUTH_CACHE_SIZE:
+        _token_cache.popitem(last=False)
+
 async def verify_token(
     credentials: HTTPAuthorizationCredentials = Depends(security),
 ) -> str:
-    token = credentials.credentials
-    
-    print(f"Verifying token with HS256...")  # Debug log
-    
+    return authenticate(credentials.credentials)
+
+def token_expiry(token: str) -> float | None:
+    """`exp` claim of a token that already passed authenticate()."""
+    exp = jwt.get_unverified_claims(token).get("exp")
+    return float(exp) if exp is not None else None
+
+def authenticate(token: str) -> str:
+    """User id for a bearer token. Raises 401 if the token is not valid."""
+    key = hashlib.sha256(token.encode()).digest()
+
+    user_id = _cache_get(key)
+    if user_id is not None:
+        return user_id
+
     try:
-        # Decode and verify the token using HS256 + JWT_SECRET
+        # Signature and exp are enforced; aud/iss mismatches have always been
+        # accepted, so check them here instead of decoding a second time.
         payload = jwt.decode(
             token,
             SUPABASE_JWT_SECRET,
             algorithms=["HS256"],
-            audience="authenticated",
-            issuer=f"https://{SUPABASE_PROJECT_ID}.supabase.co/auth/v1"
+            options={"verify_aud": False, "verify_iss": False},
         )
-        
     except JWTError as e:
-        print(f"JWT Error with validation: {e}")  # Debug log
-        try:
-            # Try without audience/issuer validation
-            payload = jwt.decode(
-                token,
-                SUPABASE_JWT_SECRET,
-                algorithms=["HS256"],
-                options={"verify_aud": False, "verify_iss": False}
-            )
-            print("JWT decode without validation succeeded")  # Debug log
-        except JWTError as e2:
-            print(f"JWT Error without validation: {e2}")  # Debug log
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail=f"Invalid token: {e2}",
-            )
+        if settings.AUTH_LOG:
+            logger.info("token rejected", extra={"event": "auth.reject", "reason": str(e)})
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=f"Invalid token: {e}",
+        )
     except Exception as e:
-        print(f"Unexpected error: {e}")  # Debug log
+        if settings.AUTH_LOG:
+            logger.warning("token verification failed", extra={"event": "auth.error", "reason": str(e)})
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=f"Token verification failed: {e}",
@@ -82,5 +115,15 @@ async def verify_token(
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid token: no subject")
 
-    print(f"Token verified successfully for user: {user_id}")  # Debug log
-    return user_id
\ No newline at end of file
+    if settings.AUTH_LOG:
+        aud = payload.get("aud")
+        audiences = aud if isinstance(aud, list) else [aud]
+        logger.info("token verified", extra={
+            "event": "auth.verified",
+            "user_id": user_id,
+            "aud_ok": "authenticated" in audiences,
+            "iss_ok": payload.get("iss") == ISSUER,
+        })
+
+    _cache_put(key, user_id, payload.get("exp"))
+    return user_id
@@ -10,22 +10,151 @@ class Settings(BaseSettings):
     SUPABASE_SERVICE_ROLE_KEY: str
     SUPABASE_JWT_SECRET: str
 
+    # Supabase auth HTTP client (account operations)
+    SUPABASE_HTTP_TIMEOUT: float = 10.0  # seconds
+    SUPABASE_HTTP_MAX_CONNECTIONS: int = 20
+    SUPABASE_HTTP_MAX_CONCURRENT: int = 10
+
     # Database
     DATABASE_URL: str
+    DB_MAX_CONNECTIONS: int = 5  # budget shared by all workers; raise it with WEB_CONCURRENCY
+    DB_POOL_MIN_SIZE: int = 1
+
+    # Serving
+    WEB_CONCURRENCY: int = 1  # worker processes
+    STARTUP_WARMUP: bool = False  # pre-open DB, Gemini SDK and Supabase HTTP at startup
+    RATE_LIMIT_STORAGE_URI: str | None = None  # e.g. sqlite:///tmp/rl.db or redis://; see app/ratelimit.py
+    METRICS_TOKEN: str | None = None  # bearer token the /metrics scraper sends; unset disables /metrics
+    METRICS_SNAPSHOT_SECONDS: float = 5.0  # how often each worker publishes its metrics for /metrics
 
     # JWT
     JWT_SECRET: str | None = None
     JWT_ALG: str = "HS256"
 
+    # Verified-token cache
+    AUTH_CACHE_SIZE: int = 1024
+    AUTH_CACHE_TTL: int = 300  # upper bound for tokens without exp
+    AUTH_LOG: bool = False
+
+    # Chat context
+    CONTEXT_TOKEN_BUDGET: int = 4000
+    CONTEXT_MAX_MESSAGES: int = 100
+    SUMMARY_TIMEOUT: float = 30.0  # seconds for one summary fold call
+
+    # Hot history cache
+    HISTORY_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    HISTORY_CACHE_MAX_MESSAGES: int = 200
+
+    # Write-behind message persistence
+    MESSAGE_WRITE_BEHIND: bool = False
+    WRITE_BATCH_SIZE: int = 100
+    WRITE_FLUSH_MS: int = 50
+
+    # NDJSON export/import
+    EXPORT_PREFETCH: int = 500  # rows per cursor round trip
+    EXPORT_CHUNK_BYTES: int = 64 * 1024
+    TRANSFER_MAX_CONCURRENT: int = 2  # exports + imports per worker; each holds a pooled connection
+    IMPORT_BATCH_ROWS: int = 2000  # rows per COPY
+    IMPORT_MAX_BYTES: int = 256 * 1024 * 1024
+    IMPORT_MAX_LINE_BYTES: int = 1024 * 1024
+
+    # Analytics rollups
+    ANALYTICS_ENABLED: bool = True
+    ANALYTICS_FLUSH_SECONDS: float = 5.0
+    ANALYTICS_MAX_PENDING: int = 500  # conversations with unflushed deltas before an early flush
+
+    # Token usage accounting
+    USAGE_DAILY_TOKEN_QUOTA: int = 0  # prompt + completion tokens per user per UTC day; 0 disables
+    USAGE_FLUSH_SECONDS: float = 10.0
+    USAGE_MAX_USERS: int = 100_000  # daily totals kept in memory for the quota check
+
+    # LLM admission control
+    LLM_MAX_CONCURRENT: int = 8  # whole instance, split between workers
+    LLM_MAX_QUEUE: int = 32  # whole instance, split between workers
+    LLM_QUEUE_RETRY_AFTER: int = 5  # seconds
+    LLM_QUEUE_POSITION_INTERVAL: float = 1.0  # seconds between queue position events
+
+    # Resumable SSE
+    SSE_REPLAY_MAX_GENERATIONS: int = 256
+    SSE_REPLAY_TTL: int = 120  # seconds a finished reply stays replayable
+    SSE_RESUME_GRACE: int = 10  # seconds to wait for a reconnect before cancelling
+
+    # SSE framing
+    SSE_COALESCE_BYTES: int = 512
+    SSE_FLUSH_MS: int = 40
+    SSE_DISCONNECT_CHECK_MS: int = 1000
+    SSE_HEARTBEAT_SECONDS: float = 15.0
+
+    # WebSocket interview sessions
+    WS_AUTH_TIMEOUT: float = 10.0  # seconds to send the auth frame after connecting
+    WS_IDLE_TIMEOUT: float = 900.0  # seconds without a frame before the server closes
+    WS_TURN_RATE_LIMIT: str = "30/minute"  # per user, like POST /chat/stream
+
+    # End-of-interview evaluation
+    EVAL_ENABLED: bool = True
+    EVAL_WORKERS: int = 2
+    EVAL_MAX_ATTEMPTS: int = 3
+    EVAL_RETRY_BACKOFF: float = 30.0  # base seconds, doubled per attempt
+    EVAL_TIMEOUT: float = 60.0  # seconds for one scoring call
+    EVAL_MAX_MESSAGES: int = 200  # newest messages included in the transcript
+    EVAL_MIN_ANSWERS: int = 2  # fewer candidate answers are skipped, not scored
+    EVAL_IDLE_SECONDS: int = 1800  # quiet time before an interview is scored; 0 disables
+    EVAL_IDLE_LOOKBACK_SECONDS: int = 86400  # older quiet conversations are left alone
+    EVAL_SWEEP_SECONDS: float = 60.0
+    EVAL_STALE_SECONDS: float = 600.0  # running jobs older than this lost their worker
+
+    # Opening-question bank
+    QUESTION_BANK_ENABLED: bool = True
+    QUESTION_BANK_PATH: str | None = None  # defaults to app/data/question_bank.json
+    QUESTION_BANK_REFRESH_SECONDS: int = 0  # 0 disables background reloads
+    QUESTION_BANK_MAX_USERS: int = 10000
+    QUESTION_BANK_OPENER_MAX_CHARS: int = 40  # longer first messages go to the model
+
+    # Response compression
+    GZIP_MIN_SIZE: int = 1024  # bytes
+    GZIP_LEVEL: int = 5
+
     # CORS
     CORS_ORIGINS: str = "*"
 
     # Ollama
     # Gemini
     GEMINI_API_KEY: str | None = None
+    GEMINI_MODEL: str = "gemini-flash-latest"
+    LLM_TEMPERATURE: float | None = None
+    GEMINI_CONTEXT_CACHE: bool = False
+    GEMINI_CONTEXT_CACHE_TTL: int = 3600  # seconds
+
+    # Upstream resilience
+    LLM_PROVIDER: str = "gemini"  # "fake" streams canned replies locally
+    LLM_FIRST_TOKEN_TIMEOUT: float = 20.0  # seconds
+    LLM_CHUNK_TIMEOUT: float = 30.0  # max seconds between chunks
+    LLM_RETRIES: int = 2  # only before the first chunk is sent
+    LLM_RETRY_BACKOFF: float = 0.5  # base seconds, doubled per retry with full jitter
+    LLM_HEDGE_AFTER: float | None = None  # seconds without a first chunk before a second call
+    LLM_BREAKER_THRESHOLD: int = 5  # consecutive failures before failing fast
+    LLM_BREAKER_COOLDOWN: float = 30.0  # seconds before a trial call
+
+    # Fake provider (LLM_PROVIDER=fake)
+    FAKE_LLM_FIRST_TOKEN_MS: int = 300
+    FAKE_LLM_CHUNK_MS: int = 30
+    FAKE_LLM_JITTER_MS: int = 0  # +/- per chunk
+    FAKE_LLM_REPLY_WORDS: int = 0  # 0 streams the canned reply once
+    FAKE_LLM_FAILURE_RATE: float = 0.0
+    FAKE_LLM_STALL_RATE: float = 0.0
+
+    # Replay of identical deterministic turns (requires LLM_TEMPERATURE=0)
+    LLM_RESPONSE_CACHE: bool = False
+    LLM_RESPONSE_CACHE_TTL: int = 3600  # seconds
+    LLM_RESPONSE_CACHE_MAX_BYTES: int = 8 * 1024 * 1024
+    LLM_RESPONSE_CACHE_BACKEND: str | None = None  # "package.module:Class", default in-process
 
     class Config:
         env_file = ".env"
         extra = "ignore"
 
 settings = Settings()
+
+def per_worker(budget: int) -> int:
+    """This worker's share of a budget set for the whole instance."""
+    return max(1, budget // max(1, settings.WEB_CONCURRENCY))
@@ -1,9 +1,33 @@
 import asyncpg
 import ssl
-from .config import settings
+import time
+from .config import settings, per_worker
+from .services.metrics import Gauge, DB_POOL_ACQUIRE_WAIT
+
+class InstrumentedPool(asyncpg.Pool):
+    """asyncpg pool that records how long callers wait for a connection."""
+    __slots__ = ()
+
+    async def _acquire(self, timeout):
+        start = time.perf_counter()
+        try:
+            return await super()._acquire(timeout)
+        finally:
+            DB_POOL_ACQUIRE_WAIT.observe(time.perf_counter() - start)
 
 _pool: asyncpg.Pool | None = None
 
+Gauge("db_pool_size", "Open connections in the pool",
+      collect=lambda: _pool.get_size() if _pool else None)
+Gauge("db_pool_idle", "Idle connections in the pool",
+      collect=lambda: _pool.get_idle_size() if _pool else None)
+Gauge("db_pool_max_size", "Configured pool size limit",
+      collect=lambda: _pool.get_max_size() if _pool else None)
+
+def pool_max_size() -> int:
+    """This worker's share of the global connection budget."""
+    return per_worker(settings.DB_MAX_CONNECTIONS)
+
 async def get_pool() -> asyncpg.Pool:
     global _pool
     if _pool is None:
@@ -12,10 +36,18 @@ async def get_pool() -> asyncpg.Pool:
         ssl_context.check_hostname = False
         ssl_context.verify_mode = ssl.CERT_NONE
 
-        _pool = await asyncpg.create_pool(
-            dsn=settings.DATABASE_URL,
-            min_size=1,
-            max_size=5,
+        max_size = pool_max_size()
+
+        # Same defaults as asyncpg.create_pool, which can't take a pool class
+        _pool = await InstrumentedPool(
+            settings.DATABASE_URL,
+            min_size=min(settings.DB_POOL_MIN_SIZE, max_size),
+            max_size=max_size,
+            max_queries=50000,
+            max_inactive_connection_lifetime=300.0,
+            loop=None,
+            connection_class=asyncpg.Connection,
+            record_class=asyncpg.Record,
             ssl=ssl_context   # ✅ enforce SSL
         )
     return _pool
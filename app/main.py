@@ -1,7 +1,9 @@
-import time, asyncio, json
-from fastapi import FastAPI, Depends, HTTPException, Request
+import time, asyncio, logging, hmac
+import orjson
+from fastapi import FastAPI, Depends, HTTPException, Request, Response, Query, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse, ORJSONResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import StreamingResponse, ORJSONResponse, PlainTextResponse
 from pydantic import BaseModel
 from slowapi import Limiter
 from slowapi.util import get_remote_address
@@ -9,17 +11,42 @@ from slowapi.middleware import SlowAPIMiddleware
 
 from .config import settings
 from .db import get_pool, close_pool
-from .auth_supabase import verify_token, supabase
+from .ratelimit import storage_uri
+from .auth_supabase import verify_token
 from .repo import conversations as conv_repo, messages as msg_repo
-from .services.chat import stream_ollama, SYSTEM_PROMPT
+from .repo.cache import history_cache
+from .repo.writer import message_writer
+from .repo import analytics as analytics_repo
+from .repo.analytics import analytics_rollup
+from .repo.pagination import paginate
+from .services.context import build_context, fold_into_summary, unsummarized
+from .services.background import spawn, drain
+from .services.scheduler import llm_scheduler
+from .services.reply import admit, run_reply
+from .services.replay import replay_buffer
+from .services.question_bank import question_bank
+from .services.response_cache import response_cache
+from .services.breaker import llm_breaker
+from .services import sse, metrics, supabase_admin, conditional, interview_ws
+from .services.warmup import warm_up
+from .services.evaluator import evaluator
+from .repo import scores as scores_repo, transfer
+from .repo import usage as usage_repo
+from .repo.usage import usage_meter
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title="AI Interviewer API", default_response_class=ORJSONResponse)
 
 # ---------------- Rate limiting ----------------
-limiter = Limiter(key_func=get_remote_address, default_limits=["60/minute"])
+limiter = Limiter(key_func=get_remote_address, default_limits=["60/minute"], storage_uri=storage_uri())
 app.state.limiter = limiter
 app.add_middleware(SlowAPIMiddleware)
 
+# ---------------- Compression ----------------
+# Large JSON listings only; Starlette never compresses text/event-stream
+app.add_middleware(GZipMiddleware, minimum_size=settings.GZIP_MIN_SIZE, compresslevel=settings.GZIP_LEVEL)
+
 # ---------------- CORS ----------------
 # CORS must be the last middleware added so it runs FIRST
 origins = [o.strip().rstrip("/") for o in settings.CORS_ORIGINS.split(",") if o.strip()]
@@ -29,15 +56,38 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Last-Modified"],
 )
 
 # ---------------- Startup / Shutdown ----------------
+_metrics_publisher: asyncio.Task | None = None
+
 @app.on_event("startup")
 async def _startup():
-    await get_pool()
+    started = time.perf_counter()
+    if settings.STARTUP_WARMUP:
+        await warm_up()
+    else:
+        await get_pool()
+    logger.info("startup finished in %.0f ms", (time.perf_counter() - started) * 1000)
+    question_bank.start_refresh(settings.QUESTION_BANK_REFRESH_SECONDS)
+    evaluator.start()
+    if settings.WEB_CONCURRENCY > 1:
+        global _metrics_publisher
+        _metrics_publisher = asyncio.create_task(metrics.publish_snapshots(settings.METRICS_SNAPSHOT_SECONDS))
 
 @app.on_event("shutdown")
 async def _shutdown():
+    if _metrics_publisher is not None:
+        _metrics_publisher.cancel()
+        await asyncio.gather(_metrics_publisher, return_exceptions=True)
+    await question_bank.close()
+    await evaluator.close()
+    await drain()
+    await message_writer.close()
+    await analytics_rollup.close()
+    await usage_meter.close()
+    await supabase_admin.close()
     await close_pool()
 
 # ---------------- Health Check ----------------
@@ -47,7 +97,29 @@ async def root():
 
 @app.get("/health")
 async def health():
-    return {"ok": True}
+    return {
+        "ok": True,
+        "history_cache": history_cache.stats(),
+        "llm_scheduler": llm_scheduler.stats(),
+        "llm_response_cache": response_cache.stats(),
+        "llm_breaker": llm_breaker.stats(),
+        "evaluator": evaluator.stats(),
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+@limiter.exempt
+async def prometheus_metrics(request: Request):
+    # Internal state (query latencies, pool, breaker): scrapers only
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), settings.METRICS_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token", headers={"WWW-Authenticate": "Bearer"})
+    if settings.WEB_CONCURRENCY > 1:
+        body = metrics.render_workers(max_age=3 * settings.METRICS_SNAPSHOT_SECONDS)
+    else:
+        body = metrics.render()
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
 
 # ---------------- Conversations ----------------
 class CreateConvIn(BaseModel):
@@ -61,9 +133,23 @@ class RenameConversationIn(BaseModel):
 @limiter.limit("120/minute")
 async def list_conversations(
     request: Request,
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: str | None = None,
     user_id: str = Depends(verify_token)
 ):
-    return await conv_repo.list_conversations(user_id)
+    # Deletes don't move max(updated_at), so the count is part of the tag
+    count, last_updated = await conv_repo.conversations_version(user_id)
+    etag = conditional.etag(user_id, count, last_updated, limit, cursor)
+    if conditional.is_fresh(request, etag):
+        return conditional.not_modified(etag)
+
+    rows = await conv_repo.list_conversations(user_id, limit=limit + 1, cursor=cursor)
+    items, next_cursor = paginate(rows, limit, "updated_at")
+    response.headers.update(conditional.validator_headers(etag))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return items
 
 @app.post("/conversations")
 @limiter.limit("60/minute")
@@ -97,6 +183,26 @@ async def delete_conversation(
     await conv_repo.delete_conversation(user_id, conv_id)
     return {"ok": True}
 
+@app.post("/conversations/{conv_id}/evaluation", status_code=202)
+@limiter.limit("10/minute")
+async def request_evaluation(
+    request: Request,
+    conv_id: str,
+    user_id: str = Depends(verify_token)
+):
+    """End the interview and queue it for scoring; poll the GET for the result."""
+    queued = await evaluator.submit(user_id, conv_id)
+    return {"queued": queued, **await scores_repo.get_score(user_id, conv_id)}
+
+@app.get("/conversations/{conv_id}/evaluation")
+@limiter.limit("120/minute")
+async def get_evaluation(
+    request: Request,
+    conv_id: str,
+    user_id: str = Depends(verify_token)
+):
+    return await scores_repo.get_score(user_id, conv_id)
+
 # ---------------- User Profile & Auth ----------------
 class UpdateProfileIn(BaseModel):
     name: str
@@ -113,10 +219,7 @@ async def update_profile(
     user_id: str = Depends(verify_token)
 ):
     try:
-        result = supabase.auth.admin.update_user_by_id(
-            user_id,
-            {"user_metadata": {"name": body.name}}
-        )
+        await supabase_admin.update_user(user_id, {"user_metadata": {"name": body.name}})
         return {"success": True, "message": "Profile updated successfully"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to update profile: {str(e)}")
@@ -129,21 +232,13 @@ async def change_password(
     user_id: str = Depends(verify_token)
 ):
     try:
-        user_response = supabase.auth.admin.get_user_by_id(user_id)
-        user_email = user_response.user.email
-
-        try:
-            supabase.auth.sign_in_with_password({
-                "email": user_email,
-                "password": body.current_password
-            })
-        except:
+        user = await supabase_admin.get_user(user_id)
+        user_email = user["email"]
+
+        if not await supabase_admin.check_password(user_email, body.current_password):
             raise HTTPException(status_code=400, detail="Current password is incorrect")
 
-        supabase.auth.admin.update_user_by_id(
-            user_id,
-            {"password": body.new_password}
-        )
+        await supabase_admin.update_user(user_id, {"password": body.new_password})
 
         return {"success": True, "message": "Password changed successfully"}
     except HTTPException:
@@ -157,60 +252,210 @@ async def change_password(
 async def list_messages(
     request: Request,
     conv_id: str,
+    limit: int = Query(200, ge=1, le=500),
+    cursor: str | None = None,
     user_id: str = Depends(verify_token)
 ):
-    return await msg_repo.list_messages(conv_id)
+    # Messages are append-only, so the newest one versions every page. The
+    # history cache sees every write while it is enabled (one worker only);
+    # otherwise ask the database.
+    if history_cache.enabled:
+        conv = await msg_repo.get_history(user_id, conv_id)
+        newest = conv.messages[-1] if conv.messages else None
+    else:
+        conv = None
+        newest = await msg_repo.newest_message(user_id, conv_id)
+    last_modified = conditional.http_date(newest["timestamp"] if newest else None)
+    etag = conditional.etag(conv_id, newest["id"] if newest else "", limit, cursor)
+    if conditional.is_fresh(request, etag, last_modified):
+        return conditional.not_modified(etag, last_modified)
+
+    headers = conditional.validator_headers(etag, last_modified)
+    if conv is not None and cursor is None and conv.complete:
+        items, next_cursor = paginate(conv.messages[:limit + 1], limit, "timestamp")
+        body = orjson.dumps(items)
+    else:
+        body, next_cursor = await msg_repo.list_messages_json(conv_id, limit=limit, cursor=cursor)
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return Response(body, media_type="application/json", headers=headers)
+
+# ---------------- Export / Import ----------------
+@app.get("/export")
+@limiter.limit("5/minute")
+async def export_conversations(
+    request: Request,
+    user_id: str = Depends(verify_token)
+):
+    filename = f"prepsmart-export-{time.strftime('%Y%m%d')}.ndjson"
+    return StreamingResponse(
+        transfer.export_ndjson(user_id),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@app.post("/import")
+@limiter.limit("5/minute")
+async def import_conversations(
+    request: Request,
+    user_id: str = Depends(verify_token)
+):
+    return await transfer.import_ndjson(user_id, request.stream())
 
-# ---------------- Chat (SSE streaming) ----------------
-class ChatIn(BaseModel):
-    conversation_id: str
-    user_message: str
+# ---------------- Search ----------------
+@app.get("/search")
+@limiter.limit("60/minute")
+async def search_messages(
+    request: Request,
+    response: Response,
+    q: str = Query(..., min_length=2, max_length=200),
+    domain: str | None = None,
+    limit: int = Query(20, ge=1, le=50),
+    cursor: str | None = None,
+    user_id: str = Depends(verify_token)
+):
+    items, next_cursor = await msg_repo.search_messages(user_id, q, domain, limit, cursor)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return items
 
-@app.post("/chat/stream")
-@limiter.limit("30/minute")
-async def chat_stream(
+# ---------------- Analytics ----------------
+@app.get("/analytics")
+@limiter.limit("60/minute")
+async def get_analytics(
     request: Request,
-    payload: ChatIn,
     user_id: str = Depends(verify_token)
 ):
-    conv_id = payload.conversation_id
-    history = await msg_repo.list_messages(conv_id, limit=50)
+    return await analytics_repo.get_user_analytics(user_id)
 
-    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
-    for m in history:
-        messages.append({"role": m["role"], "content": m["content"]})
-    messages.append({"role": "user", "content": payload.user_message})
+@app.get("/analytics/conversations/{conv_id}")
+@limiter.limit("60/minute")
+async def get_conversation_analytics(
+    request: Request,
+    conv_id: str,
+    user_id: str = Depends(verify_token)
+):
+    return await analytics_repo.get_conversation_analytics(user_id, conv_id)
 
-    await msg_repo.add_message(conv_id, "user", payload.user_message)
+@app.get("/usage")
+@limiter.limit("60/minute")
+async def get_usage(
+    request: Request,
+    days: int = Query(30, ge=1, le=90),
+    user_id: str = Depends(verify_token)
+):
+    return await usage_repo.get_usage(user_id, days)
 
-    async def event_gen():
-        start = time.time()
-        buffer = ""
+# ---------------- Chat (SSE streaming) ----------------
+class ChatIn(BaseModel):
+    conversation_id: str
+    user_message: str
+
+def _publish_error(gen, detail):
+    """End a generation with an error frame, so resuming clients stop instead of retrying."""
+    gen.publish(orjson.dumps({"role": "assistant", "content": "", "error": detail, "final": True}))
+    gen.publish(sse.DONE)
 
-        async for chunk in stream_ollama(messages):
-            text = chunk.get("content", "") if isinstance(chunk, dict) else str(chunk)
-            buffer += text
+async def generate_reply(gen, ticket, messages: list[dict], summary: str | None, summarized_until,
+                         overflow: list[dict], domain: str | None = None):
+    """
+    Produce one assistant reply into the replay buffer. Runs detached from
+    the HTTP response so clients can drop and resume without restarting it.
+    """
+    async def queued(position: int):
+        gen.publish(orjson.dumps({"role": "assistant", "content": "", "queue_position": position, "final": False}))
 
-            event = {
-                "role": "assistant",
-                "content": text,
-                "timestamp": time.time(),
-                "final": False
-            }
-            yield f"data: {json.dumps(event)}\n\n"
+    async def chunk(text: str):
+        gen.publish(text)  # encoded (and coalesced) per subscriber
 
-            if await request.is_disconnected():
-                break
+    def store(reply: str, fields: dict):
+        # Detached so the reply is stored even if generation is cancelled
+        return spawn(msg_repo.add_message(gen.conv_id, "assistant", reply, **fields))
+
+    try:
+        save_task = await run_reply(ticket, messages, gen.user_id, domain, queued, chunk, store)
+        saved = await asyncio.shield(save_task)
 
-        saved = await msg_repo.add_message(
-            conv_id,
-            "assistant",
-            buffer,
-            latency_ms=int((time.time() - start) * 1000),
-        )
+        if overflow:
+            spawn(fold_into_summary(gen.conv_id, gen.user_id, domain, summary, summarized_until, overflow))
 
         saved["final"] = True  # ✅ mark final
-        yield f"data: {json.dumps(saved)}\n\n"
-        yield "data: [DONE]\n\n"
+        gen.publish(orjson.dumps(saved))
+        gen.publish(sse.DONE)
+    except HTTPException as e:
+        _publish_error(gen, e.detail)
+    except Exception:
+        logger.exception("reply generation failed for conversation %s", gen.conv_id)
+        _publish_error(gen, "Could not complete the reply, please try again")
+    finally:
+        gen.finish()
+
+async def serve_opener(gen, text: str):
+    """Stream a question-bank opener through the same event sequence as a model reply."""
+    try:
+        gen.publish(text)
+        metrics.LLM_OPENERS_FROM_BANK.inc()
+        # No model call, so no latency to report
+        saved = await msg_repo.add_message(gen.conv_id, "assistant", text)
+        saved["final"] = True
+        gen.publish(orjson.dumps(saved))
+        gen.publish(sse.DONE)
+    except HTTPException as e:
+        _publish_error(gen, e.detail)
+    except Exception:
+        logger.exception("opener failed for conversation %s", gen.conv_id)
+        _publish_error(gen, "Could not start the interview, please try again")
+    finally:
+        gen.finish()
 
-    return StreamingResponse(event_gen(), media_type="text/event-stream")
+@app.post("/chat/stream")
+@limiter.limit("30/minute")
+async def chat_stream(
+    request: Request,
+    payload: ChatIn,
+    user_id: str = Depends(verify_token)
+):
+    conv_id = payload.conversation_id
+    conv = await msg_repo.get_history(user_id, conv_id)
+
+    # Reconnect: attach to the running (or just finished) generation
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id:
+        found = replay_buffer.find(conv_id, last_event_id)
+        if found is None or found[0].user_id != user_id:
+            raise HTTPException(status_code=410, detail="Stream expired, reload the conversation")
+        gen, seq = found
+        return StreamingResponse(sse.stream_events(request, gen, seq), media_type="text/event-stream")
+
+    opener = await question_bank.opener_for(user_id, conv.domain, conv.complete and not conv.messages, payload.user_message)
+    if opener is not None:
+        await msg_repo.add_message(conv_id, "user", payload.user_message)
+        gen = replay_buffer.start(conv_id, user_id)
+        gen.task = spawn(serve_opener(gen, opener))
+        return StreamingResponse(sse.stream_events(request, gen), media_type="text/event-stream")
+
+    summary = conv.summary
+    history = unsummarized(conv.messages, conv.summarized_until)
+
+    messages, overflow = build_context(summary, history, payload.user_message, domain=conv.domain)
+
+    ticket = await admit(user_id)
+    try:
+        await msg_repo.add_message(conv_id, "user", payload.user_message)
+        gen = replay_buffer.start(conv_id, user_id)
+        gen.task = spawn(generate_reply(gen, ticket, messages, summary, conv.summarized_until, overflow, conv.domain))
+    except BaseException:
+        # generate_reply owns the slot once spawned; until then it's ours to give back
+        llm_scheduler.release(ticket)
+        raise
+    return StreamingResponse(sse.stream_events(request, gen), media_type="text/event-stream")
+
+# ---------------- Chat (WebSocket session) ----------------
+@app.websocket("/ws/interview/{conv_id}")
+async def interview_socket(websocket: WebSocket, conv_id: str):
+    # CORS doesn't cover WebSockets; apply the same origin list by hand
+    origin = websocket.headers.get("origin")
+    if origin is not None and origins and "*" not in origins and origin.rstrip("/") not in origins:
+        await websocket.close(code=4403)
+        return
+    await interview_ws.serve(websocket, conv_id)
@@ -0,0 +1,161 @@
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import closing
+from limits.storage import Storage
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+UPSERT = """
+  insert into counters(key, value, expires_at) values(?, ?, ?)
+  on conflict(key) do update set value=value+excluded.value
+  returning value
+"""
+
+class SQLiteStorage(Storage):
+    """
+    Fixed-window rate-limit counters in a local SQLite file, shared by every
+    worker process on the host.
+
+    slowapi counts synchronously on the event loop, so a hit never waits for
+    the file lock: it tries the atomic increment with no busy timeout, which
+    is exact whenever no other worker is mid-write. If one is, the hit is
+    queued for a background thread (which may wait) and counted against the
+    current shared value plus this worker's queued hits. WAL reads never
+    block, so that estimate trails other workers by at most one write.
+
+        sqlite:///path/to/ratelimit.db
+    """
+
+    STORAGE_SCHEME = ["sqlite"]
+
+    def __init__(self, uri: str | None = None, wrap_exceptions: bool = False, **options):
+        path = uri.split("://", 1)[1] if uri else ""
+        self.path = path or os.path.join(tempfile.gettempdir(), "prepsmart-ratelimit.db")
+        self._lock = threading.Lock()  # guards the connection and the queues below
+        # key -> [hits not yet written, window length]; queued, and being written
+        self._pending: dict[str, list] = {}
+        self._inflight: dict[str, list] = {}
+        self._writes = 0
+        self._conn = self._connect(timeout=0)
+        self._conn.execute("pragma journal_mode=wal")
+        self._conn.execute(
+            "create table if not exists counters (key text primary key, value integer not null, expires_at real not null)"
+        )
+        self._sync_conn = self._connect(timeout=5.0)
+        self._wake = threading.Event()
+        threading.Thread(target=self._sync_loop, name="ratelimit-sync", daemon=True).start()
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    def _connect(self, timeout: float) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        conn.execute("pragma synchronous=normal")
+        return conn
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        now = time.time()
+        with self._lock:
+            try:
+                value = self._increment(self._conn, key, amount, expiry, now)
+            except sqlite3.OperationalError:
+                # Another worker holds the write lock; don't wait for it here
+                self._pending.setdefault(key, [0, expiry])[0] += amount
+                self._wake.set()
+                value = self._shared(key, now)
+            return value + self._unwritten(key)
+
+    def get(self, key: str) -> int:
+        now = time.time()
+        with self._lock:
+            return self._shared(key, now) + self._unwritten(key)
+
+    def get_expiry(self, key: str) -> float:
+        with self._lock:
+            row = self._conn.execute("select expires_at from counters where key=?", (key,)).fetchone()
+        return row[0] if row else time.time()
+
+    def check(self) -> bool:
+        try:
+            with self._lock:
+                self._conn.execute("select 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self) -> int | None:
+        with self._lock:
+            self._pending.clear()
+        with closing(self._connect(timeout=5.0)) as conn:
+            return conn.execute("delete from counters").rowcount
+
+    def clear(self, key: str) -> None:
+        with self._lock:
+            self._pending.pop(key, None)
+        with closing(self._connect(timeout=5.0)) as conn:
+            conn.execute("delete from counters where key=?", (key,))
+
+    def _increment(self, conn: sqlite3.Connection, key: str, amount: int, expiry: int, now: float) -> int:
+        conn.execute("begin immediate")
+        try:
+            # Restart the window once it has expired; now and then sweep
+            # windows of clients that never came back
+            self._writes += 1
+            if self._writes % 1000 == 0:
+                conn.execute("delete from counters where expires_at<=?", (now,))
+            else:
+                conn.execute("delete from counters where key=? and expires_at<=?", (key, now))
+            (value,) = conn.execute(UPSERT, (key, amount, now + expiry)).fetchone()
+            conn.execute("commit")
+        except BaseException:
+            conn.execute("rollback")
+            raise
+        return value
+
+    def _shared(self, key: str, now: float) -> int:
+        row = self._conn.execute("select value, expires_at from counters where key=?", (key,)).fetchone()
+        return row[0] if row and row[1] > now else 0
+
+    def _unwritten(self, key: str) -> int:
+        return self._pending.get(key, [0])[0] + self._inflight.get(key, [0])[0]
+
+    def _sync_loop(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                self._inflight = batch
+            for key, (amount, expiry) in list(batch.items()):
+                try:
+                    self._increment(self._sync_conn, key, amount, expiry, time.time())
+                except sqlite3.Error:
+                    logger.warning("rate-limit write failed, retrying", exc_info=True)
+                    time.sleep(0.05)
+                    break
+                with self._lock:
+                    del batch[key]
+            with self._lock:
+                # Whatever wasn't written goes back in the queue
+                for key, (amount, expiry) in batch.items():
+                    self._pending.setdefault(key, [0, expiry])[0] += amount
+                    self._wake.set()
+                self._inflight = {}
+
+def storage_uri() -> str:
+    """
+    Where rate-limit counters live. In-process memory is only correct with a
+    single worker, so multi-worker mode defaults to the shared SQLite file.
+    """
+    if settings.RATE_LIMIT_STORAGE_URI:
+        return settings.RATE_LIMIT_STORAGE_URI
+    if settings.WEB_CONCURRENCY > 1:
+        return "sqlite://" + os.path.join(tempfile.gettempdir(), "prepsmart-ratelimit.db")
+    return "memory://"
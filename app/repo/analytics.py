@@ -0,0 +1,258 @@
+import uuid
+from bisect import bisect_right
+from datetime import datetime
+from fastapi import HTTPException
+from ..config import settings
+from ..db import get_pool
+from ..services.metrics import timed_query
+from .flusher import PeriodicFlusher
+
+# Reply latency histogram bounds; must match migrations/003_analytics_rollups.sql
+LATENCY_BOUNDS_MS = (250, 500, 1000, 2000, 3000, 5000, 8000, 13000, 20000, 30000, 60000)
+
+COUNTERS = (
+    "user_turns", "assistant_turns", "user_chars", "assistant_chars",
+    "user_tokens", "assistant_tokens", "latency_count", "latency_sum_ms",
+)
+
+FLUSH_DELTAS = """
+  with d as (
+    select * from unnest(
+      $1::uuid[], $2::int[], $3::int[], $4::bigint[], $5::bigint[], $6::bigint[], $7::bigint[],
+      $8::int[], $9::bigint[], $10::text[], $11::timestamptz[], $12::timestamptz[]
+    ) as d(conversation_id, user_turns, assistant_turns, user_chars, assistant_chars,
+           user_tokens, assistant_tokens, latency_count, latency_sum_ms, latency_hist,
+           first_at, last_at)
+  ),
+  prev as (
+    select s.conversation_id, s.first_message_at, s.last_message_at
+    from conversation_stats s join d using (conversation_id)
+    for update of s
+  ),
+  up as (
+    insert into conversation_stats as s (
+      conversation_id, user_id, domain, user_turns, assistant_turns, user_chars, assistant_chars,
+      user_tokens, assistant_tokens, latency_count, latency_sum_ms, latency_hist,
+      first_message_at, last_message_at
+    )
+    select d.conversation_id, c.user_id, coalesce(c.domain, 'general'), d.user_turns, d.assistant_turns,
+           d.user_chars, d.assistant_chars, d.user_tokens, d.assistant_tokens, d.latency_count,
+           d.latency_sum_ms, d.latency_hist::int[], d.first_at, d.last_at
+    from d join conversations c on c.id = d.conversation_id
+    on conflict (conversation_id) do update set
+      user_turns = s.user_turns + excluded.user_turns,
+      assistant_turns = s.assistant_turns + excluded.assistant_turns,
+      user_chars = s.user_chars + excluded.user_chars,
+      assistant_chars = s.assistant_chars + excluded.assistant_chars,
+      user_tokens = s.user_tokens + excluded.user_tokens,
+      assistant_tokens = s.assistant_tokens + excluded.assistant_tokens,
+      latency_count = s.latency_count + excluded.latency_count,
+      latency_sum_ms = s.latency_sum_ms + excluded.latency_sum_ms,
+      latency_hist = int_array_add(s.latency_hist, excluded.latency_hist),
+      first_message_at = least(s.first_message_at, excluded.first_message_at),
+      last_message_at = greatest(s.last_message_at, excluded.last_message_at)
+    returning s.conversation_id, s.user_id, s.domain, s.first_message_at, s.last_message_at
+  )
+  insert into user_domain_stats as u (
+    user_id, domain, conversations, user_turns, assistant_turns, user_chars, assistant_chars,
+    user_tokens, assistant_tokens, latency_count, latency_sum_ms, latency_hist, session_seconds
+  )
+  select up.user_id, up.domain,
+         count(*) filter (where prev.conversation_id is null),
+         sum(d.user_turns), sum(d.assistant_turns), sum(d.user_chars), sum(d.assistant_chars),
+         sum(d.user_tokens), sum(d.assistant_tokens), sum(d.latency_count), sum(d.latency_sum_ms),
+         int_array_sum(d.latency_hist::int[]),
+         -- How much each conversation's first-to-last span grew
+         sum(extract(epoch from up.last_message_at - up.first_message_at)
+             - coalesce(extract(epoch from prev.last_message_at - prev.first_message_at), 0))
+  from up join d using (conversation_id) left join prev using (conversation_id)
+  group by up.user_id, up.domain
+  on conflict (user_id, domain) do update set
+    conversations = u.conversations + excluded.conversations,
+    user_turns = u.user_turns + excluded.user_turns,
+    assistant_turns = u.assistant_turns + excluded.assistant_turns,
+    user_chars = u.user_chars + excluded.user_chars,
+    assistant_chars = u.assistant_chars + excluded.assistant_chars,
+    user_tokens = u.user_tokens + excluded.user_tokens,
+    assistant_tokens = u.assistant_tokens + excluded.assistant_tokens,
+    latency_count = u.latency_count + excluded.latency_count,
+    latency_sum_ms = u.latency_sum_ms + excluded.latency_sum_ms,
+    latency_hist = int_array_add(u.latency_hist, excluded.latency_hist),
+    session_seconds = u.session_seconds + excluded.session_seconds
+"""
+
+class _Delta:
+    __slots__ = COUNTERS + ("latency_hist", "first_at", "last_at")
+
+    def __init__(self, at: datetime):
+        for name in COUNTERS:
+            setattr(self, name, 0)
+        self.latency_hist = [0] * (len(LATENCY_BOUNDS_MS) + 1)
+        self.first_at = at
+        self.last_at = at
+
+class AnalyticsRollup(PeriodicFlusher):
+    """
+    Per-conversation analytics deltas accumulated in memory as messages are
+    added and folded into conversation_stats and user_domain_stats with one
+    statement per flush, so reads never scan messages.
+    """
+
+    what = "analytics deltas"
+
+    def __init__(self, flush_seconds: float, max_pending: int, retries: int = 3):
+        super().__init__(flush_seconds, retries)
+        self.max_pending = max_pending
+        self._pending: dict[str, _Delta] = {}
+
+    def record(self, conv_id: str, role: str, content: str, tokens: int, latency_ms: int | None, at: datetime):
+        if not settings.ANALYTICS_ENABLED or role not in ("user", "assistant"):
+            return
+        conv_id = str(conv_id).lower()
+        delta = self._pending.get(conv_id)
+        if delta is None:
+            delta = self._pending[conv_id] = _Delta(at)
+        if role == "user":
+            delta.user_turns += 1
+            delta.user_chars += len(content)
+            delta.user_tokens += tokens
+        else:
+            delta.assistant_turns += 1
+            delta.assistant_chars += len(content)
+            delta.assistant_tokens += tokens
+        if latency_ms is not None:
+            delta.latency_count += 1
+            delta.latency_sum_ms += latency_ms
+            delta.latency_hist[bisect_right(LATENCY_BOUNDS_MS, latency_ms)] += 1
+        delta.first_at = min(delta.first_at, at)
+        delta.last_at = max(delta.last_at, at)
+
+        self._started()
+        if len(self._pending) >= self.max_pending:
+            self._wake.set()
+
+    async def _write(self, pool, batch: dict[str, _Delta]):
+        await _apply(pool, batch)
+
+async def _apply(conn, batch: dict[str, _Delta]):
+    ids = [uuid.UUID(c) for c in batch]
+    deltas = list(batch.values())
+    args = [ids] + [[getattr(d, name) for d in deltas] for name in COUNTERS]
+    # A 2-D array would be flattened by unnest(); send each histogram as text
+    args.append(["{" + ",".join(map(str, d.latency_hist)) + "}" for d in deltas])
+    args.append([d.first_at for d in deltas])
+    args.append([d.last_at for d in deltas])
+    await conn.execute(FLUSH_DELTAS, *args)
+
+async def fold_totals(conn, rows):
+    """
+    Add per-conversation totals computed elsewhere (an import) to the
+    rollups on `conn`, so they commit or roll back with the caller's
+    transaction. Each row has `conversation_id`, the COUNTERS,
+    `latency_buckets` (one bucket index per timed reply), `first_at` and
+    `last_at`.
+    """
+    batch: dict[str, _Delta] = {}
+    for row in rows:
+        delta = _Delta(row["first_at"])
+        delta.last_at = row["last_at"]
+        for name in COUNTERS:
+            setattr(delta, name, row[name])
+        for bucket in row["latency_buckets"] or ():
+            delta.latency_hist[bucket] += 1
+        batch[str(row["conversation_id"])] = delta
+    if batch:
+        await _apply(conn, batch)
+
+analytics_rollup = AnalyticsRollup(
+    flush_seconds=settings.ANALYTICS_FLUSH_SECONDS,
+    max_pending=settings.ANALYTICS_MAX_PENDING,
+)
+
+def _percentile(hist: list[int], q: float) -> int | None:
+    """Upper bound (ms) of the bucket holding the q-th reply; the last bucket reports its lower bound."""
+    total = sum(hist)
+    if not total:
+        return None
+    target = q * total
+    cumulative = 0
+    for i, count in enumerate(hist):
+        cumulative += count
+        if cumulative >= target:
+            return LATENCY_BOUNDS_MS[min(i, len(LATENCY_BOUNDS_MS) - 1)]
+    return LATENCY_BOUNDS_MS[-1]
+
+def _summarize(row: dict) -> dict:
+    hist = list(row["latency_hist"] or [])
+    out = {name: row[name] for name in COUNTERS if not name.startswith("latency")}
+    out["latency_ms"] = {
+        "count": row["latency_count"],
+        "mean": round(row["latency_sum_ms"] / row["latency_count"]) if row["latency_count"] else None,
+        "p50": _percentile(hist, 0.50),
+        "p90": _percentile(hist, 0.90),
+        "p99": _percentile(hist, 0.99),
+    }
+    return out
+
+def _add_hist(a: list[int], b: list[int]) -> list[int]:
+    if len(a) < len(b):
+        a, b = b, a
+    return [x + (b[i] if i < len(b) else 0) for i, x in enumerate(a)]
+
+@timed_query
+async def get_user_analytics(user_id: str) -> dict:
+    """Totals and per-domain breakdown; reads one row per practiced domain."""
+    pool = await get_pool()
+    rows = await pool.fetch("""
+        select * from user_domain_stats where user_id = $1 order by domain
+    """, user_id)
+
+    totals = {name: 0 for name in COUNTERS}
+    totals.update(conversations=0, session_seconds=0.0, latency_hist=[])
+    domains = []
+    for r in rows:
+        for name in COUNTERS + ("conversations", "session_seconds"):
+            totals[name] += r[name]
+        totals["latency_hist"] = _add_hist(totals["latency_hist"], list(r["latency_hist"] or []))
+        domains.append({
+            "domain": r["domain"],
+            "conversations": r["conversations"],
+            "session_seconds": round(r["session_seconds"], 1),
+            **_summarize(r),
+        })
+
+    return {
+        "totals": {
+            "conversations": totals["conversations"],
+            "session_seconds": round(totals["session_seconds"], 1),
+            "avg_session_seconds": (
+                round(totals["session_seconds"] / totals["conversations"], 1) if totals["conversations"] else None
+            ),
+            **_summarize(totals),
+        },
+        "domains": domains,
+    }
+
+@timed_query
+async def get_conversation_analytics(user_id: str, conv_id: str) -> dict:
+    try:
+        conv_id = uuid.UUID(conv_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid conversation ID")
+
+    pool = await get_pool()
+    row = await pool.fetchrow("""
+        select * from conversation_stats where conversation_id = $1 and user_id = $2
+    """, conv_id, user_id)
+    if not row:
+        raise HTTPException(status_code=404, detail="No analytics for this conversation yet")
+
+    duration = None
+    if row["first_message_at"] and row["last_message_at"]:
+        duration = round((row["last_message_at"] - row["first_message_at"]).total_seconds(), 1)
+    return {
+        "conversation_id": str(conv_id),
+        "domain": row["domain"],
+        "session_seconds": duration,
+        **_summarize(row),
+    }
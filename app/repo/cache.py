@@ -0,0 +1,136 @@
+from collections import OrderedDict
+from ..config import settings
+
+# Rough per-message bookkeeping cost on top of the content itself
+_MESSAGE_OVERHEAD = 200
+
+class ConversationEntry:
+    """Cached conversation metadata plus its newest messages, oldest first."""
+    __slots__ = ("user_id", "domain", "summary", "summarized_until", "messages", "complete", "size")
+
+    def __init__(self, user_id: str, domain: str, summary, summarized_until, messages: list[dict], complete: bool):
+        self.user_id = user_id
+        self.domain = domain
+        self.summary = summary
+        self.summarized_until = summarized_until
+        self.messages = messages
+        # True when `messages` is the conversation's entire history
+        self.complete = complete
+        self.size = sum(len(m["content"]) + _MESSAGE_OVERHEAD for m in messages)
+
+class HistoryCache:
+    """
+    Memory-bounded LRU of recent conversation history. Kept current by the
+    repo write paths so hot conversations never hit the database on read.
+    Those paths only reach this process, so with several workers the cache
+    is disabled and every lookup is a miss.
+    """
+
+    def __init__(self, max_bytes: int, max_messages: int, enabled: bool = True):
+        self.enabled = enabled
+        self.max_bytes = max_bytes
+        self.max_messages = max_messages
+        self._entries: "OrderedDict[str, ConversationEntry]" = OrderedDict()
+        self._bytes = 0
+        # conv_id -> loads in flight, and writes that landed since the first began
+        self._loads: dict[str, int] = {}
+        self._writes: dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, conv_id: str) -> ConversationEntry | None:
+        conv_id = conv_id.lower()
+        entry = self._entries.get(conv_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(conv_id)
+        self.hits += 1
+        return entry
+
+    def begin_load(self, conv_id: str) -> int:
+        """Start loading an entry; pass the returned token to finish_load."""
+        conv_id = conv_id.lower()
+        self._loads[conv_id] = self._loads.get(conv_id, 0) + 1
+        return self._writes.setdefault(conv_id, 0)
+
+    def finish_load(self, conv_id: str, entry: ConversationEntry | None, token: int):
+        """Store a freshly loaded entry unless a write raced with this load."""
+        conv_id = conv_id.lower()
+        stale = self._writes.get(conv_id) != token
+        if self._loads.get(conv_id, 1) > 1:
+            self._loads[conv_id] -= 1
+        else:
+            self._loads.pop(conv_id, None)
+            self._writes.pop(conv_id, None)
+        if stale or entry is None or not self.enabled:
+            return
+        self._put(conv_id, entry)
+
+    def _written(self, conv_id: str):
+        if conv_id in self._writes:
+            self._writes[conv_id] += 1
+
+    def append(self, conv_id: str, message: dict):
+        conv_id = conv_id.lower()
+        self._written(conv_id)
+        entry = self._entries.get(conv_id)
+        if entry is None:
+            return
+        entry.messages.append(dict(message))
+        entry.size += len(message["content"]) + _MESSAGE_OVERHEAD
+        self._bytes += len(message["content"]) + _MESSAGE_OVERHEAD
+        while len(entry.messages) > self.max_messages:
+            dropped = entry.messages.pop(0)
+            entry.complete = False
+            entry.size -= len(dropped["content"]) + _MESSAGE_OVERHEAD
+            self._bytes -= len(dropped["content"]) + _MESSAGE_OVERHEAD
+        self._shrink()
+
+    def set_summary(self, conv_id: str, summary: str, summarized_until):
+        entry = self._entries.get(conv_id.lower())
+        if entry is not None:
+            entry.summary = summary
+            entry.summarized_until = summarized_until
+
+    def evict(self, conv_id: str):
+        conv_id = conv_id.lower()
+        self._written(conv_id)
+        entry = self._entries.pop(conv_id, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def _put(self, conv_id: str, entry: ConversationEntry):
+        old = self._entries.pop(conv_id, None)
+        if old is not None:
+            self._bytes -= old.size
+        self._entries[conv_id] = entry
+        self._bytes += entry.size
+        self._shrink()
+
+    def _shrink(self):
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.size
+            self.evictions += 1
+
+history_cache = HistoryCache(
+    max_bytes=settings.HISTORY_CACHE_MAX_BYTES,
+    max_messages=settings.HISTORY_CACHE_MAX_MESSAGES,
+    # Workers don't see each other's appends and evictions
+    enabled=settings.WEB_CONCURRENCY == 1,
+)
@@ -1,15 +1,25 @@
 from fastapi import HTTPException
 from ..db import get_pool
+from ..services.metrics import timed_query
+from .cache import history_cache
+from .pagination import decode_cursor
 import uuid
 
-async def list_conversations(user_id: str):
+@timed_query
+async def list_conversations(user_id: str, limit: int = 50, cursor: str | None = None):
+    """
+    Most recently updated first, starting after the keyset `cursor` if given.
+    """
+    before_ts, before_id = decode_cursor(cursor)
     pool = await get_pool()
     rows = await pool.fetch("""
         select id, title, domain, created_at, updated_at
         from conversations
         where user_id = $1
-        order by updated_at desc
-    """, user_id)
+          and ($3::timestamptz is null or (updated_at, id) < ($3, $4::uuid))
+        order by updated_at desc, id desc
+        limit $2
+    """, user_id, limit, before_ts, before_id)
     return [
         {
             "id": str(r["id"]),
@@ -21,6 +31,21 @@ async def list_conversations(user_id: str):
         for r in rows
     ]
 
+@timed_query
+async def conversations_version(user_id: str):
+    """
+    (count, newest updated_at) of a user's conversations: changes whenever
+    the listing does, and is answered from the (user_id, updated_at) index.
+    """
+    pool = await get_pool()
+    row = await pool.fetchrow("""
+        select count(*) as n, max(updated_at) as last_updated
+        from conversations
+        where user_id = $1
+    """, user_id)
+    return row["n"], row["last_updated"]
+
+@timed_query
 async def create_conversation(user_id: str, title: str, domain: str):
     pool = await get_pool()
     row = await pool.fetchrow("""
@@ -36,6 +61,7 @@ async def create_conversation(user_id: str, title: str, domain: str):
         "updated_at": row["updated_at"].isoformat(),
     }
 
+@timed_query
 async def delete_conversation(user_id: str, conv_id: str):
     pool = await get_pool()
     try:
@@ -51,8 +77,11 @@ async def delete_conversation(user_id: str, conv_id: str):
     if result == "DELETE 0":
         raise HTTPException(status_code=404, detail="Conversation not found or not owned by user")
 
+    history_cache.evict(str(conv_id))
+
     return {"status": "success", "id": str(conv_id)}
 
+@timed_query
 async def update_conversation_title(user_id: str, conv_id: str, new_title: str) -> bool:
     pool = await get_pool()
     try:
@@ -70,3 +99,41 @@ async def update_conversation_title(user_id: str, conv_id: str, new_title: str)
         raise HTTPException(status_code=404, detail="Conversation not found or not owned by user")
 
     return True
+
+
+@timed_query
+async def get_conversation(conv_id: str):
+    pool = await get_pool()
+    try:
+        conv_id = uuid.UUID(conv_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid conversation ID")
+
+    row = await pool.fetchrow("""
+        select id, user_id, title, domain, summary, summarized_until
+        from conversations
+        where id = $1
+    """, conv_id)
+    if not row:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+
+    return {
+        "id": str(row["id"]),
+        "user_id": str(row["user_id"]),
+        "title": row["title"],
+        "domain": row["domain"],
+        "summary": row["summary"],
+        "summarized_until": row["summarized_until"],
+    }
+
+@timed_query
+async def update_summary(conv_id: str, summary: str, summarized_until):
+    pool = await get_pool()
+    # Only move forward, so a slow fold can't overwrite a newer one
+    await pool.execute("""
+        update conversations
+        set summary = $2, summarized_until = $3
+        where id = $1
+          and (summarized_until is null or summarized_until < $3)
+    """, uuid.UUID(conv_id), summary, summarized_until)
+    history_cache.set_summary(conv_id, summary, summarized_until)
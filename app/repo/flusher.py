@@ -0,0 +1,77 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from ..db import get_pool
+
+logger = logging.getLogger(__name__)
+
+class PeriodicFlusher(ABC):
+    """
+    Base for aggregates counted in memory and written to the database in
+    batches. Subclasses add to `_pending` and call `_started()`. They
+    implement `_write(pool, batch)`, and may override `_flushed(batch)`
+    to act on a batch once it is stored. A background task flushes every
+    `flush_seconds`, when woken, and on close. A failed write is retried,
+    then the batch is dropped.
+    """
+
+    # What the pending entries are, for log messages
+    what = "pending rows"
+
+    def __init__(self, flush_seconds: float, retries: int = 3):
+        self.flush_seconds = flush_seconds
+        self.retries = retries
+        self._pending: dict = {}
+        self._task: asyncio.Task | None = None
+        self._wake: asyncio.Event | None = None
+        self._stopping = False
+
+    def _started(self):
+        """Start the background flusher on first use."""
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Flush what is pending and stop the background flusher."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wake.set()
+        await self._task
+        self._task = None
+        self._stopping = False
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+        await self.flush()
+
+    async def flush(self):
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        for attempt in range(self.retries):
+            try:
+                pool = await get_pool()
+                await self._write(pool, batch)
+                break
+            except Exception:
+                logger.warning("%s flush failed (attempt %d/%d)", self.what, attempt + 1, self.retries, exc_info=True)
+                await asyncio.sleep(0.1 * 2 ** attempt)
+        else:
+            logger.error("dropping %s for %d keys", self.what, len(batch))
+            return
+        await self._flushed(batch)
+
+    @abstractmethod
+    async def _write(self, pool, batch: dict):
+        """Store one batch taken from `_pending`."""
+
+    async def _flushed(self, batch: dict):
+        pass
@@ -1,45 +1,281 @@
+import uuid
+from datetime import datetime
+from fastapi import HTTPException
+from ..config import settings
 from ..db import get_pool
+from ..services.metrics import timed_query
+from .cache import history_cache, ConversationEntry
+from .writer import message_writer
+from .analytics import analytics_rollup
+from ..services.context import estimate_tokens
+from .pagination import (
+    decode_cursor, encode_cursor, decode_rank_cursor, encode_rank_cursor, format_timestamp, timestamp_sql,
+)
+from . import conversations as conv_repo
 
-async def list_messages(conv_id: str, limit: int = 200):
+@timed_query
+async def newest_message(user_id: str, conv_id: str) -> dict | None:
+    """
+    Id and timestamp of the conversation's newest message, from the
+    (conversation_id, created_at, id) index. Messages are append-only, so
+    this versions every page of the listing. Raises 404 unless `user_id`
+    owns the conversation.
+    """
+    pool = await get_pool()
+    row = await pool.fetchrow("""
+      select c.user_id, m.id, m.created_at
+      from conversations c
+      left join lateral (
+        select id, created_at
+        from messages
+        where conversation_id = c.id
+        order by created_at desc, id desc
+        limit 1
+      ) m on true
+      where c.id = $1
+    """, conv_id)
+    if row is None or str(row["user_id"]) != user_id:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    if row["id"] is None:
+        return None
+    return {"id": str(row["id"]), "timestamp": format_timestamp(row["created_at"])}
+
+@timed_query
+async def list_messages_json(conv_id: str, limit: int = 200, cursor: str | None = None) -> tuple[bytes, str | None]:
+    """
+    Up to `limit` messages oldest first, starting after the keyset `cursor`
+    if given, serialized to a JSON array by Postgres so the rows go to the
+    client without becoming Python objects. Returns the body and the next
+    cursor, if there are more messages.
+    """
+    after_ts, after_id = decode_cursor(cursor)
+    pool = await get_pool()
+    row = await pool.fetchrow(f"""
+      with page as (
+        select id, role, content, created_at,
+               row_number() over (order by created_at asc, id asc) as n
+        from (
+          select id, role, content, created_at
+          from messages
+          where conversation_id=$1
+            and ($3::timestamptz is null or (created_at, id) > ($3, $4::uuid))
+          order by created_at asc, id asc
+          limit $2 + 1
+        ) rows
+      )
+      select
+        coalesce(
+          json_agg(json_build_object('id', id, 'role', role, 'content', content, 'timestamp', {timestamp_sql('created_at')})
+                   order by n) filter (where n <= $2),
+          '[]'
+        )::text as body,
+        bool_or(n > $2) as more,
+        max(created_at) filter (where n = $2) as last_ts,
+        max(id::text) filter (where n = $2) as last_id
+      from page
+    """, conv_id, limit, after_ts, after_id)
+
+    next_cursor = encode_cursor(format_timestamp(row["last_ts"]), row["last_id"]) if row["more"] else None
+    return row["body"].encode(), next_cursor
+
+
+@timed_query
+async def list_recent_messages(conv_id: str, since: datetime | None = None, limit: int = 100):
+    """
+    Newest `limit` messages created after `since`, returned oldest first.
+    """
+    pool = await get_pool()
+    rows = await pool.fetch("""
+      select id, role, content, created_at
+      from (
+        select id, role, content, created_at
+        from messages
+        where conversation_id=$1
+          and ($2::timestamptz is null or created_at > $2)
+        order by created_at desc
+        limit $3
+      ) recent
+      order by created_at asc
+    """, conv_id, since, limit)
+
+    return [
+        {
+            "id": str(r["id"]),
+            "role": r["role"],
+            "content": r["content"],
+            "timestamp": format_timestamp(r["created_at"]) if r["created_at"] else None,
+        }
+        for r in rows
+    ]
+
+
+@timed_query
+async def list_messages_between(conv_id: str, since: datetime | None, before: datetime, limit: int = 100):
+    """
+    Oldest `limit` messages created after `since` and before `before`,
+    oldest first.
+    """
     pool = await get_pool()
     rows = await pool.fetch("""
       select id, role, content, created_at
       from messages
       where conversation_id=$1
+        and ($2::timestamptz is null or created_at > $2)
+        and created_at < $3
       order by created_at asc
-      limit $2
-    """, conv_id, limit)
-    
+      limit $4
+    """, conv_id, since, before, limit)
+
     return [
         {
             "id": str(r["id"]),
             "role": r["role"],
             "content": r["content"],
-            # ✅ Always return as ISO string
-            "timestamp": r["created_at"].isoformat() if r["created_at"] else None,
+            "timestamp": format_timestamp(r["created_at"]) if r["created_at"] else None,
         }
         for r in rows
     ]
 
 
+@timed_query
 async def add_message(
     conv_id: str,
     role: str,
     content: str,
     token_count: int | None = None,
-    latency_ms: int | None = None
+    latency_ms: int | None = None,
+    prompt_tokens: int | None = None
 ):
+    if settings.MESSAGE_WRITE_BEHIND:
+        # Client-side id and timestamp let us answer before the row is
+        # written; the writer records analytics once it is
+        msg_id = uuid.uuid4()
+        created_at = message_writer.next_timestamp()
+        message_writer.submit((msg_id, conv_id, role, content, token_count, prompt_tokens, latency_ms, created_at))
+        saved = {
+            "id": str(msg_id),
+            "role": role,
+            "content": content,
+            "timestamp": format_timestamp(created_at),
+        }
+        history_cache.append(str(conv_id), saved)
+        return saved
+
     pool = await get_pool()
     row = await pool.fetchrow("""
-      insert into messages(conversation_id, role, content, token_count, latency_ms)
-      values($1, $2, $3, $4, $5)
+      insert into messages(conversation_id, role, content, token_count, prompt_tokens, latency_ms)
+      values($1, $2, $3, $4, $5, $6)
       returning id, role, content, created_at
-    """, conv_id, role, content, token_count, latency_ms)
+    """, conv_id, role, content, token_count, prompt_tokens, latency_ms)
 
-    return {
+    saved = {
         "id": str(row["id"]),
         "role": row["role"],
         "content": row["content"],
         # ✅ Convert to string immediately
-        "timestamp": row["created_at"].isoformat() if row["created_at"] else None,
+        "timestamp": format_timestamp(row["created_at"]) if row["created_at"] else None,
     }
+    history_cache.append(str(conv_id), saved)
+    # The column only holds real counts; rollups make do with an estimate
+    tokens = estimate_tokens(content) if token_count is None else token_count
+    analytics_rollup.record(conv_id, role, content, tokens, latency_ms, row["created_at"])
+    return saved
+
+
+@timed_query
+async def search_messages(
+    user_id: str, query: str, domain: str | None = None, limit: int = 20, cursor: str | None = None
+) -> tuple[list[dict], str | None]:
+    """
+    The user's messages matching a web-style `query` (quoted phrases, OR,
+    -exclusions), most relevant first, with a highlighted snippet each.
+    Matches come from the GIN index on messages.search; snippets are only
+    built for the returned page. Returns the page and the next cursor.
+    """
+    after_rank, after_id = decode_rank_cursor(cursor)
+    pool = await get_pool()
+    rows = await pool.fetch("""
+      with page as (
+        select m.id, m.conversation_id, m.role, m.content, m.created_at, c.title, c.domain,
+               ts_rank_cd(m.search, q, 32) as rank
+        from messages m
+        join conversations c on c.id = m.conversation_id,
+             websearch_to_tsquery('english', $2) q
+        where c.user_id = $1
+          and m.search @@ q
+          and ($3::text is null or c.domain = $3)
+          and ($5::real is null or (ts_rank_cd(m.search, q, 32), m.id) < ($5::real, $6::uuid))
+        order by rank desc, m.id desc
+        limit $4 + 1
+      )
+      select id, conversation_id, role, created_at, title, domain, rank,
+             ts_headline('english', content, websearch_to_tsquery('english', $2),
+                         'StartSel=**, StopSel=**, MaxWords=30, MinWords=12, MaxFragments=2') as snippet
+      from page
+      order by rank desc, id desc
+    """, user_id, query, domain, limit, after_rank, after_id)
+
+    items = [
+        {
+            "id": str(r["id"]),
+            "conversation_id": str(r["conversation_id"]),
+            "conversation_title": r["title"],
+            "domain": r["domain"],
+            "role": r["role"],
+            "snippet": r["snippet"],
+            "rank": r["rank"],
+            "timestamp": format_timestamp(r["created_at"]) if r["created_at"] else None,
+        }
+        for r in rows[:limit]
+    ]
+    next_cursor = encode_rank_cursor(rows[limit - 1]["rank"], str(rows[limit - 1]["id"])) if len(rows) > limit else None
+    return items, next_cursor
+
+
+async def get_history(user_id: str, conv_id: str) -> ConversationEntry:
+    """
+    Cached conversation metadata and newest messages, loaded on first use.
+    Raises 404 unless `user_id` owns the conversation.
+    """
+    entry = history_cache.get(conv_id)
+    if entry is None:
+        token = history_cache.begin_load(conv_id)
+        try:
+            conv = await conv_repo.get_conversation(conv_id)
+            limit = history_cache.max_messages
+            rows = await list_recent_messages(conv_id, limit=limit + 1)
+            entry = ConversationEntry(
+                user_id=conv["user_id"],
+                domain=conv["domain"],
+                summary=conv["summary"],
+                summarized_until=conv["summarized_until"],
+                messages=rows[-limit:],
+                complete=len(rows) <= limit,
+            )
+        finally:
+            history_cache.finish_load(conv_id, entry, token)
+
+    if entry.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    return entry
+
+
+@timed_query
+async def list_openers(user_id: str, domain: str, limit: int = 200) -> list[str]:
+    """
+    First assistant message of the user's most recent conversations in
+    `domain`, used to avoid asking the same opening question twice.
+    """
+    pool = await get_pool()
+    rows = await pool.fetch("""
+      select content from (
+        select distinct on (m.conversation_id) m.content, c.updated_at
+        from conversations c
+        join messages m on m.conversation_id = c.id
+        where c.user_id=$1 and c.domain=$2 and m.role='assistant'
+        order by m.conversation_id, m.created_at asc
+      ) openers
+      order by updated_at desc
+      limit $3
+    """, user_id, domain, limit)
+    return [r["content"] for r in rows]
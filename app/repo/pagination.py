@@ -0,0 +1,53 @@
+import base64
+import uuid
+from datetime import datetime, timezone
+import orjson
+from fastapi import HTTPException
+
+def format_timestamp(ts: datetime) -> str:
+    """ISO 8601 in UTC with microseconds always written out."""
+    return ts.astimezone(timezone.utc).isoformat(timespec="microseconds")
+
+def timestamp_sql(column: str) -> str:
+    """
+    SQL for `format_timestamp(column)`, for rows Postgres serializes itself,
+    so a page reads the same whether it came from the cache or the database.
+    """
+    return f"""to_char({column} at time zone 'UTC', 'YYYY-MM-DD"T"HH24:MI:SS.US"+00:00"')"""
+
+def encode_cursor(ts: str, row_id: str) -> str:
+    """Opaque keyset cursor for a (timestamp, id) position."""
+    return base64.urlsafe_b64encode(orjson.dumps([ts, row_id])).decode().rstrip("=")
+
+def decode_cursor(cursor: str | None) -> tuple[datetime | None, uuid.UUID | None]:
+    if not cursor:
+        return None, None
+    try:
+        ts, row_id = orjson.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(ts), uuid.UUID(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def encode_rank_cursor(rank: float, row_id: str) -> str:
+    """Keyset cursor for a (rank, id) position in relevance-ordered results."""
+    return base64.urlsafe_b64encode(orjson.dumps([rank, row_id])).decode().rstrip("=")
+
+def decode_rank_cursor(cursor: str | None) -> tuple[float | None, uuid.UUID | None]:
+    if not cursor:
+        return None, None
+    try:
+        rank, row_id = orjson.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return float(rank), uuid.UUID(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def paginate(rows: list[dict], limit: int, ts_field: str) -> tuple[list[dict], str | None]:
+    """
+    Trim a `limit + 1` row fetch to one page and build the cursor for the
+    next page, or None when this is the last one.
+    """
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    last = page[-1]
+    return page, encode_cursor(last[ts_field], last["id"])
@@ -0,0 +1,160 @@
+import uuid
+from datetime import datetime
+from fastapi import HTTPException
+from ..db import get_pool
+from ..services.metrics import timed_query
+
+def _parse_id(conv_id: str) -> uuid.UUID:
+    try:
+        return uuid.UUID(str(conv_id))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid conversation ID")
+
+@timed_query
+async def enqueue(user_id: str, conv_id: str, reason: str) -> bool:
+    """
+    Queue a conversation for scoring. False if it is already queued or
+    running (the job is deduplicated per conversation); 404 unless
+    `user_id` owns the conversation.
+    """
+    conv_id = _parse_id(conv_id)
+    pool = await get_pool()
+    row = await pool.fetchrow("""
+        with conv as (
+          select id, user_id from conversations where id = $1 and user_id = $2
+        ),
+        queued as (
+          insert into interview_scores as s (conversation_id, user_id, reason)
+          select id, user_id, $3 from conv
+          on conflict (conversation_id) do update set
+            status = 'queued', reason = excluded.reason, attempts = 0, error = null,
+            run_after = now(), updated_at = now()
+          where s.status not in ('queued', 'running')
+          returning s.conversation_id
+        )
+        select exists(select 1 from conv) as found, exists(select 1 from queued) as queued
+    """, conv_id, user_id, reason)
+
+    if not row["found"]:
+        raise HTTPException(status_code=404, detail="Conversation not found or not owned by user")
+    return row["queued"]
+
+@timed_query
+async def claim(conv_id: str):
+    """Move a queued job to running; None if another worker got it first."""
+    pool = await get_pool()
+    return await pool.fetchrow("""
+        update interview_scores
+        set status = 'running', attempts = attempts + 1, updated_at = now()
+        where conversation_id = $1 and status = 'queued' and run_after <= now()
+        returning conversation_id, user_id, attempts, scored_until
+    """, uuid.UUID(conv_id))
+
+@timed_query
+async def complete(conv_id: str, result: dict, scored_until: datetime):
+    pool = await get_pool()
+    await pool.execute("""
+        update interview_scores
+        set status = 'done', error = null, score = $2, summary = $3, strengths = $4,
+            improvements = $5, scored_until = $6, updated_at = now(), finished_at = now()
+        where conversation_id = $1
+    """, uuid.UUID(conv_id), result["score"], result["summary"], result["strengths"],
+        result["improvements"], scored_until)
+
+@timed_query
+async def finish(conv_id: str, status: str, error: str | None = None, retry_in: float = 0):
+    """
+    End a job without a new score: 'done' (nothing new to score), 'skipped',
+    'failed', or back to 'queued' to run again after `retry_in` seconds.
+    """
+    pool = await get_pool()
+    await pool.execute("""
+        update interview_scores
+        set status = $2, error = $3, updated_at = now(),
+            run_after = now() + make_interval(secs => $4),
+            finished_at = case when $2 = 'queued' then finished_at else now() end
+        where conversation_id = $1
+    """, uuid.UUID(conv_id), status, error, retry_in)
+
+@timed_query
+async def release(conv_id: str):
+    """
+    Put a running job back in the queue without counting the attempt its
+    claim took, for work interrupted by a shutdown rather than a failure.
+    """
+    pool = await get_pool()
+    await pool.execute("""
+        update interview_scores
+        set status = 'queued', attempts = greatest(attempts - 1, 0), updated_at = now(), run_after = now()
+        where conversation_id = $1 and status = 'running'
+    """, uuid.UUID(conv_id))
+
+@timed_query
+async def recover(stale_seconds: float) -> list[str]:
+    """
+    Ids of queued jobs that are due. Running jobs not touched for
+    `stale_seconds` lost their worker and are queued again first.
+    """
+    pool = await get_pool()
+    rows = await pool.fetch("""
+        with stale as (
+          update interview_scores
+          set status = 'queued', updated_at = now()
+          where status = 'running' and updated_at < now() - make_interval(secs => $1)
+          returning conversation_id
+        )
+        select conversation_id from interview_scores where status = 'queued' and run_after <= now()
+        union
+        select conversation_id from stale
+    """, stale_seconds)
+    return [str(r["conversation_id"]) for r in rows]
+
+@timed_query
+async def idle_conversations(idle_seconds: float, lookback_seconds: float, min_answers: int, limit: int = 100):
+    """
+    (conversation_id, user_id) of conversations that went quiet
+    `idle_seconds` ago, within the lookback window, and have new messages
+    since they were last scored. Reads the analytics rollups, not messages.
+    """
+    pool = await get_pool()
+    rows = await pool.fetch("""
+        select s.conversation_id, s.user_id
+        from conversation_stats s
+        left join interview_scores e using (conversation_id)
+        where s.last_message_at < now() - make_interval(secs => $1)
+          and s.last_message_at > now() - make_interval(secs => $1 + $2)
+          and s.user_turns >= $3
+          and (e.conversation_id is null
+               or (e.status not in ('queued', 'running') and e.updated_at < s.last_message_at))
+        order by s.last_message_at
+        limit $4
+    """, idle_seconds, lookback_seconds, min_answers, limit)
+    return [(str(r["conversation_id"]), str(r["user_id"])) for r in rows]
+
+@timed_query
+async def get_score(user_id: str, conv_id: str) -> dict:
+    conv_id = _parse_id(conv_id)
+    pool = await get_pool()
+    row = await pool.fetchrow("""
+        select conversation_id, status, reason, attempts, error, score, summary, strengths,
+               improvements, scored_until, updated_at, finished_at
+        from interview_scores
+        where conversation_id = $1 and user_id = $2
+    """, conv_id, user_id)
+    if not row:
+        raise HTTPException(status_code=404, detail="No evaluation for this conversation")
+
+    return {
+        "conversation_id": str(row["conversation_id"]),
+        "status": row["status"],
+        "reason": row["reason"],
+        "attempts": row["attempts"],
+        "error": row["error"],
+        "score": row["score"],
+        "summary": row["summary"],
+        "strengths": list(row["strengths"] or []),
+        "improvements": list(row["improvements"] or []),
+        "scored_until": row["scored_until"].isoformat() if row["scored_until"] else None,
+        "updated_at": row["updated_at"].isoformat(),
+        "finished_at": row["finished_at"].isoformat() if row["finished_at"] else None,
+    }
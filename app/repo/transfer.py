@@ -0,0 +1,303 @@
+import asyncio
+import time
+import uuid
+from datetime import datetime, timezone
+import orjson
+from fastapi import HTTPException
+from ..config import settings
+from ..db import get_pool
+from ..services import metrics
+from . import analytics
+from .cache import history_cache
+
+# Bulk export/import of a user's conversations as NDJSON, one record per
+# line: an "export" header, then every "conversation", then every
+# "message". Both directions stream, so memory stays flat whatever the
+# history size.
+
+FORMAT_VERSION = 1
+
+EXPORT_CONVERSATIONS = """
+  select id, title, domain, summary, summarized_until, created_at, updated_at
+  from conversations
+  where user_id = $1
+  order by created_at, id
+"""
+
+EXPORT_MESSAGES = """
+  select m.id, m.conversation_id, m.role, m.content, m.token_count, m.prompt_tokens, m.latency_ms, m.created_at
+  from messages m
+  join conversations c on c.id = m.conversation_id
+  where c.user_id = $1
+  order by m.conversation_id, m.created_at, m.id
+"""
+
+CONVERSATION_COLUMNS = ("id", "title", "domain", "summary", "summarized_until", "created_at", "updated_at")
+MESSAGE_COLUMNS = (
+    "id", "conversation_id", "role", "content", "token_count", "prompt_tokens", "latency_ms", "created_at",
+)
+
+CREATE_STAGING = """
+  create temp table import_conversations (
+    id uuid, title text, domain text, summary text, summarized_until timestamptz,
+    created_at timestamptz, updated_at timestamptz
+  ) on commit drop;
+  create temp table import_messages (
+    id uuid, conversation_id uuid, role text, content text, token_count int, prompt_tokens int,
+    latency_ms int, created_at timestamptz
+  ) on commit drop;
+  create temp table import_inserted (
+    conversation_id uuid, role text, chars int, tokens int, latency_ms int, created_at timestamptz
+  ) on commit drop;
+"""
+
+# Conversations whose id belongs to another account (an export moved between
+# accounts on the same database) get a new id derived from the importing
+# user and the old id, and so do their messages. Derived rather than random
+# so that importing the same file twice still maps onto the same rows.
+REMAP_CONVERSATIONS = """
+  update import_conversations t
+  set id = md5($1::text || t.id::text)::uuid
+  from conversations c
+  where c.id = t.id and c.user_id <> $1::uuid
+"""
+
+REMAP_MESSAGES = """
+  update import_messages t
+  set id = md5($1::text || t.id::text)::uuid,
+      conversation_id = md5($1::text || t.conversation_id::text)::uuid
+  from conversations c
+  where c.id = t.conversation_id and c.user_id <> $1::uuid
+"""
+
+# Existing ids are left alone, so re-running an import is harmless. Messages
+# only land in conversations the importing user owns.
+INSERT_CONVERSATIONS = """
+  insert into conversations (id, user_id, title, domain, summary, summarized_until, created_at, updated_at)
+  select id, $1, title, domain, summary, summarized_until, created_at, updated_at
+  from import_conversations
+  on conflict (id) do nothing
+"""
+
+# What was actually inserted is kept in import_inserted for the analytics
+# rollups; tokens are estimated the way add_message does when absent.
+INSERT_MESSAGES = """
+  with inserted as (
+    insert into messages (id, conversation_id, role, content, token_count, prompt_tokens, latency_ms, created_at)
+    select t.id, t.conversation_id, t.role, t.content, t.token_count, t.prompt_tokens, t.latency_ms, t.created_at
+    from import_messages t
+    join conversations c on c.id = t.conversation_id and c.user_id = $1
+    on conflict (id) do nothing
+    returning conversation_id, role, content, token_count, latency_ms, created_at
+  )
+  insert into import_inserted
+  select conversation_id, role, length(content), coalesce(token_count, length(content) / 4 + 1), latency_ms, created_at
+  from inserted
+"""
+
+# Per-conversation totals of the imported messages, in the shape
+# analytics.fold_totals takes. width_bucket over the bounds matches the
+# bisect_right bucketing of live messages.
+IMPORTED_TOTALS = """
+  select conversation_id,
+    count(*) filter (where role = 'user') as user_turns,
+    count(*) filter (where role = 'assistant') as assistant_turns,
+    coalesce(sum(chars) filter (where role = 'user'), 0) as user_chars,
+    coalesce(sum(chars) filter (where role = 'assistant'), 0) as assistant_chars,
+    coalesce(sum(tokens) filter (where role = 'user'), 0) as user_tokens,
+    coalesce(sum(tokens) filter (where role = 'assistant'), 0) as assistant_tokens,
+    count(latency_ms) as latency_count,
+    coalesce(sum(latency_ms), 0) as latency_sum_ms,
+    array_agg(width_bucket(latency_ms, $1::int[])) filter (where latency_ms is not null) as latency_buckets,
+    min(created_at) as first_at,
+    max(created_at) as last_at
+  from import_inserted
+  where role in ('user', 'assistant')
+  group by conversation_id
+"""
+
+_slots: asyncio.Semaphore | None = None
+
+def _transfer_slots() -> asyncio.Semaphore:
+    """Bounds concurrent exports and imports; each holds a pooled connection while the client is slow."""
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(settings.TRANSFER_MAX_CONCURRENT)
+    return _slots
+
+def _line(kind: str, record) -> bytes:
+    return orjson.dumps({"type": kind, **record}, option=orjson.OPT_APPEND_NEWLINE)
+
+async def export_ndjson(user_id: str):
+    """
+    NDJSON lines for all of a user's conversations and messages, read
+    through server-side cursors in one read-only repeatable-read
+    transaction (a consistent snapshot) and yielded in chunks of about
+    EXPORT_CHUNK_BYTES.
+    """
+    header = {"version": FORMAT_VERSION, "exported_at": datetime.now(timezone.utc)}
+    buf = bytearray(_line("export", header))
+    async with _transfer_slots():
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction(isolation="repeatable_read", readonly=True):
+                for kind, query in (("conversation", EXPORT_CONVERSATIONS), ("message", EXPORT_MESSAGES)):
+                    async for r in conn.cursor(query, user_id, prefetch=settings.EXPORT_PREFETCH):
+                        buf += _line(kind, dict(r))
+                        if len(buf) >= settings.EXPORT_CHUNK_BYTES:
+                            yield bytes(buf)
+                            buf.clear()
+    if buf:
+        yield bytes(buf)
+
+async def _lines(chunks):
+    """Split a byte stream into lines, enforcing IMPORT_MAX_BYTES and IMPORT_MAX_LINE_BYTES."""
+    buf = bytearray()
+    total = 0
+    async for chunk in chunks:
+        total += len(chunk)
+        if total > settings.IMPORT_MAX_BYTES:
+            raise HTTPException(status_code=413, detail=f"Import larger than {settings.IMPORT_MAX_BYTES} bytes")
+        buf += chunk
+        start = 0
+        while (end := buf.find(b"\n", start)) != -1:
+            yield bytes(buf[start:end])
+            start = end + 1
+        del buf[:start]
+        if len(buf) > settings.IMPORT_MAX_LINE_BYTES:
+            raise HTTPException(status_code=413, detail=f"Line longer than {settings.IMPORT_MAX_LINE_BYTES} bytes")
+    if buf:
+        yield bytes(buf)
+
+def _uuid(value) -> uuid.UUID:
+    return uuid.UUID(value) if value else uuid.uuid4()
+
+def _ts(value) -> datetime | None:
+    return datetime.fromisoformat(value) if value else None
+
+def _int(value) -> int | None:
+    if value is None:
+        return None
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise ValueError(f"expected an integer, got {value!r}")
+    return value
+
+def _conversation_row(rec: dict) -> tuple:
+    now = datetime.now(timezone.utc)
+    return (
+        _uuid(rec.get("id")),
+        str(rec.get("title") or "Imported interview"),
+        str(rec.get("domain") or "general"),
+        rec.get("summary"),
+        _ts(rec.get("summarized_until")),
+        _ts(rec.get("created_at")) or now,
+        _ts(rec.get("updated_at")) or now,
+    )
+
+def _message_row(rec: dict) -> tuple:
+    if rec.get("role") not in ("user", "assistant"):
+        raise ValueError(f"unsupported role {rec.get('role')!r}")
+    if not isinstance(rec.get("content"), str):
+        raise ValueError("content must be a string")
+    return (
+        _uuid(rec.get("id")),
+        uuid.UUID(rec["conversation_id"]),
+        rec["role"],
+        rec["content"],
+        _int(rec.get("token_count")),
+        _int(rec.get("prompt_tokens")),
+        _int(rec.get("latency_ms")),
+        _ts(rec.get("created_at")) or datetime.now(timezone.utc),
+    )
+
+def _count(status: str) -> int:
+    # "INSERT 0 <rows>", "UPDATE <rows>"
+    return int(status.rsplit(" ", 1)[-1])
+
+async def import_ndjson(user_id: str, chunks) -> dict:
+    """
+    Load an export (from this or another account) into `user_id`'s
+    account; ids taken by another account are remapped. Lines are parsed as they arrive and written in batches of
+    IMPORT_BATCH_ROWS with COPY into staging tables, then inserted from
+    there. Runs in one transaction: a bad line rolls back the whole import.
+    """
+    started = time.perf_counter()
+    counts = {
+        "conversations": 0, "messages": 0, "skipped_conversations": 0, "skipped_messages": 0,
+        "remapped_conversations": 0,
+    }
+    conversations: list[tuple] = []
+    messages: list[tuple] = []
+    touched: set[str] = set()
+
+    pool = await get_pool()
+    async with _transfer_slots(), pool.acquire() as conn:
+
+        async def flush_conversations():
+            if not conversations:
+                return
+            await conn.copy_records_to_table("import_conversations", records=conversations, columns=CONVERSATION_COLUMNS)
+            counts["remapped_conversations"] += _count(await conn.execute(REMAP_CONVERSATIONS, user_id))
+            inserted = _count(await conn.execute(INSERT_CONVERSATIONS, user_id))
+            await conn.execute("truncate import_conversations")
+            counts["conversations"] += inserted
+            counts["skipped_conversations"] += len(conversations) - inserted
+            conversations.clear()
+
+        async def flush_messages():
+            if not messages:
+                return
+            await flush_conversations()  # a batch may reference conversations still buffered
+            await conn.copy_records_to_table("import_messages", records=messages, columns=MESSAGE_COLUMNS)
+            await conn.execute(REMAP_MESSAGES, user_id)
+            inserted = _count(await conn.execute(INSERT_MESSAGES, user_id))
+            await conn.execute("truncate import_messages")
+            counts["messages"] += inserted
+            counts["skipped_messages"] += len(messages) - inserted
+            messages.clear()
+
+        async with conn.transaction():
+            await conn.execute(CREATE_STAGING)
+            line_no = 0
+            async for line in _lines(chunks):
+                line_no += 1
+                if not line.strip():
+                    continue
+                try:
+                    rec = orjson.loads(line)
+                    if not isinstance(rec, dict):
+                        raise ValueError("expected a JSON object")
+                    kind = rec.get("type")
+                    if kind == "conversation":
+                        conversations.append(_conversation_row(rec))
+                    elif kind == "message":
+                        messages.append(_message_row(rec))
+                        touched.add(rec["conversation_id"])
+                    elif kind == "export":
+                        if rec.get("version", FORMAT_VERSION) > FORMAT_VERSION:
+                            raise ValueError(f"unsupported export version {rec['version']}")
+                    else:
+                        raise ValueError(f"unknown record type {kind!r}")
+                except (orjson.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+                    raise HTTPException(status_code=400, detail=f"Line {line_no}: {e}")
+
+                if len(conversations) >= settings.IMPORT_BATCH_ROWS:
+                    await flush_conversations()
+                if len(messages) >= settings.IMPORT_BATCH_ROWS:
+                    await flush_messages()
+            await flush_conversations()
+            await flush_messages()
+            # Imported history counts in the rollups like live messages do
+            if settings.ANALYTICS_ENABLED and counts["messages"]:
+                totals = await conn.fetch(IMPORTED_TOTALS, list(analytics.LATENCY_BOUNDS_MS))
+                await analytics.fold_totals(conn, totals)
+
+    # Cached history of conversations that just gained messages is stale
+    for conv_id in touched:
+        history_cache.evict(conv_id)
+
+    elapsed = time.perf_counter() - started
+    # A whole streamed import; as one db_query_seconds sample it would skew that histogram
+    metrics.IMPORT_SECONDS.observe(elapsed)
+    rows = counts["conversations"] + counts["messages"]
+    return {**counts, "seconds": round(elapsed, 3), "rows_per_second": round(rows / elapsed) if elapsed else None}
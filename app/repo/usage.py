@@ -0,0 +1,195 @@
+import logging
+import uuid
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from fastapi import HTTPException
+from ..config import settings
+from ..db import get_pool
+from ..services import metrics
+from ..services.metrics import timed_query
+from .flusher import PeriodicFlusher
+
+logger = logging.getLogger(__name__)
+
+FLUSH_USAGE = """
+  insert into token_usage as u (user_id, day, domain, requests, prompt_tokens, completion_tokens)
+  select * from unnest($1::uuid[], $2::date[], $3::text[], $4::int[], $5::bigint[], $6::bigint[])
+  on conflict (user_id, day, domain) do update set
+    requests = u.requests + excluded.requests,
+    prompt_tokens = u.prompt_tokens + excluded.prompt_tokens,
+    completion_tokens = u.completion_tokens + excluded.completion_tokens
+"""
+
+USED_ON_DAY = """
+  select user_id, sum(prompt_tokens + completion_tokens) as used
+  from token_usage
+  where user_id = any($1::uuid[]) and day = $2
+  group by user_id
+"""
+
+def _today() -> date:
+    return datetime.now(timezone.utc).date()
+
+def _seconds_to_midnight() -> int:
+    now = datetime.now(timezone.utc)
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), timezone.utc)
+    return max(1, int((midnight - now).total_seconds()))
+
+class UsageMeter(PeriodicFlusher):
+    """
+    Provider token usage per user, UTC day and domain. Replies add to
+    in-memory counters that are flushed to token_usage in one statement
+    every `flush_seconds`. The same counters answer the daily quota check,
+    so it needs no database round trip once a user's total for the day is
+    known. Totals are re-read after each flush to pick up other workers.
+    """
+
+    what = "token usage"
+
+    def __init__(self, flush_seconds: float, max_users: int, retries: int = 3):
+        super().__init__(flush_seconds, retries)
+        self.max_users = max_users
+        # (user_id, day, domain) -> [requests, prompt_tokens, completion_tokens]
+        self._pending: dict[tuple[str, date, str], list[int]] = {}
+        # user_id -> tokens used on self._day, least recently active first
+        self._used: "OrderedDict[str, int]" = OrderedDict()
+        self._day = _today()
+
+    def record(self, user_id: str, domain: str | None, prompt_tokens: int, completion_tokens: int):
+        self._roll()
+        user_id = user_id.lower()
+        delta = self._pending.setdefault((user_id, self._day, domain or "general"), [0, 0, 0])
+        delta[0] += 1
+        delta[1] += prompt_tokens
+        delta[2] += completion_tokens
+        if user_id in self._used:
+            self._used[user_id] += prompt_tokens + completion_tokens
+            self._used.move_to_end(user_id)
+        metrics.LLM_TOKENS.labels("prompt").inc(prompt_tokens)
+        metrics.LLM_TOKENS.labels("completion").inc(completion_tokens)
+        self._started()
+
+    async def check(self, user_id: str):
+        """Raise 429 once `user_id` has used up today's USAGE_DAILY_TOKEN_QUOTA."""
+        quota = settings.USAGE_DAILY_TOKEN_QUOTA
+        if not quota:
+            return
+        self._roll()
+        user_id = user_id.lower()
+        used = self._used.get(user_id)
+        if used is None:
+            used = await self._load(user_id)
+        else:
+            self._used.move_to_end(user_id)
+        if used >= quota:
+            metrics.USAGE_QUOTA_REJECTIONS.inc()
+            raise HTTPException(
+                status_code=429,
+                detail="Daily token quota used up, it resets at 00:00 UTC",
+                headers={"Retry-After": str(_seconds_to_midnight())},
+            )
+
+    def used_today(self, user_id: str) -> int | None:
+        """Tokens `user_id` used today, if already known in memory."""
+        self._roll()
+        return self._used.get(user_id.lower())
+
+    def _roll(self):
+        today = _today()
+        if today != self._day:
+            self._day = today
+            self._used.clear()
+
+    def _unflushed(self, user_id: str) -> int:
+        return sum(
+            d[1] + d[2] for (uid, day, _), d in self._pending.items() if uid == user_id and day == self._day
+        )
+
+    async def _load(self, user_id: str) -> int:
+        """Today's total from the database plus what this worker hasn't flushed yet."""
+        day = self._day
+        try:
+            totals = await _used_on_day([user_id], day)
+        except Exception:
+            # Quotas control cost, not access: let the turn through
+            logger.warning("could not load token usage for the quota check", exc_info=True)
+            return 0
+        used = totals.get(user_id, 0) + self._unflushed(user_id)
+        if day == self._day:
+            self._used[user_id] = used
+            self._used.move_to_end(user_id)
+            while len(self._used) > self.max_users:
+                self._used.popitem(last=False)
+        return used
+
+    async def _write(self, pool, batch: dict):
+        keys = list(batch)
+        await pool.execute(
+            FLUSH_USAGE,
+            [uuid.UUID(k[0]) for k in keys],
+            [k[1] for k in keys],
+            [k[2] for k in keys],
+            [batch[k][0] for k in keys],
+            [batch[k][1] for k in keys],
+            [batch[k][2] for k in keys],
+        )
+
+    async def _flushed(self, batch: dict):
+        # Resync quota totals with what every worker has flushed
+        day = self._day
+        users = [u for u in {k[0] for k in batch} if u in self._used]
+        if not users:
+            return
+        try:
+            totals = await _used_on_day(users, day)
+        except Exception:
+            logger.warning("could not refresh token usage totals", exc_info=True)
+            return
+        if day == self._day:
+            for user_id in users:
+                if user_id in self._used:
+                    self._used[user_id] = totals.get(user_id, 0) + self._unflushed(user_id)
+
+usage_meter = UsageMeter(
+    flush_seconds=settings.USAGE_FLUSH_SECONDS,
+    max_users=settings.USAGE_MAX_USERS,
+)
+
+@timed_query
+async def _used_on_day(user_ids: list[str], day: date) -> dict[str, int]:
+    pool = await get_pool()
+    rows = await pool.fetch(USED_ON_DAY, [uuid.UUID(u) for u in user_ids], day)
+    return {str(r["user_id"]): int(r["used"]) for r in rows}
+
+@timed_query
+async def get_usage(user_id: str, days: int = 30) -> dict:
+    """Per-day, per-domain token usage for the last `days` days, newest first."""
+    pool = await get_pool()
+    rows = await pool.fetch("""
+        select day, domain, requests, prompt_tokens, completion_tokens
+        from token_usage
+        where user_id = $1 and day > $2
+        order by day desc, domain
+    """, user_id, _today() - timedelta(days=days))
+
+    today = usage_meter.used_today(user_id)
+    if today is None:
+        today = sum(r["prompt_tokens"] + r["completion_tokens"] for r in rows if r["day"] == _today())
+    quota = settings.USAGE_DAILY_TOKEN_QUOTA or None
+    return {
+        "today": {
+            "used": today,
+            "quota": quota,
+            "remaining": max(0, quota - today) if quota else None,
+        },
+        "days": [
+            {
+                "day": r["day"].isoformat(),
+                "domain": r["domain"],
+                "requests": r["requests"],
+                "prompt_tokens": r["prompt_tokens"],
+                "completion_tokens": r["completion_tokens"],
+            }
+            for r in rows
+        ],
+    }
@@ -1,5 +1,7 @@
 from ..db import get_pool
+from ..services.metrics import timed_query
 
+@timed_query
 async def create_user_profile(user_id: str, extra: dict | None = None):
     pool = await get_pool()
     await pool.execute(
@@ -7,6 +9,7 @@ async def create_user_profile(user_id: str, extra: dict | None = None):
         user_id, extra or {}
     )
 
+@timed_query
 async def get_user_profile(user_id: str):
     pool = await get_pool()
     return await pool.fetchrow("select * from user_profiles where user_id=$1", user_id)
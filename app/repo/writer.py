@@ -0,0 +1,113 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from ..config import settings
+from ..db import get_pool
+from ..services.context import estimate_tokens
+from .analytics import analytics_rollup
+from .cache import history_cache
+
+logger = logging.getLogger(__name__)
+
+INSERT_MESSAGE = """
+  insert into messages(id, conversation_id, role, content, token_count, prompt_tokens, latency_ms, created_at)
+  values($1, $2, $3, $4, $5, $6, $7, $8)
+"""
+
+class MessageWriter:
+    """
+    Write-behind queue for message inserts. Rows from all requests are
+    coalesced into executemany batches, flushed when `batch_size` rows are
+    waiting or `flush_ms` after the first one arrives. A single consumer
+    writes in submission order, so per-conversation order is preserved.
+    Rows reach the analytics rollups once they are stored; a dropped row
+    evicts its conversation from the history cache, which already shows it.
+    """
+
+    def __init__(self, batch_size: int, flush_ms: int, retries: int = 3):
+        self.batch_size = batch_size
+        self.flush_interval = flush_ms / 1000
+        self.retries = retries
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+        self._last_ts = datetime.min.replace(tzinfo=timezone.utc)
+
+    def next_timestamp(self) -> datetime:
+        """Strictly increasing created_at, so ordering survives batching."""
+        now = datetime.now(timezone.utc)
+        if now <= self._last_ts:
+            now = self._last_ts + timedelta(microseconds=1)
+        self._last_ts = now
+        return now
+
+    def submit(self, row: tuple):
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+        self._queue.put_nowait(row)
+
+    async def close(self):
+        """Flush everything still queued and stop the consumer."""
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+        self._queue = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            row = await self._queue.get()
+            if row is None:
+                break
+            batch = [row]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    row = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if row is None:
+                    stopping = True
+                    break
+                batch.append(row)
+            await self._flush(batch)
+
+    async def _flush(self, batch: list[tuple]):
+        for attempt in range(self.retries):
+            try:
+                pool = await get_pool()
+                await pool.executemany(INSERT_MESSAGE, batch)
+                for row in batch:
+                    _stored(row)
+                return
+            except Exception:
+                logger.warning("message batch insert failed (attempt %d/%d)", attempt + 1, self.retries, exc_info=True)
+                await asyncio.sleep(0.1 * 2 ** attempt)
+
+        # Isolate bad rows (e.g. conversation deleted meanwhile) from good ones
+        pool = await get_pool()
+        for row in batch:
+            try:
+                await pool.execute(INSERT_MESSAGE, *row)
+            except Exception:
+                logger.exception("dropping message %s for conversation %s", row[0], row[1])
+                history_cache.evict(str(row[1]))
+            else:
+                _stored(row)
+
+def _stored(row: tuple):
+    _, conv_id, role, content, token_count, _, latency_ms, created_at = row
+    # The column only holds real counts; rollups make do with an estimate
+    tokens = estimate_tokens(content) if token_count is None else token_count
+    analytics_rollup.record(conv_id, role, content, tokens, latency_ms, created_at)
+
+message_writer = MessageWriter(
+    batch_size=settings.WRITE_BATCH_SIZE,
+    flush_ms=settings.WRITE_FLUSH_MS,
+)
@@ -0,0 +1,19 @@
+import asyncio
+
+# Strong references to fire-and-forget tasks; the event loop only keeps weak ones.
+_tasks: set[asyncio.Task] = set()
+
+def spawn(coro) -> asyncio.Task:
+    """
+    Run a coroutine detached from the current request so that it survives
+    client disconnects and response cancellation.
+    """
+    task = asyncio.create_task(coro)
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return task
+
+async def drain(timeout: float = 10.0):
+    """Wait for outstanding background tasks, used at shutdown."""
+    if _tasks:
+        await asyncio.wait(set(_tasks), timeout=timeout)
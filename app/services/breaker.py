@@ -0,0 +1,67 @@
+import math
+import time
+from ..config import settings
+from .metrics import Gauge
+
+class CircuitOpen(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__("LLM provider circuit is open")
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """
+    Fails fast after `threshold` consecutive provider failures. Once
+    `cooldown` seconds have passed a single trial call is let through; its
+    success closes the circuit, its failure opens it again.
+    """
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: float | None = None
+        self.trial_at: float | None = None
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if self.trial_at is not None else "open"
+
+    def allow(self):
+        """Raise CircuitOpen unless a call may go to the provider now."""
+        if self.opened_at is None:
+            return
+        now = time.monotonic()
+        remaining = self.opened_at + self.cooldown - now
+        # A trial that never reported back (e.g. cancelled) does not block forever
+        trial_pending = self.trial_at is not None and now - self.trial_at < self.cooldown
+        if remaining > 0 or trial_pending:
+            self.rejected += 1
+            raise CircuitOpen(max(1, math.ceil(remaining)))
+        self.trial_at = now
+
+    def success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_at = None
+
+    def failure(self):
+        self.failures += 1
+        if self.trial_at is not None or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+            self.trial_at = None
+
+    def stats(self) -> dict:
+        return {"state": self.state, "failures": self.failures, "rejected": self.rejected}
+
+llm_breaker = CircuitBreaker(
+    threshold=settings.LLM_BREAKER_THRESHOLD,
+    cooldown=settings.LLM_BREAKER_COOLDOWN,
+)
+
+LLM_CIRCUIT_OPEN = Gauge(
+    "llm_circuit_open", "1 while the LLM circuit breaker is failing fast",
+    collect=lambda: 0 if llm_breaker.state == "closed" else 1,
+)
@@ -1,47 +1,317 @@
-import google.generativeai as genai
+import asyncio
+import random
+import orjson
 from datetime import datetime
 from fastapi import HTTPException
 from ..config import settings
+from . import llm, fake_llm, metrics
+from .breaker import llm_breaker, CircuitOpen
+from .response_cache import response_cache, cache_key
 
 SYSTEM_PROMPT = (
     "You are an AI interviewer. Ask one question at a time for the chosen domain. "
-    "After a short exchange, give a brief score + actionable tips. "
+    "After each answer, give one or two sentences of feedback, then ask the next question; "
+    "the candidate gets a full score separately when the interview ends. "
     "Use bold text for section headers instead of markdown hashtags (#). Keep it conversational."
 )
 
-# Configure Gemini
-genai.configure(api_key=settings.GEMINI_API_KEY)
+SUMMARY_PROMPT = (
+    "Update the running summary of this mock interview. Keep the domain, the questions asked, "
+    "the key points of the candidate's answers and any scores or feedback given. "
+    "Reply with the updated summary only, in under 150 words."
+)
+
+EVALUATION_PROMPT = (
+    "You are grading a finished mock interview. Score the candidate from 1 (poor) to 10 (excellent) "
+    "on the substance, depth and clarity of their answers for the interview's domain. "
+    'Reply with JSON only: {"score": <1-10>, "summary": "<two or three sentences>", '
+    '"strengths": ["..."], "improvements": ["..."]}, with at most three items in each list.'
+)
+
+# Max chunks buffered between the upstream reader and the SSE consumer
+STREAM_QUEUE_SIZE = 32
+
+_END = object()
+
+def system_prompt(domain: str | None) -> str:
+    """Interviewer instruction for a domain; stable per domain so it caches well."""
+    if not domain:
+        return SYSTEM_PROMPT
+    return f"{SYSTEM_PROMPT} The interview domain is: {domain}."
+
+async def _gemini_text(messages: list[dict]):
+    """
+    Text chunks of one streamed Gemini call, then a usage dict
+    ({"prompt_tokens", "completion_tokens"}) if the provider reported one.
+    """
+    # System message -> system_instruction, the rest -> multi-turn contents
+    system_instruction, contents = llm.to_request(messages)
+    model = await llm.get_chat_model(system_instruction or SYSTEM_PROMPT)
+    response = await model.generate_content_async(contents, stream=True)
+    usage = None
+    async for chunk in response:
+        # Trailing chunks may carry only metadata (finish reason, usage) and
+        # no candidates, where chunk.parts / chunk.text raise ValueError
+        text = "".join(part.text for part in chunk.candidates[0].content.parts) if chunk.candidates else ""
+        if text:
+            yield text
+        usage = _usage(chunk) or usage
+    if usage is not None:
+        yield usage
+
+def _usage(response) -> dict | None:
+    """The token usage a Gemini response (or stream chunk) reported, if any."""
+    meta = response.usage_metadata
+    if not meta or not meta.total_token_count:
+        return None
+    return {"prompt_tokens": meta.prompt_token_count, "completion_tokens": meta.candidates_token_count}
+
+def _provider():
+    return fake_llm.stream_text if settings.LLM_PROVIDER == "fake" else _gemini_text
+
+async def _pump(texts, queue: asyncio.Queue):
+    """
+    Read the upstream stream into a bounded queue. Reads happen in their own
+    task so that cancelling it aborts the in-flight gRPC call.
+    """
+    try:
+        async for text in texts:
+            await queue.put(text)
+    except Exception as e:
+        await queue.put(e)
+    else:
+        await queue.put(_END)
+
+class _Attempt:
+    """One upstream call, read by a background task."""
+
+    def __init__(self, messages: list[dict]):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+        self.reader = asyncio.create_task(_pump(_provider()(messages), self.queue))
+        self.pending: asyncio.Future | None = None
+
+    def next(self) -> asyncio.Future:
+        if self.pending is None:
+            self.pending = asyncio.ensure_future(self.queue.get())
+        return self.pending
+
+    def take(self):
+        item, self.pending = self.pending.result(), None
+        return item
+
+    def cancel(self):
+        # ✅ Stop paying for tokens nobody will read
+        self.reader.cancel()
+        if self.pending is not None:
+            self.pending.cancel()
+
+async def _first_item(messages: list[dict]) -> tuple[_Attempt, object]:
+    """
+    Start a call and wait for its first chunk. With LLM_HEDGE_AFTER set, a
+    second identical call starts if the first is still silent by then; the
+    first to produce a chunk wins and the other is cancelled.
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    deadline = started + settings.LLM_FIRST_TOKEN_TIMEOUT
+    hedge_at = started + settings.LLM_HEDGE_AFTER if settings.LLM_HEDGE_AFTER else None
+    attempts = [_Attempt(messages)]
+    error: Exception | None = None
+    try:
+        while attempts:
+            now = loop.time()
+            if now >= deadline:
+                metrics.LLM_TIMEOUTS.labels("first_token").inc()
+                raise asyncio.TimeoutError("no response before first-token deadline")
+            if hedge_at is not None and now >= hedge_at:
+                hedge_at = None
+                metrics.LLM_HEDGES.inc()
+                attempts.append(_Attempt(messages))
+            wake = deadline if hedge_at is None else min(deadline, hedge_at)
+            await asyncio.wait([a.next() for a in attempts], timeout=wake - now,
+                               return_when=asyncio.FIRST_COMPLETED)
+            for a in list(attempts):
+                if a.pending is None or not a.pending.done():
+                    continue
+                item = a.take()
+                attempts.remove(a)
+                if isinstance(item, Exception):
+                    a.cancel()
+                    error = item
+                    continue
+                return a, item
+        raise error
+    finally:
+        for a in attempts:
+            a.cancel()
+
+def _chunk(item: str | dict) -> dict:
+    """A text chunk, or the closing usage chunk (empty content) for a usage dict."""
+    chunk = {
+        "role": "assistant",
+        "content": item if isinstance(item, str) else "",
+        "timestamp": datetime.utcnow().isoformat(),
+    }
+    if isinstance(item, dict):
+        chunk["usage"] = item
+    return chunk
 
 async def stream_ollama(messages: list[dict]):
     """
-    Stream text chunks from Google Gemini API.
-    Kept name 'stream_ollama' for compatibility with main.py, 
-    but internally uses Gemini.
+    Stream text chunks from Google Gemini API, or replay them from the
+    response cache when it is enabled and this exact conversation state was
+    answered before. Only complete replies are cached. A model reply ends
+    with a chunk carrying the provider's token `usage` and no content.
+    """
+    if not response_cache.enabled:
+        async for chunk in _stream_gemini(messages):
+            yield chunk
+        return
+
+    key = cache_key(messages)
+    cached = await response_cache.get(key)
+    if cached is not None:
+        for text in cached:
+            yield _chunk(text)
+        yield _chunk({"prompt_tokens": 0, "completion_tokens": 0})
+        return
+
+    parts: list[str] = []
+    async for chunk in _stream_gemini(messages):
+        # Replays cost no provider tokens, so usage isn't cached
+        if chunk["content"]:
+            parts.append(chunk["content"])
+        yield chunk
+    await response_cache.set(key, tuple(parts))
+
+def _retryable(e: Exception) -> bool:
+    # Imported here, like the SDK itself, to keep it off the cold-start path
+    from google.api_core import exceptions as api_exceptions
+    return isinstance(e, (
+        asyncio.TimeoutError,
+        OSError,
+        api_exceptions.ServerError,
+        api_exceptions.TooManyRequests,
+    ))
+
+def _upstream_error(e: Exception) -> HTTPException:
+    if isinstance(e, CircuitOpen):
+        return HTTPException(
+            status_code=503,
+            detail="The interviewer is temporarily unavailable, please retry shortly",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    if isinstance(e, asyncio.TimeoutError):
+        return HTTPException(status_code=504, detail="Gemini API timed out")
+    return HTTPException(status_code=502, detail=f"Gemini API error: {str(e)}")
+
+async def _stream_gemini(messages: list[dict]):
+    """
+    Stream reply chunks from the configured provider (Gemini, or the local
+    fake), bypassing the response cache; stream_ollama wraps this.
+
+    Failures before the first chunk are retried with jittered backoff, since
+    the client has received nothing yet; after that an error ends the reply.
+    Every call goes through the circuit breaker. Closing this generator
+    (e.g. on client disconnect) cancels the upstream generation.
     """
+    for attempt in range(settings.LLM_RETRIES + 1):
+        try:
+            llm_breaker.allow()
+            stream, item = await _first_item(messages)
+            break
+        except CircuitOpen as e:
+            raise _upstream_error(e)
+        except Exception as e:
+            if _retryable(e):
+                llm_breaker.failure()
+            if attempt == settings.LLM_RETRIES or not _retryable(e):
+                raise _upstream_error(e)
+            metrics.LLM_RETRIES.inc()
+            # Full jitter keeps retries from many streams from arriving in lockstep
+            await asyncio.sleep(random.uniform(0, settings.LLM_RETRY_BACKOFF * 2 ** attempt))
+    llm_breaker.success()
+
     try:
-        model = genai.GenerativeModel('gemini-flash-latest')
-        
-        # Convert messages to Gemini format
-        # Gemini expects history as list of Content objects, but we can use simple generation for now
-        # or construct a chat session. For simplicity in this stateless API, we'll format the prompt.
-        
-        # Simple prompt construction
-        full_prompt = f"System: {SYSTEM_PROMPT}\n"
-        for m in messages:
-            role = "User" if m["role"] == "user" else "Model"
-            if m["role"] == "system": continue # already added
-            full_prompt += f"{role}: {m['content']}\n"
-        full_prompt += "Model: "
-
-        response = model.generate_content(full_prompt, stream=True)
-
-        for chunk in response:
-            if chunk.text:
-                yield {
-                    "role": "assistant",
-                    "content": chunk.text,
-                    "timestamp": datetime.utcnow().isoformat(),
-                }
+        while item is not _END:
+            if isinstance(item, Exception):
+                if _retryable(item):
+                    llm_breaker.failure()
+                raise _upstream_error(item)
+            yield _chunk(item)
+            try:
+                await asyncio.wait_for(asyncio.shield(stream.next()), settings.LLM_CHUNK_TIMEOUT)
+            except asyncio.TimeoutError as e:
+                metrics.LLM_TIMEOUTS.labels("chunk").inc()
+                llm_breaker.failure()
+                raise _upstream_error(e)
+            item = stream.take()
+    finally:
+        stream.cancel()
 
+async def summarize(summary: str | None, turns: list[dict]) -> tuple[str, dict | None]:
+    """
+    Fold `turns` into an existing conversation summary with a single
+    non-streaming call, bounded by SUMMARY_TIMEOUT and counted by the
+    circuit breaker like chat turns. Returns the new summary and the token
+    usage the provider reported, if any. Raises CircuitOpen while the
+    breaker is failing fast.
+    """
+    prompt = f"Current summary:\n{summary or '(none)'}\n\nNew turns:\n" + _transcript(turns)
+
+    llm_breaker.allow()
+    try:
+        if settings.LLM_PROVIDER == "fake":
+            text, usage = await asyncio.wait_for(fake_llm.summarize(prompt), settings.SUMMARY_TIMEOUT), None
+        else:
+            model = llm.get_model(SUMMARY_PROMPT)
+            response = await asyncio.wait_for(model.generate_content_async(prompt), settings.SUMMARY_TIMEOUT)
+            text, usage = response.text, _usage(response)
     except Exception as e:
-        raise HTTPException(status_code=502, detail=f"Gemini API error: {str(e)}")
+        if _retryable(e):
+            llm_breaker.failure()
+        raise
+    llm_breaker.success()
+    return text.strip(), usage
+
+def _transcript(turns: list[dict]) -> str:
+    return "\n".join(
+        f"{'Candidate' if m['role'] == 'user' else 'Interviewer'}: {m['content']}" for m in turns
+    )
+
+async def evaluate(domain: str | None, turns: list[dict]) -> tuple[str, dict | None]:
+    """
+    Score a finished interview with a single non-streaming call, outside
+    the chat path. Returns the model's reply and the token usage the
+    provider reported, if any; parse the reply with parse_evaluation.
+    """
+    prompt = f"Interview domain: {domain or 'general'}\n\nTranscript:\n" + _transcript(turns)
+    if settings.LLM_PROVIDER == "fake":
+        return await fake_llm.evaluate(prompt), None
+    model = llm.get_model(EVALUATION_PROMPT)
+    response = await asyncio.wait_for(
+        model.generate_content_async(prompt, generation_config={"response_mime_type": "application/json"}),
+        settings.EVAL_TIMEOUT,
+    )
+    return response.text, _usage(response)
+
+def parse_evaluation(text: str) -> dict:
+    text = text.strip().removeprefix("```json").removeprefix("```").removesuffix("```")
+    try:
+        raw = orjson.loads(text)
+        score = int(raw["score"])
+    except (orjson.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"unusable evaluation: {e}") from e
+    if not 1 <= score <= 10:
+        raise ValueError(f"score out of range: {score}")
+
+    def items(key: str) -> list[str]:
+        values = raw.get(key) or []
+        return [str(v).strip() for v in values if str(v).strip()][:3] if isinstance(values, list) else []
+
+    return {
+        "score": score,
+        "summary": str(raw.get("summary") or "").strip(),
+        "strengths": items("strengths"),
+        "improvements": items("improvements"),
+    }
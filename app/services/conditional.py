@@ -0,0 +1,44 @@
+import hashlib
+from datetime import datetime
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import Request, Response
+
+# Listings are per user and change often: let the browser keep a copy but
+# revalidate it on every use, so unchanged data costs a 304 and no rows.
+CACHE_CONTROL = "private, no-cache"
+
+def etag(*parts) -> str:
+    """Weak validator over the values a listing depends on (weak: gzip may re-encode it)."""
+    digest = hashlib.blake2b("|".join(map(str, parts)).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+def http_date(ts: datetime | str | None) -> str | None:
+    if ts is None:
+        return None
+    if isinstance(ts, str):
+        ts = datetime.fromisoformat(ts)
+    return format_datetime(ts.replace(microsecond=0), usegmt=True)
+
+def is_fresh(request: Request, tag: str, last_modified: str | None = None) -> bool:
+    """RFC 9110 precedence: If-None-Match when present, else If-Modified-Since."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        candidates = {t.strip() for t in if_none_match.split(",")}
+        # Weak comparison: W/"x" and "x" match
+        return "*" in candidates or tag.removeprefix("W/") in {t.removeprefix("W/") for t in candidates}
+    if_modified_since = request.headers.get("if-modified-since")
+    if last_modified is None or if_modified_since is None:
+        return False
+    try:
+        return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+
+def validator_headers(tag: str, last_modified: str | None = None) -> dict:
+    headers = {"ETag": tag, "Cache-Control": CACHE_CONTROL}
+    if last_modified:
+        headers["Last-Modified"] = last_modified
+    return headers
+
+def not_modified(tag: str, last_modified: str | None = None) -> Response:
+    return Response(status_code=304, headers=validator_headers(tag, last_modified))
@@ -0,0 +1,116 @@
+import logging
+from datetime import datetime
+from ..config import settings
+from ..repo import conversations as conv_repo
+from ..repo.usage import usage_meter
+from .breaker import CircuitOpen
+from .chat import system_prompt, summarize
+
+logger = logging.getLogger(__name__)
+
+# Conversations with a summary fold in progress
+_folding: set[str] = set()
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 chars per token), good enough for budgeting."""
+    return len(text) // 4 + 1
+
+def estimate_usage(messages: list[dict], reply: str) -> dict:
+    """Usage for a reply the provider never reported on (cancelled or failed mid-stream)."""
+    return {
+        "prompt_tokens": sum(estimate_tokens(m["content"]) for m in messages),
+        "completion_tokens": estimate_tokens(reply),
+    }
+
+def unsummarized(messages: list[dict], summarized_until: datetime | None) -> list[dict]:
+    """Messages newer than the last one folded into the summary."""
+    if summarized_until is None:
+        return messages
+    for i, m in enumerate(messages):
+        if datetime.fromisoformat(m["timestamp"]) > summarized_until:
+            return messages[i:]
+    return []
+
+def build_context(
+    summary: str | None,
+    history: list[dict],
+    user_message: str,
+    domain: str | None = None,
+    budget: int | None = None,
+) -> tuple[list[dict], list[dict]]:
+    """
+    Build the model messages from the newest turns of `history` (at most
+    CONTEXT_MAX_MESSAGES) that fit the token budget, with the rolling
+    summary standing in for older ones.
+
+    Returns (messages, overflow) where overflow holds the turns that did not
+    fit and still need folding into the summary, oldest first.
+    """
+    budget = settings.CONTEXT_TOKEN_BUDGET if budget is None else budget
+    remaining = budget - estimate_tokens(user_message)
+    if summary:
+        remaining -= estimate_tokens(summary)
+
+    keep = len(history)
+    oldest = max(0, len(history) - settings.CONTEXT_MAX_MESSAGES)
+    for i in range(len(history) - 1, oldest - 1, -1):
+        cost = estimate_tokens(history[i]["content"])
+        if cost > remaining:
+            break
+        remaining -= cost
+        keep = i
+
+    messages = [{"role": "system", "content": system_prompt(domain)}]
+    if summary:
+        messages.append({"role": "system", "content": f"Summary of the interview so far: {summary}"})
+    for m in history[keep:]:
+        messages.append({"role": m["role"], "content": m["content"]})
+    messages.append({"role": "user", "content": user_message})
+
+    return messages, history[:keep]
+
+async def fold_into_summary(
+    conv_id: str,
+    user_id: str,
+    domain: str | None,
+    summary: str | None,
+    summarized_until: datetime | None,
+    overflow: list[dict],
+):
+    """
+    Fold turns that fell out of the context window into the conversation's
+    rolling summary, counting the call against the user's usage. Runs in the
+    background after a reply is sent.
+
+    Unsummarized turns older than the loaded history window are read back
+    first, so none are skipped; when there are more than
+    CONTEXT_MAX_MESSAGES of them only those are folded, and `overflow` waits
+    for a later fold. Returns (summary, summarized_until) when a new summary
+    was stored.
+    """
+    if not overflow or conv_id in _folding:
+        return None
+    # Imported here: repo.messages imports this module
+    from ..repo import messages as msg_repo
+
+    _folding.add(conv_id)
+    try:
+        limit = settings.CONTEXT_MAX_MESSAGES
+        turns = await msg_repo.list_messages_between(
+            conv_id, summarized_until, datetime.fromisoformat(overflow[0]["timestamp"]), limit=limit
+        )
+        if len(turns) < limit:
+            turns += overflow
+        new_summary, usage = await summarize(summary, turns)
+        tokens = usage or estimate_usage(turns, new_summary)
+        usage_meter.record(user_id, domain, tokens["prompt_tokens"], tokens["completion_tokens"])
+        if new_summary:
+            until = datetime.fromisoformat(turns[-1]["timestamp"])
+            await conv_repo.update_summary(conv_id, new_summary, until)
+            return new_summary, until
+    except CircuitOpen:
+        pass  # provider is failing; a later reply folds these turns
+    except Exception:
+        logger.exception("summary fold failed for conversation %s", conv_id)
+    finally:
+        _folding.discard(conv_id)
@@ -0,0 +1,154 @@
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime
+from fastapi import HTTPException
+from ..config import settings
+from ..repo import conversations as conv_repo, messages as msg_repo, scores as scores_repo
+from ..repo.usage import usage_meter
+from . import metrics
+from .chat import evaluate, parse_evaluation
+from .context import estimate_usage
+
+logger = logging.getLogger(__name__)
+
+class Evaluator:
+    """
+    Bounded pool of background workers that score finished or idle
+    interviews, off the chat path. Jobs live in interview_scores, so they
+    survive restarts, are deduplicated per conversation across workers and
+    processes, and can be polled; the in-process queue only holds ids.
+    """
+
+    def __init__(self, workers: int, max_attempts: int, retry_backoff: float):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self._queue: asyncio.Queue | None = None
+        self._queued: set[str] = set()
+        self._tasks: list[asyncio.Task] = []
+        self.running = 0
+        self.results = {"done": 0, "skipped": 0, "retried": 0, "failed": 0}
+
+    def start(self):
+        """Start the workers and the recovery/idle sweep."""
+        if self._tasks or not settings.EVAL_ENABLED:
+            return
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._sweep()))
+
+    async def close(self):
+        """Stop the workers. Unfinished jobs stay queued in the table for the next start."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        self._queued.clear()
+
+    async def submit(self, user_id: str, conv_id: str, reason: str = "finished") -> bool:
+        """Queue a conversation for scoring; False if it already is."""
+        if not self._tasks:
+            raise HTTPException(status_code=503, detail="Interview evaluation is disabled")
+        queued = await scores_repo.enqueue(user_id, conv_id, reason)
+        if queued:
+            self._put(conv_id)
+        return queued
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers if self._tasks else 0,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "running": self.running,
+            **self.results,
+        }
+
+    def _put(self, conv_id: str):
+        conv_id = str(uuid.UUID(conv_id))
+        if self._queue is not None and conv_id not in self._queued:
+            self._queued.add(conv_id)
+            self._queue.put_nowait(conv_id)
+
+    async def _work(self):
+        while True:
+            conv_id = await self._queue.get()
+            self._queued.discard(conv_id)
+            self.running += 1
+            try:
+                await self._run(conv_id)
+            except Exception:
+                logger.exception("evaluation job for conversation %s crashed", conv_id)
+            finally:
+                self.running -= 1
+
+    async def _run(self, conv_id: str):
+        job = await scores_repo.claim(conv_id)
+        if job is None:
+            return  # taken by another worker, or no longer queued
+        try:
+            conv = await conv_repo.get_conversation(conv_id)
+            turns = await msg_repo.list_recent_messages(conv_id, limit=settings.EVAL_MAX_MESSAGES)
+            last_at = datetime.fromisoformat(turns[-1]["timestamp"]) if turns else None
+
+            if last_at is not None and last_at == job["scored_until"]:
+                await self._finish(conv_id, "done")  # nothing new since the last score
+                return
+            if sum(1 for m in turns if m["role"] == "user") < settings.EVAL_MIN_ANSWERS:
+                await self._finish(conv_id, "skipped", "Not enough answers to score")
+                return
+
+            started = time.perf_counter()
+            text, usage = await evaluate(conv["domain"], turns)
+            metrics.EVAL_SECONDS.observe(time.perf_counter() - started)
+            tokens = usage or estimate_usage(turns, text)
+            usage_meter.record(conv["user_id"], conv["domain"], tokens["prompt_tokens"], tokens["completion_tokens"])
+            result = parse_evaluation(text)
+            await scores_repo.complete(conv_id, result, last_at)
+            self.results["done"] += 1
+            metrics.EVAL_JOBS.labels("done").inc()
+        except asyncio.CancelledError:
+            # Shutting down: hand the job back instead of waiting for it to go
+            # stale, and don't let the interruption use up one of its attempts
+            await asyncio.shield(scores_repo.release(conv_id))
+            raise
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"[:500]
+            if job["attempts"] < self.max_attempts:
+                logger.warning("evaluation of %s failed (attempt %d), retrying: %s", conv_id, job["attempts"], error)
+                delay = self.retry_backoff * 2 ** (job["attempts"] - 1)
+                await self._finish(conv_id, "queued", error, result="retried", retry_in=delay)
+                asyncio.get_running_loop().call_later(delay + 1, self._put, conv_id)
+            else:
+                logger.error("evaluation of %s failed after %d attempts: %s", conv_id, job["attempts"], error)
+                await self._finish(conv_id, "failed", error)
+
+    async def _finish(self, conv_id: str, status: str, error: str | None = None,
+                      result: str | None = None, retry_in: float = 0):
+        await scores_repo.finish(conv_id, status, error, retry_in)
+        result = result or status
+        self.results[result] += 1
+        metrics.EVAL_JOBS.labels(result).inc()
+
+    async def _sweep(self):
+        while True:
+            try:
+                for conv_id in await scores_repo.recover(settings.EVAL_STALE_SECONDS):
+                    self._put(conv_id)
+                if settings.EVAL_IDLE_SECONDS:
+                    idle = await scores_repo.idle_conversations(
+                        settings.EVAL_IDLE_SECONDS, settings.EVAL_IDLE_LOOKBACK_SECONDS, settings.EVAL_MIN_ANSWERS,
+                    )
+                    for conv_id, user_id in idle:
+                        if await scores_repo.enqueue(user_id, conv_id, "idle"):
+                            self._put(conv_id)
+            except Exception:
+                logger.warning("evaluation sweep failed", exc_info=True)
+            await asyncio.sleep(settings.EVAL_SWEEP_SECONDS)
+
+evaluator = Evaluator(
+    workers=settings.EVAL_WORKERS,
+    max_attempts=settings.EVAL_MAX_ATTEMPTS,
+    retry_backoff=settings.EVAL_RETRY_BACKOFF,
+)
@@ -0,0 +1,61 @@
+import asyncio
+import random
+from ..config import settings
+
+# Local stand-in for Gemini (LLM_PROVIDER=fake) with injectable latency and
+# failures, for exercising timeouts, retries, hedging and the circuit breaker
+# without network access or API spend.
+
+REPLY = (
+    "Thanks for sharing that. **Follow-up:** Can you walk me through a specific "
+    "example, what you did and what the outcome was?"
+)
+
+async def stream_text(messages: list[dict]):
+    if random.random() < settings.FAKE_LLM_FAILURE_RATE:
+        from google.api_core import exceptions as api_exceptions
+        await asyncio.sleep(settings.FAKE_LLM_FIRST_TOKEN_MS / 1000 / 2)
+        raise api_exceptions.ServiceUnavailable("fake provider failure")
+    if random.random() < settings.FAKE_LLM_STALL_RATE:
+        # Connection accepted but nothing ever arrives
+        await asyncio.Event().wait()
+
+    await asyncio.sleep(settings.FAKE_LLM_FIRST_TOKEN_MS / 1000)
+    words = REPLY.split(" ")
+    if settings.FAKE_LLM_REPLY_WORDS:
+        words = (words * (settings.FAKE_LLM_REPLY_WORDS // len(words) + 1))[:settings.FAKE_LLM_REPLY_WORDS]
+    jitter = settings.FAKE_LLM_JITTER_MS
+    for i, word in enumerate(words):
+        if i:
+            delay = settings.FAKE_LLM_CHUNK_MS + (random.uniform(-jitter, jitter) if jitter else 0)
+            await asyncio.sleep(max(delay, 0) / 1000)
+        yield word if i == len(words) - 1 else word + " "
+    # Roughly what Gemini reports, at ~4 characters per token
+    yield {
+        "prompt_tokens": sum(len(m["content"]) // 4 + 1 for m in messages),
+        "completion_tokens": len(" ".join(words)) // 4 + 1,
+    }
+
+SUMMARY = (
+    "The candidate has answered several questions with concrete examples, "
+    "and was asked to quantify outcomes."
+)
+
+async def summarize(prompt: str) -> str:
+    if random.random() < settings.FAKE_LLM_FAILURE_RATE:
+        from google.api_core import exceptions as api_exceptions
+        raise api_exceptions.ServiceUnavailable("fake provider failure")
+    await asyncio.sleep(settings.FAKE_LLM_FIRST_TOKEN_MS / 1000)
+    return SUMMARY
+
+EVALUATION = (
+    '{"score": 7, "summary": "Clear answers with relevant examples; some lacked measurable outcomes.", '
+    '"strengths": ["Structured answers"], "improvements": ["Quantify the impact of your work"]}'
+)
+
+async def evaluate(prompt: str) -> str:
+    if random.random() < settings.FAKE_LLM_FAILURE_RATE:
+        from google.api_core import exceptions as api_exceptions
+        raise api_exceptions.ServiceUnavailable("fake provider failure")
+    await asyncio.sleep(settings.FAKE_LLM_FIRST_TOKEN_MS / 1000)
+    return EVALUATION
@@ -0,0 +1,280 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+import orjson
+from fastapi import HTTPException, WebSocket, WebSocketDisconnect
+from limits import parse as parse_limit, storage as limits_storage, strategies
+from ..config import settings
+from ..auth_supabase import authenticate, token_expiry
+from ..ratelimit import storage_uri
+from ..repo import messages as msg_repo
+from . import llm, metrics
+from .background import spawn
+from .chat import system_prompt
+from .context import build_context, fold_into_summary, unsummarized
+from .question_bank import question_bank
+from .reply import admit, run_reply
+
+# Duplex interview protocol, one JSON object per text frame.
+#
+#   client -> {"type": "auth", "token": "<jwt>"}        first frame, once
+#   server -> {"type": "ready", "conversation_id", "domain"}
+#   client -> {"type": "message", "content": "..."}     one turn
+#   server -> {"type": "queued", "position"}            while waiting for a slot
+#   server -> {"type": "chunk", "content"} ...          streamed reply
+#   server -> {"type": "done", "content", "latency_ms"}
+#   client -> {"type": "cancel"}                        stop the reply in progress
+#   server -> {"type": "cancelled"}
+#   client -> {"type": "ping"}   server -> {"type": "pong"}
+#   server -> {"type": "error", "status", "detail"}     the turn failed, the socket stays open
+#
+# Fatal errors close the socket with 4000 + the matching HTTP status.
+
+logger = logging.getLogger(__name__)
+
+_turn_limit = parse_limit(settings.WS_TURN_RATE_LIMIT)
+_turn_limiter = strategies.FixedWindowRateLimiter(limits_storage.storage_from_string(storage_uri()))
+
+class InterviewSession:
+    """
+    One /ws/interview connection. The conversation's summary and recent
+    turns are loaded once and kept current in memory, so a turn costs the
+    model call and nothing else. Turns are written to `messages` in the
+    background, in order.
+    """
+
+    def __init__(self, websocket: WebSocket, user_id: str, conv_id: str, expires_at: float | None, conv):
+        self.ws = websocket
+        self.user_id = user_id
+        self.conv_id = conv_id
+        self.expires_at = expires_at
+        self.domain = conv.domain
+        self.summary = conv.summary
+        self.summarized_until = conv.summarized_until
+        self.messages = list(conv.messages)
+        # True while `messages` is the whole conversation
+        self.complete = conv.complete
+        self._turn: asyncio.Task | None = None
+        self._write: asyncio.Task | None = None
+        self._send_lock = asyncio.Lock()
+        self._closed = False
+
+    async def send(self, event: dict):
+        if self._closed:
+            return
+        async with self._send_lock:
+            try:
+                await self.ws.send_text(orjson.dumps(event).decode())
+            except Exception:
+                # Gone; the receive loop notices and cleans up
+                self._closed = True
+
+    async def close(self, code: int, reason: str = ""):
+        if not self._closed:
+            self._closed = True
+            try:
+                await self.ws.close(code=code, reason=reason)
+            except Exception:
+                pass
+
+    async def run(self):
+        metrics.WS_SESSIONS_OPEN.inc()
+        try:
+            await self.send({"type": "ready", "conversation_id": self.conv_id, "domain": self.domain})
+            while not self._closed:
+                try:
+                    message = await asyncio.wait_for(self.ws.receive(), settings.WS_IDLE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    if not self._busy():
+                        await self.close(1000, "Idle")
+                    continue
+                if message["type"] == "websocket.disconnect":
+                    break
+                await self.handle(message.get("text") or message.get("bytes") or b"")
+        except WebSocketDisconnect:
+            pass
+        finally:
+            self._closed = True
+            await self.cancel()
+            metrics.WS_SESSIONS_OPEN.dec()
+
+    async def handle(self, data: str | bytes):
+        try:
+            event = orjson.loads(data)
+            kind = event.get("type")
+        except (orjson.JSONDecodeError, AttributeError):
+            await self._error(400, "Frames must be JSON objects")
+            return
+
+        if kind == "message":
+            content = event.get("content")
+            if not isinstance(content, str) or not content.strip():
+                await self._error(400, "Message content is required")
+                return
+            await self.start_turn(content)
+        elif kind == "cancel":
+            if await self.cancel():
+                await self.send({"type": "cancelled"})
+        elif kind == "ping":
+            await self.send({"type": "pong"})
+        else:
+            await self._error(400, f"Unknown frame type: {kind!r}")
+
+    async def start_turn(self, content: str):
+        if self._busy():
+            await self._error(409, "A reply is already in progress")
+            return
+        if self.expires_at is not None and self.expires_at <= time.time():
+            await self._error(401, "Token expired, reconnect")
+            await self.close(4401, "Token expired")
+            return
+        # limits storages are synchronous (file or network I/O); keep them off the loop
+        if not await asyncio.to_thread(_turn_limiter.hit, _turn_limit, "ws-turn", self.user_id):
+            metrics.WS_TURNS.labels("rate_limited").inc()
+            await self._error(429, f"Rate limit exceeded: {settings.WS_TURN_RATE_LIMIT}")
+            return
+
+        opener = await question_bank.opener_for(self.user_id, self.domain, self.complete and not self.messages, content)
+        if opener is not None:
+            self._record("user", content)
+            self._turn = asyncio.create_task(self._serve_opener(opener))
+            return
+
+        history = unsummarized(self.messages, self.summarized_until)
+        messages, overflow = build_context(self.summary, history, content, domain=self.domain)
+
+        try:
+            ticket = await admit(self.user_id)
+        except HTTPException as e:
+            metrics.WS_TURNS.labels("rejected").inc()
+            await self._error(e.status_code, e.detail, retry_after=int(e.headers["Retry-After"]))
+            return
+
+        self._record("user", content)
+        self._turn = asyncio.create_task(self._reply(ticket, messages, overflow))
+
+    async def cancel(self) -> bool:
+        """Stop the reply in progress, keeping what was streamed. False if idle."""
+        if not self._busy():
+            return False
+        self._turn.cancel()
+        await asyncio.wait([self._turn])
+        return True
+
+    def _busy(self) -> bool:
+        return self._turn is not None and not self._turn.done()
+
+    async def _error(self, status: int, detail, **extra):
+        await self.send({"type": "error", "status": status, "detail": detail, **extra})
+
+    async def _reply(self, ticket, messages: list[dict], overflow: list[dict]):
+        async def queued(position: int):
+            await self.send({"type": "queued", "position": position})
+
+        async def chunk(text: str):
+            await self.send({"type": "chunk", "content": text})
+
+        def store(reply: str, fields: dict):
+            return self._record("assistant", reply, fields), fields["latency_ms"]
+
+        try:
+            reply, latency_ms = await run_reply(ticket, messages, self.user_id, self.domain, queued, chunk, store)
+            if overflow:
+                self._fold(overflow)
+            metrics.WS_TURNS.labels("ok").inc()
+            await self.send({"type": "done", "content": reply["content"], "latency_ms": latency_ms})
+        except HTTPException as e:
+            metrics.WS_TURNS.labels("error").inc()
+            await self._error(e.status_code, e.detail)
+        except asyncio.CancelledError:
+            metrics.WS_TURNS.labels("cancelled").inc()
+            raise
+
+    async def _serve_opener(self, text: str):
+        metrics.LLM_OPENERS_FROM_BANK.inc()
+        await self.send({"type": "chunk", "content": text})
+        self._record("assistant", text)  # no model call, so no latency to report
+        metrics.WS_TURNS.labels("ok").inc()
+        await self.send({"type": "done", "content": text, "latency_ms": 0})
+
+    def _record(self, role: str, content: str, fields: dict | None = None) -> dict:
+        """Add a turn to the session now and to `messages` in the background."""
+        message = {
+            "id": None,
+            "role": role,
+            "content": content,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+        }
+        self.messages.append(message)
+        # Same window as the history cache; older turns are in the summary by now
+        del self.messages[:-settings.HISTORY_CACHE_MAX_MESSAGES]
+        self._write = spawn(self._persist(self._write, message, fields or {}))
+        return message
+
+    async def _persist(self, previous: asyncio.Task | None, message: dict, fields: dict):
+        # Keep rows in turn order; a failed write doesn't hold back the next one
+        if previous is not None:
+            await asyncio.wait([previous])
+        try:
+            saved = await msg_repo.add_message(self.conv_id, message["role"], message["content"], **fields)
+        except Exception:
+            logger.exception("could not store %s turn for conversation %s", message["role"], self.conv_id)
+            return
+        # Stored id and timestamp, which later summary folds compare against
+        message.update(saved)
+
+    def _fold(self, overflow: list[dict]):
+        async def fold():
+            # Turns carry a local timestamp until their row is stored, and
+            # summarized_until must be a stored created_at. Writes are chained,
+            # so the newest one finishing means every turn has its row or failed.
+            if self._write is not None:
+                await asyncio.wait([self._write])
+            stored = [m for m in overflow if m["id"] is not None]
+            if not stored:
+                return
+            result = await fold_into_summary(
+                self.conv_id, self.user_id, self.domain, self.summary, self.summarized_until, stored
+            )
+            if result is not None:
+                self.summary, self.summarized_until = result
+        spawn(fold())
+
+async def _warm_model(domain: str | None):
+    """Resolve the domain's model (and provider-side cache) before the first turn."""
+    if settings.LLM_PROVIDER == "fake":
+        return
+    try:
+        await llm.get_chat_model(system_prompt(domain))
+    except Exception:
+        logger.warning("model warm-up failed for a WebSocket session", exc_info=True)
+
+async def serve(websocket: WebSocket, conv_id: str):
+    """Authenticate with the first frame, load the conversation, then run the session."""
+    await websocket.accept()
+    try:
+        frame = orjson.loads(await asyncio.wait_for(websocket.receive_text(), settings.WS_AUTH_TIMEOUT))
+        if frame.get("type") != "auth" or not isinstance(frame.get("token"), str):
+            raise HTTPException(status_code=400, detail="First frame must be an auth frame")
+        user_id = authenticate(frame["token"])
+        expires_at = token_expiry(frame["token"])
+        conv = await msg_repo.get_history(user_id, conv_id)
+    except asyncio.TimeoutError:
+        await websocket.close(code=4408, reason="Auth timeout")
+        return
+    except HTTPException as e:
+        await websocket.close(code=4000 + e.status_code, reason=str(e.detail)[:120])
+        return
+    except (orjson.JSONDecodeError, AttributeError, KeyError):
+        await websocket.close(code=4400, reason="First frame must be an auth frame")
+        return
+    except WebSocketDisconnect:
+        return
+
+    session = InterviewSession(websocket, user_id, conv_id, expires_at, conv)
+    warm = asyncio.create_task(_warm_model(session.domain))
+    try:
+        await session.run()
+    finally:
+        warm.cancel()
@@ -0,0 +1,106 @@
+import asyncio
+import logging
+import time
+from datetime import timedelta
+from typing import TYPE_CHECKING
+from ..config import settings
+
+if TYPE_CHECKING:
+    import google.generativeai as genai
+
+logger = logging.getLogger(__name__)
+
+_genai = None
+
+def sdk():
+    """
+    The google.generativeai module, imported and configured on first use.
+    The SDK is the slowest import in the app, so cold starts skip it until
+    a request (or the startup warm-up) needs a model.
+    """
+    global _genai
+    if _genai is None:
+        import google.generativeai as genai
+        genai.configure(api_key=settings.GEMINI_API_KEY)
+        _genai = genai
+    return _genai
+
+# system_instruction -> configured model, reused across requests
+_models: dict[str, "genai.GenerativeModel"] = {}
+# system_instruction -> (model bound to a provider-side cache, expires_at)
+_cached_models: dict[str, tuple["genai.GenerativeModel", float]] = {}
+# Instructions the provider refused to cache (e.g. below its minimum size)
+_uncacheable: set[str] = set()
+
+def generation_config() -> dict | None:
+    if settings.LLM_TEMPERATURE is None:
+        return None
+    return {"temperature": settings.LLM_TEMPERATURE}
+
+def get_model(system_instruction: str) -> "genai.GenerativeModel":
+    """One configured model per system instruction (and so per domain)."""
+    model = _models.get(system_instruction)
+    if model is None:
+        model = sdk().GenerativeModel(
+            settings.GEMINI_MODEL,
+            system_instruction=system_instruction,
+            generation_config=generation_config(),
+        )
+        _models[system_instruction] = model
+    return model
+
+async def get_chat_model(system_instruction: str) -> "genai.GenerativeModel":
+    """
+    Model for a chat turn. With GEMINI_CONTEXT_CACHE on, the instruction is
+    stored as provider-side cached content and reused until shortly before
+    it expires; otherwise (or if caching fails) the plain model is used.
+    """
+    if not settings.GEMINI_CONTEXT_CACHE or system_instruction in _uncacheable:
+        return get_model(system_instruction)
+
+    entry = _cached_models.get(system_instruction)
+    if entry is not None and entry[1] > time.time():
+        return entry[0]
+
+    ttl = settings.GEMINI_CONTEXT_CACHE_TTL
+    try:
+        cached = await asyncio.to_thread(
+            sdk().caching.CachedContent.create,
+            model=settings.GEMINI_MODEL,
+            system_instruction=system_instruction,
+            ttl=timedelta(seconds=ttl),
+        )
+    except Exception as e:
+        logger.info("context caching unavailable, using plain model: %s", e)
+        _uncacheable.add(system_instruction)
+        return get_model(system_instruction)
+
+    model = sdk().GenerativeModel.from_cached_content(cached, generation_config=generation_config())
+    # Refresh a little early so requests never reference an expired cache
+    _cached_models[system_instruction] = (model, time.time() + ttl * 0.9)
+    return model
+
+def to_request(messages: list[dict]) -> tuple[str, list[dict]]:
+    """
+    Split chat messages into Gemini's system_instruction and structured
+    contents. The first system message is the instruction; later ones (e.g.
+    the rolling summary) become user context. Consecutive turns from the
+    same role are merged, since Gemini expects roles to alternate.
+    """
+    instruction = ""
+    contents: list[dict] = []
+    for m in messages:
+        if m["role"] == "system" and not instruction:
+            instruction = m["content"]
+            continue
+        role = "model" if m["role"] == "assistant" else "user"
+        text = m["content"] if m["role"] != "system" else f"[Context] {m['content']}"
+        if contents and contents[-1]["role"] == role:
+            contents[-1]["parts"].append(text)
+        else:
+            contents.append({"role": role, "parts": [text]})
+
+    # A conversation may open with the interviewer's question
+    if contents and contents[0]["role"] == "model":
+        contents.insert(0, {"role": "user", "parts": ["Start the interview."]})
+    return instruction, contents
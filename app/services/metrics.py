@@ -0,0 +1,284 @@
+import asyncio
+import functools
+import os
+import tempfile
+import time
+from bisect import bisect_left
+import orjson
+
+# Minimal in-process metrics with Prometheus text exposition. Updates are a
+# few float operations, so instrumentation can stay on in production.
+_registry: list["_Metric"] = []
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RATE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+def _fmt_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._children: dict[tuple, object] = {}
+        if not labelnames:
+            self.labels()
+        _registry.append(self)
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._new_child()
+        return child
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in self._children.items():
+            lines.extend(self._render_child(values, child))
+        return lines
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def _render_child(self, values, child):
+        return [f"{self.name}{_fmt_labels(self.labelnames, values)} {child.value}"]
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), collect=None):
+        super().__init__(name, help, labelnames)
+        # Optional callable sampled at scrape time instead of tracked updates
+        self.collect = collect
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self.labels().dec(amount)
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def render(self) -> list[str]:
+        if self.collect is not None:
+            value = self.collect()
+            if value is None:
+                return []
+            self.set(value)
+        return super().render()
+
+    def _render_child(self, values, child):
+        return [f"{self.name}{_fmt_labels(self.labelnames, values)} {child.value}"]
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = buckets
+        super().__init__(name, help, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def _render_child(self, values, child):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(float(bound))
+            le_label = f'le="{le}"'
+            lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, values, le_label)} {cumulative}")
+        labels = _fmt_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {child.sum}")
+        lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+def render() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# ---- Several workers ----
+# Each worker's registry only sees its own requests, and a scrape lands on
+# any one of them. Workers publish a snapshot of their samples to a shared
+# directory every few seconds; a scrape merges them all, with a `worker`
+# label, next to the answering worker's live samples.
+SNAPSHOT_DIR = os.path.join(tempfile.gettempdir(), "prepsmart-metrics")
+
+def _families() -> list[tuple[str, list[str]]]:
+    """(name, [HELP, TYPE, samples...]) per metric with samples."""
+    families = []
+    for metric in _registry:
+        lines = metric.render()
+        if len(lines) > 2:
+            families.append((metric.name, lines))
+    return families
+
+def _snapshot_path(pid: int) -> str:
+    return os.path.join(SNAPSHOT_DIR, f"{pid}.json")
+
+def write_snapshot():
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    path = _snapshot_path(os.getpid())
+    with open(path + ".tmp", "wb") as f:
+        f.write(orjson.dumps(_families()))
+    os.replace(path + ".tmp", path)
+
+def remove_snapshot():
+    try:
+        os.remove(_snapshot_path(os.getpid()))
+    except FileNotFoundError:
+        pass
+
+def _with_worker(sample: str, worker: str) -> str:
+    name, sep, rest = sample.partition("{")
+    if sep:
+        return f'{name}{{worker="{worker}",{rest}'
+    name, _, value = sample.partition(" ")
+    return f'{name}{{worker="{worker}"}} {value}'
+
+def render_workers(max_age: float) -> str:
+    """Samples of every live worker; snapshots older than `max_age` seconds are from dead ones."""
+    sources = [(str(os.getpid()), _families())]
+    try:
+        names = os.listdir(SNAPSHOT_DIR)
+    except FileNotFoundError:
+        names = []
+    now = time.time()
+    for name in names:
+        pid, ext = os.path.splitext(name)
+        if ext != ".json" or pid == sources[0][0]:
+            continue
+        path = os.path.join(SNAPSHOT_DIR, name)
+        try:
+            if now - os.path.getmtime(path) > max_age:
+                continue
+            with open(path, "rb") as f:
+                sources.append((pid, orjson.loads(f.read())))
+        except (OSError, ValueError):
+            continue  # a worker exiting or mid-write
+
+    merged: dict[str, list[str]] = {}
+    for worker, families in sources:
+        for name, lines in families:
+            merged.setdefault(name, lines[:2]).extend(_with_worker(l, worker) for l in lines[2:])
+    return "\n".join(line for lines in merged.values() for line in lines) + "\n"
+
+async def publish_snapshots(interval: float):
+    """Background task: keep this worker's snapshot fresh until cancelled."""
+    try:
+        while True:
+            await asyncio.to_thread(write_snapshot)
+            await asyncio.sleep(interval)
+    finally:
+        remove_snapshot()
+
+# ---- LLM streaming ----
+LLM_TIME_TO_FIRST_TOKEN = Histogram(
+    "llm_time_to_first_token_seconds", "Time from model call to first streamed chunk")
+LLM_GENERATION_SECONDS = Histogram(
+    "llm_generation_seconds", "Total time to stream one assistant reply")
+LLM_QUEUE_WAIT_SECONDS = Histogram(
+    "llm_queue_wait_seconds", "Time spent waiting for an LLM slot")
+LLM_CHUNKS_PER_SECOND = Histogram(
+    "llm_chunks_per_second", "Streamed chunks per second for one reply", buckets=RATE_BUCKETS)
+LLM_CHARS_PER_SECOND = Histogram(
+    "llm_chars_per_second", "Streamed characters per second for one reply", buckets=RATE_BUCKETS)
+LLM_CHUNKS = Counter("llm_chunks_total", "Chunks streamed from the model")
+LLM_CHARS = Counter("llm_chars_total", "Characters streamed from the model")
+LLM_RETRIES = Counter("llm_retries_total", "Model calls retried before the first chunk")
+LLM_HEDGES = Counter("llm_hedged_requests_total", "Second model calls started for a late first chunk")
+LLM_TIMEOUTS = Counter("llm_timeouts_total", "Model calls that missed a deadline", ("phase",))
+LLM_OPENERS_FROM_BANK = Counter(
+    "llm_openers_from_bank_total", "Opening questions served from the question bank")
+LLM_RESPONSE_CACHE_REQUESTS = Counter(
+    "llm_response_cache_requests_total", "Response cache lookups", ("result",))
+LLM_TOKENS = Counter("llm_tokens_total", "Provider tokens used by chat replies", ("kind",))
+USAGE_QUOTA_REJECTIONS = Counter("usage_quota_rejections_total", "Turns refused by the daily token quota")
+SSE_STREAMS_IN_FLIGHT = Gauge("sse_streams_in_flight", "Open /chat/stream responses")
+WS_SESSIONS_OPEN = Gauge("ws_sessions_open", "Open /ws/interview connections")
+WS_TURNS = Counter("ws_turns_total", "Interview turns handled over WebSocket", ("result",))
+
+def observe_reply(elapsed: float, chunks: int, chars: int):
+    """Record one finished model reply streamed in `elapsed` seconds."""
+    LLM_GENERATION_SECONDS.observe(elapsed)
+    LLM_CHUNKS.inc(chunks)
+    LLM_CHARS.inc(chars)
+    if elapsed > 0:
+        LLM_CHUNKS_PER_SECOND.observe(chunks / elapsed)
+        LLM_CHARS_PER_SECOND.observe(chars / elapsed)
+
+# ---- Interview evaluation ----
+EVAL_JOBS = Counter("evaluation_jobs_total", "Finished evaluation job attempts", ("result",))
+EVAL_SECONDS = Histogram("evaluation_seconds", "Model time to score one interview")
+
+# ---- Export / import ----
+IMPORT_SECONDS = Histogram(
+    "import_seconds", "Time to load one NDJSON import", buckets=(0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0))
+
+# ---- Database ----
+DB_QUERY_SECONDS = Histogram("db_query_seconds", "Repo function latency", ("fn",))
+DB_POOL_ACQUIRE_WAIT = Histogram("db_pool_acquire_wait_seconds", "Time waiting for a pooled connection")
+
+def timed_query(fn):
+    """Record a repo coroutine's latency under its module.function name."""
+    child = DB_QUERY_SECONDS.labels(f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__name__}")
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await fn(*args, **kwargs)
+        finally:
+            child.observe(time.perf_counter() - start)
+
+    return wrapper
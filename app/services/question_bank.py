@@ -0,0 +1,135 @@
+import asyncio
+import json
+import logging
+import os
+import random
+from collections import OrderedDict
+from pathlib import Path
+from ..config import settings
+from ..repo import messages as msg_repo
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = Path(__file__).resolve().parent.parent / "data" / "question_bank.json"
+
+OPENER_TEMPLATE = "Thanks! Let's begin.\n\n{question}"
+
+class QuestionBank:
+    """
+    Precomputed opening questions per interview domain, loaded on first use
+    from a JSON file of {domain: [question, ...]}. Serving the first turn
+    from here skips a full model round trip.
+    """
+
+    def __init__(self, path: Path, max_users: int):
+        self.path = path
+        self.max_users = max_users
+        self._questions: dict[str, tuple[str, ...]] | None = None
+        self._mtime: float | None = None
+        # (user_id, domain) -> questions already asked, most recent users last
+        self._seen: "OrderedDict[tuple[str, str], set[str]]" = OrderedDict()
+        self._refresher: asyncio.Task | None = None
+
+    def load(self):
+        """(Re)read the bank file; a bad file keeps the previous bank."""
+        try:
+            mtime = os.stat(self.path).st_mtime
+            with open(self.path, "rb") as f:
+                raw = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("question bank not loaded from %s: %s", self.path, e)
+            if self._questions is None:
+                self._questions = {}
+            return
+
+        questions = {}
+        for domain, items in raw.items():
+            # dict.fromkeys dedupes while keeping file order
+            unique = tuple(dict.fromkeys(q.strip() for q in items if isinstance(q, str) and q.strip()))
+            if unique:
+                questions[domain.lower()] = unique
+        self._questions = questions
+        self._mtime = mtime
+
+    def questions(self, domain: str | None) -> tuple[str, ...]:
+        if self._questions is None:
+            self.load()
+        return self._questions.get((domain or "").lower(), ())
+
+    def has(self, domain: str | None) -> bool:
+        return bool(self.questions(domain))
+
+    async def opener_for(self, user_id: str, domain: str, new_interview: bool, user_message: str) -> str | None:
+        """
+        Banked question to answer a turn with instead of calling the model:
+        only on the first turn of a new interview, and only when the user's
+        message is short enough to be a greeting ("Hi", "I'm ready") rather
+        than an introduction or an answer. The message itself is still
+        stored, so the model sees it from the next turn on.
+        """
+        if (
+            not settings.QUESTION_BANK_ENABLED
+            or not new_interview
+            or len(user_message) > settings.QUESTION_BANK_OPENER_MAX_CHARS
+        ):
+            return None
+        return await self.next_opener(user_id, domain)
+
+    async def next_opener(self, user_id: str, domain: str) -> str | None:
+        """
+        Opening message for a new interview, preferring questions this user
+        has not been asked in `domain`. None if the domain has no questions.
+        """
+        questions = self.questions(domain)
+        if not questions:
+            return None
+
+        key = (user_id, domain.lower())
+        seen = self._seen.get(key)
+        if seen is None:
+            # First opener for this user since startup: learn from past interviews
+            openers = await msg_repo.list_openers(user_id, domain)
+            seen = {q for q in questions if any(q in o for o in openers)}
+            self._seen[key] = seen
+        self._seen.move_to_end(key)
+        while len(self._seen) > self.max_users:
+            self._seen.popitem(last=False)
+
+        fresh = [q for q in questions if q not in seen]
+        if not fresh:
+            # Everything has been asked once; start another round
+            seen.clear()
+            fresh = list(questions)
+        question = random.choice(fresh)
+        seen.add(question)
+        return OPENER_TEMPLATE.format(question=question)
+
+    def start_refresh(self, interval: float):
+        """Reload the file in the background whenever it changes."""
+        if interval > 0 and self._refresher is None:
+            self._refresher = asyncio.create_task(self._refresh(interval))
+
+    async def close(self):
+        if self._refresher is not None:
+            self._refresher.cancel()
+            try:
+                await self._refresher
+            except asyncio.CancelledError:
+                pass
+            self._refresher = None
+
+    async def _refresh(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except OSError:
+                continue
+            if mtime != self._mtime:
+                await asyncio.to_thread(self.load)
+                logger.info("question bank reloaded from %s", self.path)
+
+question_bank = QuestionBank(
+    Path(settings.QUESTION_BANK_PATH) if settings.QUESTION_BANK_PATH else DEFAULT_PATH,
+    max_users=settings.QUESTION_BANK_MAX_USERS,
+)
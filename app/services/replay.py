@@ -0,0 +1,131 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from ..config import settings
+
+class Generation:
+    """
+    One assistant reply being produced for a conversation. Every SSE event
+    is recorded with a sequence number so clients can resume from the last
+    id they saw instead of starting a new generation.
+
+    Events are either `str` text chunks, which subscribers may coalesce, or
+    pre-encoded `bytes` payloads sent as they are.
+    """
+
+    def __init__(self, conv_id: str, user_id: str, grace: float):
+        self.id = uuid.uuid4().hex[:12]
+        self.conv_id = conv_id
+        self.user_id = user_id
+        self.grace = grace
+        self.events: list[str | bytes] = []
+        self.done = False
+        self.finished_at: float | None = None
+        self.task: asyncio.Task | None = None
+        self.subscribers = 0
+        self._waiters: list[asyncio.Future] = []
+        self._abandon: asyncio.TimerHandle | None = None
+
+    def publish(self, data: str | bytes):
+        self.events.append(data)
+        self._wake()
+
+    def finish(self):
+        self.done = True
+        self.finished_at = time.monotonic()
+        if self._abandon is not None:
+            self._abandon.cancel()
+        self._wake()
+
+    def event_id(self, seq: int) -> str:
+        return f"{self.id}:{seq}"
+
+    def attach(self):
+        self.subscribers += 1
+        if self._abandon is not None:
+            self._abandon.cancel()
+            self._abandon = None
+
+    def detach(self):
+        self.subscribers -= 1
+        if self.subscribers == 0 and not self.done:
+            # Nobody is listening; stop paying for tokens unless a client resumes
+            self._abandon = asyncio.get_running_loop().call_later(self.grace, self._cancel_if_abandoned)
+
+    async def wait(self, timeout: float):
+        """Wait up to `timeout` seconds for the next published event."""
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        self._waiters.append(waiter)
+        # Plain future + timer: much cheaper per token than wait_for()
+        timer = loop.call_later(max(timeout, 0), _resolve, waiter)
+        try:
+            await waiter
+        finally:
+            timer.cancel()
+
+    def _wake(self):
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            _resolve(waiter)
+
+    def _cancel_if_abandoned(self):
+        self._abandon = None
+        if self.subscribers == 0 and not self.done and self.task is not None:
+            self.task.cancel()
+
+def _resolve(waiter: asyncio.Future):
+    if not waiter.done():
+        waiter.set_result(None)
+
+class ReplayBuffer:
+    """
+    Bounded index of recent generations keyed by conversation. Finished
+    generations stay replayable for `ttl` seconds.
+
+    Generations live in the worker that runs them. With several workers a
+    resume that lands on another one gets a 410, and the client reloads the
+    conversation instead, which has the reply once it is stored.
+    """
+
+    def __init__(self, max_generations: int, ttl: float, grace: float):
+        self.max_generations = max_generations
+        self.ttl = ttl
+        self.grace = grace
+        self._generations: "OrderedDict[str, Generation]" = OrderedDict()
+
+    def start(self, conv_id: str, user_id: str) -> Generation:
+        self._expire()
+        gen = Generation(conv_id, user_id, self.grace)
+        self._generations.pop(conv_id.lower(), None)
+        self._generations[conv_id.lower()] = gen
+        return gen
+
+    def find(self, conv_id: str, last_event_id: str) -> tuple[Generation, int] | None:
+        """Generation and sequence number a Last-Event-ID points at, if still buffered."""
+        self._expire()
+        gen_id, _, seq = last_event_id.partition(":")
+        gen = self._generations.get(conv_id.lower())
+        if gen is None or gen.id != gen_id or not seq.isdigit():
+            return None
+        return gen, int(seq)
+
+    def _expire(self):
+        now = time.monotonic()
+        for key, gen in list(self._generations.items()):
+            if gen.done and now - gen.finished_at > self.ttl:
+                del self._generations[key]
+        # Over capacity: drop the oldest finished generations first
+        if len(self._generations) > self.max_generations:
+            for key, gen in list(self._generations.items()):
+                if len(self._generations) <= self.max_generations:
+                    break
+                if gen.done:
+                    del self._generations[key]
+
+replay_buffer = ReplayBuffer(
+    max_generations=settings.SSE_REPLAY_MAX_GENERATIONS,
+    ttl=settings.SSE_REPLAY_TTL,
+    grace=settings.SSE_RESUME_GRACE,
+)
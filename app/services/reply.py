@@ -0,0 +1,89 @@
+import time
+from contextlib import aclosing
+from fastapi import HTTPException
+from ..config import settings
+from ..repo.usage import usage_meter
+from . import metrics
+from .chat import stream_ollama
+from .context import estimate_usage
+from .scheduler import llm_scheduler, QueueFull
+
+# One model reply, shared by the SSE and WebSocket transports. They differ
+# only in how events reach the client and where the reply is stored, which
+# they pass in as callbacks.
+
+async def admit(user_id: str):
+    """
+    Daily token quota check, then a scheduler slot for one reply. Raises 429
+    (with Retry-After) when either says no. The caller owns the returned
+    ticket until it hands it to run_reply.
+    """
+    await usage_meter.check(user_id)
+    try:
+        return llm_scheduler.reserve(user_id)
+    except QueueFull as e:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many interviews in progress, please retry shortly",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+async def run_reply(ticket, messages: list[dict], user_id: str, domain: str | None,
+                    on_queued, on_chunk, store):
+    """
+    Wait for `ticket`'s slot, reporting the queue position through
+    `await on_queued(position)`, then stream the model's reply through
+    `await on_chunk(text)`. Releases the slot and records metrics and token
+    usage. Hands the text to `store(reply, fields)` exactly once, where
+    `fields` are the add_message keyword arguments. That includes a partial
+    reply when the turn is cancelled or the stream fails. Returns what
+    `store` returned; stream errors propagate.
+    """
+    start = time.time()
+    parts: list[str] = []
+    usage = None
+    stored = None
+
+    def finish():
+        nonlocal stored
+        reply = "".join(parts)
+        # Quotas count estimated usage when the provider never reported any;
+        # stored messages only carry real counts (cached replays report 0)
+        tokens = usage or estimate_usage(messages, reply)
+        usage_meter.record(user_id, domain, tokens["prompt_tokens"], tokens["completion_tokens"])
+        reported = usage if usage and usage["completion_tokens"] else None
+        stored = (store(reply, {
+            "token_count": reported and reported["completion_tokens"],
+            "latency_ms": int((time.time() - start) * 1000),
+            "prompt_tokens": reported and reported["prompt_tokens"],
+        }),)
+        return stored[0]
+
+    try:
+        queued_at = time.perf_counter()
+        while not await ticket.wait(settings.LLM_QUEUE_POSITION_INTERVAL):
+            await on_queued(llm_scheduler.position(ticket) + 1)
+
+        model_start = time.perf_counter()
+        metrics.LLM_QUEUE_WAIT_SECONDS.observe(model_start - queued_at)
+        chars = 0
+
+        async with aclosing(stream_ollama(messages)) as stream:
+            async for chunk in stream:
+                text = chunk.get("content", "") if isinstance(chunk, dict) else str(chunk)
+                if isinstance(chunk, dict) and chunk.get("usage"):
+                    usage = chunk["usage"]
+                if text:
+                    if not parts:
+                        metrics.LLM_TIME_TO_FIRST_TOKEN.observe(time.perf_counter() - model_start)
+                    chars += len(text)
+                    parts.append(text)
+                    await on_chunk(text)
+        llm_scheduler.release(ticket)
+        metrics.observe_reply(time.perf_counter() - model_start, len(parts), chars)
+        return finish()
+    finally:
+        llm_scheduler.release(ticket)
+        # Cancelled or failed mid-stream; keep the partial reply
+        if parts and stored is None:
+            finish()
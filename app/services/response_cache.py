@@ -0,0 +1,112 @@
+import hashlib
+import importlib
+import logging
+import time
+from collections import OrderedDict
+import orjson
+from ..config import settings
+from .metrics import LLM_RESPONSE_CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+class MemoryBackend:
+    """In-process LRU of streamed replies, bounded by bytes and age."""
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # key -> (chunks, expires_at, size)
+        self._entries: "OrderedDict[str, tuple[tuple[str, ...], float, int]]" = OrderedDict()
+        self._bytes = 0
+
+    async def get(self, key: str) -> tuple[str, ...] | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.monotonic():
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    async def set(self, key: str, chunks: tuple[str, ...]):
+        size = sum(len(c) for c in chunks)
+        if size > self.max_bytes:
+            return
+        self._drop(key)
+        self._entries[key] = (chunks, time.monotonic() + self.ttl, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "bytes": self._bytes}
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split()).lower()
+
+def cache_key(messages: list[dict]) -> str:
+    """
+    Hash of the model and the normalized conversation. The system prompt
+    (which carries the domain) is the first message, so it is part of the key.
+    """
+    state = [settings.GEMINI_MODEL, settings.LLM_TEMPERATURE]
+    state += [(m["role"], _normalize(m["content"])) for m in messages]
+    return hashlib.sha256(orjson.dumps(state)).hexdigest()
+
+def _make_backend():
+    path = settings.LLM_RESPONSE_CACHE_BACKEND
+    if not path:
+        return MemoryBackend(settings.LLM_RESPONSE_CACHE_MAX_BYTES, settings.LLM_RESPONSE_CACHE_TTL)
+    module, _, name = path.partition(":")
+    return getattr(importlib.import_module(module), name)()
+
+class ResponseCache:
+    """
+    Replays complete model replies for repeated conversation states. Only
+    used when sampling is deterministic (LLM_TEMPERATURE=0), since otherwise
+    the same input is expected to produce a different reply.
+    """
+
+    def __init__(self):
+        self._backend = None
+        self.hits = 0
+        self.misses = 0
+        if settings.LLM_RESPONSE_CACHE and settings.LLM_TEMPERATURE != 0:
+            logger.warning("LLM_RESPONSE_CACHE needs LLM_TEMPERATURE=0; response cache disabled")
+
+    @property
+    def enabled(self) -> bool:
+        return settings.LLM_RESPONSE_CACHE and settings.LLM_TEMPERATURE == 0
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = _make_backend()
+        return self._backend
+
+    async def get(self, key: str) -> tuple[str, ...] | None:
+        chunks = await self.backend.get(key)
+        if chunks is None:
+            self.misses += 1
+            LLM_RESPONSE_CACHE_REQUESTS.labels("miss").inc()
+        else:
+            self.hits += 1
+            LLM_RESPONSE_CACHE_REQUESTS.labels("hit").inc()
+        return chunks
+
+    async def set(self, key: str, chunks: tuple[str, ...]):
+        await self.backend.set(key, chunks)
+
+    def stats(self) -> dict:
+        stats = {"enabled": self.enabled, "hits": self.hits, "misses": self.misses}
+        if self._backend is not None and hasattr(self._backend, "stats"):
+            stats.update(self._backend.stats())
+        return stats
+
+response_cache = ResponseCache()
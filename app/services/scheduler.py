@@ -0,0 +1,110 @@
+import asyncio
+from collections import OrderedDict, deque
+from ..config import settings, per_worker
+
+class QueueFull(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__("LLM wait queue is full")
+        self.retry_after = retry_after
+
+class Ticket:
+    """A caller's claim on an LLM slot, granted now or later."""
+    __slots__ = ("user_id", "granted", "released", "_event")
+
+    def __init__(self, user_id: str, granted: bool):
+        self.user_id = user_id
+        self.granted = granted
+        self.released = False
+        self._event = asyncio.Event()
+        if granted:
+            self._event.set()
+
+    async def wait(self, timeout: float) -> bool:
+        """Wait up to `timeout` seconds for the slot; True once granted."""
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.granted
+
+class LLMScheduler:
+    """
+    Admission control for upstream LLM streams: at most `max_concurrent`
+    run at once, up to `max_queue` more wait, and free slots are handed out
+    round-robin across users so one account can't starve the others.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int, retry_after: int):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self._active = 0
+        self._queued = 0
+        # user_id -> waiting tickets; dict order is the round-robin ring
+        self._waiting: "OrderedDict[str, deque[Ticket]]" = OrderedDict()
+
+    def reserve(self, user_id: str) -> Ticket:
+        """Take a slot or a place in the queue. Raises QueueFull."""
+        if self._active < self.max_concurrent and not self._queued:
+            self._active += 1
+            return Ticket(user_id, granted=True)
+        if self._queued >= self.max_queue:
+            raise QueueFull(self.retry_after)
+        ticket = Ticket(user_id, granted=False)
+        self._waiting.setdefault(user_id, deque()).append(ticket)
+        self._queued += 1
+        return ticket
+
+    def release(self, ticket: Ticket):
+        """Give back a slot, or leave the queue if still waiting. Idempotent."""
+        if ticket.released:
+            return
+        ticket.released = True
+        if ticket.granted:
+            self._active -= 1
+        else:
+            queue = self._waiting.get(ticket.user_id)
+            if queue and ticket in queue:
+                queue.remove(ticket)
+                self._queued -= 1
+                if not queue:
+                    del self._waiting[ticket.user_id]
+        self._dispatch()
+
+    def position(self, ticket: Ticket) -> int:
+        """Number of waiters that will be served before this ticket."""
+        if ticket.granted:
+            return 0
+        users = list(self._waiting)
+        queue = self._waiting.get(ticket.user_id)
+        if queue is None or ticket not in queue:
+            return 0
+        k = queue.index(ticket)
+        r = users.index(ticket.user_id)
+        ahead = k
+        for i, user in enumerate(users):
+            if i != r:
+                ahead += min(len(self._waiting[user]), k + 1 if i < r else k)
+        return ahead
+
+    def stats(self) -> dict:
+        return {"active": self._active, "queued": self._queued, "users_waiting": len(self._waiting)}
+
+    def _dispatch(self):
+        while self._active < self.max_concurrent and self._waiting:
+            user_id, queue = next(iter(self._waiting.items()))
+            ticket = queue.popleft()
+            self._queued -= 1
+            if queue:
+                self._waiting.move_to_end(user_id)
+            else:
+                del self._waiting[user_id]
+            self._active += 1
+            ticket.granted = True
+            ticket._event.set()
+
+llm_scheduler = LLMScheduler(
+    max_concurrent=per_worker(settings.LLM_MAX_CONCURRENT),
+    max_queue=per_worker(settings.LLM_MAX_QUEUE),
+    retry_after=settings.LLM_QUEUE_RETRY_AFTER,
+)
@@ -0,0 +1,94 @@
+import time
+import orjson
+from fastapi import Request
+from ..config import settings
+from .replay import Generation
+from .metrics import SSE_STREAMS_IN_FLIGHT
+
+HEARTBEAT = b": ping\n\n"
+DONE = b"[DONE]"
+
+def chunk_payload(text: str) -> bytes:
+    return orjson.dumps({
+        "role": "assistant",
+        "content": text,
+        "timestamp": time.time(),
+        "final": False,
+    })
+
+def encode_frames(gen: Generation, start: int, end: int) -> bytes:
+    """
+    Encode events [start, end) as SSE frames. Consecutive text chunks are
+    merged into one frame carrying the id of the last chunk, so resuming
+    from that id never repeats or skips text.
+    """
+    out = bytearray()
+    text: list[str] = []
+    for seq in range(start, end):
+        event = gen.events[seq]
+        if isinstance(event, str):
+            text.append(event)
+            if seq + 1 < end and isinstance(gen.events[seq + 1], str):
+                continue
+            payload = chunk_payload("".join(text))
+            text.clear()
+        else:
+            payload = event
+        out += b"id: " + gen.event_id(seq).encode() + b"\ndata: " + payload + b"\n\n"
+    return bytes(out)
+
+async def stream_events(request: Request, gen: Generation, after: int = -1):
+    """
+    SSE body for a generation. Frames are flushed at most once per
+    SSE_FLUSH_MS unless SSE_COALESCE_BYTES of text are waiting, disconnects
+    are polled on a timer rather than per chunk, and idle streams get a
+    comment heartbeat so proxies keep them open.
+    """
+    flush_interval = settings.SSE_FLUSH_MS / 1000
+    check_interval = settings.SSE_DISCONNECT_CHECK_MS / 1000
+    heartbeat = settings.SSE_HEARTBEAT_SECONDS
+
+    seq = after + 1
+    now = time.monotonic()
+    last_flush = float("-inf")
+    last_write = now
+    next_check = now + check_interval
+
+    gen.attach()
+    SSE_STREAMS_IN_FLIGHT.inc()
+    try:
+        while True:
+            now = time.monotonic()
+            end = len(gen.events)
+
+            if end > seq:
+                pending = gen.events[seq:end]
+                if (
+                    gen.done
+                    or now - last_flush >= flush_interval
+                    or any(isinstance(e, bytes) for e in pending)
+                    or sum(len(e) for e in pending) >= settings.SSE_COALESCE_BYTES
+                ):
+                    yield encode_frames(gen, seq, end)
+                    seq = end
+                    last_flush = last_write = now
+                    continue
+            elif gen.done:
+                return
+
+            if now >= next_check:
+                if await request.is_disconnected():
+                    return
+                next_check = now + check_interval
+
+            if now - last_write >= heartbeat:
+                yield HEARTBEAT
+                last_write = now
+
+            deadline = min(next_check, last_write + heartbeat)
+            if end > seq:
+                deadline = min(deadline, last_flush + flush_interval)
+            await gen.wait(deadline - now)
+    finally:
+        SSE_STREAMS_IN_FLIGHT.dec()
+        gen.detach()
@@ -0,0 +1,80 @@
+import asyncio
+import httpx
+from ..config import settings
+
+# Async GoTrue calls for account operations. One pooled client is shared by
+# all requests so TLS connections are reused, and a semaphore bounds how many
+# run at once so a burst of account changes cannot exhaust the pool.
+
+class SupabaseError(Exception):
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+
+_client: httpx.AsyncClient | None = None
+_semaphore: asyncio.Semaphore | None = None
+
+def _get_client() -> httpx.AsyncClient:
+    global _client, _semaphore
+    if _client is None:
+        _client = httpx.AsyncClient(
+            base_url=f"{settings.SUPABASE_URL.rstrip('/')}/auth/v1",
+            timeout=settings.SUPABASE_HTTP_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=settings.SUPABASE_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.SUPABASE_HTTP_MAX_CONNECTIONS,
+                keepalive_expiry=60.0,
+            ),
+        )
+        _semaphore = asyncio.Semaphore(settings.SUPABASE_HTTP_MAX_CONCURRENT)
+    return _client
+
+async def _request(method: str, path: str, key: str, **kwargs) -> dict:
+    client = _get_client()
+    headers = {"apikey": key, "Authorization": f"Bearer {key}"}
+    async with _semaphore:
+        try:
+            r = await client.request(method, path, headers=headers, **kwargs)
+        except httpx.HTTPError as e:
+            raise SupabaseError(503, f"Supabase request failed: {e!r}")
+    if r.status_code >= 400:
+        try:
+            body = r.json()
+            message = body.get("msg") or body.get("error_description") or body.get("message") or r.text
+        except ValueError:
+            message = r.text
+        raise SupabaseError(r.status_code, message)
+    return r.json() if r.content else {}
+
+async def get_user(user_id: str) -> dict:
+    return await _request("GET", f"/admin/users/{user_id}", settings.SUPABASE_SERVICE_ROLE_KEY)
+
+async def update_user(user_id: str, attributes: dict) -> dict:
+    return await _request("PUT", f"/admin/users/{user_id}", settings.SUPABASE_SERVICE_ROLE_KEY, json=attributes)
+
+async def check_password(email: str, password: str) -> bool:
+    """True if `password` signs `email` in."""
+    try:
+        await _request(
+            "POST", "/token", settings.SUPABASE_ANON_KEY,
+            params={"grant_type": "password"},
+            json={"email": email, "password": password},
+        )
+    except SupabaseError as e:
+        if e.status_code in (400, 401, 422):
+            return False
+        raise
+    return True
+
+async def close():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+async def warm_up():
+    """Open a pooled connection (DNS + TLS) before the first account request."""
+    try:
+        await _request("GET", "/health", settings.SUPABASE_ANON_KEY)
+    except SupabaseError:
+        pass
@@ -0,0 +1,40 @@
+import asyncio
+import logging
+import time
+from ..db import get_pool
+from . import llm, supabase_admin
+from .chat import SYSTEM_PROMPT
+from .question_bank import question_bank
+
+logger = logging.getLogger(__name__)
+
+def _load_model():
+    llm.get_model(SYSTEM_PROMPT)
+
+async def _timed(name: str, aw, timings: dict, required: bool = False):
+    start = time.perf_counter()
+    try:
+        await aw
+    except Exception as e:
+        if required:
+            raise
+        logger.warning("warm-up step %s failed: %s", name, e)
+    finally:
+        timings[name] = round((time.perf_counter() - start) * 1000, 1)
+
+async def warm_up() -> dict:
+    """
+    Do the work the first requests would otherwise pay for, concurrently:
+    open the DB pool, import and configure the Gemini SDK, open a Supabase
+    connection and load the question bank. Returns milliseconds per step.
+    """
+    timings: dict[str, float] = {}
+    await asyncio.gather(
+        # The pool is required at startup, exactly as without warm-up
+        _timed("db_pool", get_pool(), timings, required=True),
+        _timed("gemini_sdk", asyncio.to_thread(_load_model), timings),
+        _timed("supabase_http", supabase_admin.warm_up(), timings),
+        _timed("question_bank", asyncio.to_thread(question_bank.load), timings),
+    )
+    logger.info("warm-up finished", extra={"event": "startup.warmup", "timings_ms": timings})
+    return timings
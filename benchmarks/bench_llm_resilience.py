@@ -0,0 +1,108 @@
+"""
+Tail-latency benchmark for services.chat.stream_ollama against the local
+fake provider. Injects stalls and failures and compares time to first chunk
+and error rate with and without hedging, then trips the circuit breaker on
+a fully down provider and shows the next wave failing fast.
+
+    python -m benchmarks.bench_llm_resilience [requests] [stall_rate] [failure_rate]
+"""
+import asyncio
+import os
+import sys
+import time
+
+os.environ.setdefault("SUPABASE_URL", "https://bench.supabase.co")
+os.environ.setdefault("SUPABASE_ANON_KEY", "bench")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "bench")
+os.environ.setdefault("SUPABASE_JWT_SECRET", "bench-secret")
+os.environ.setdefault("DATABASE_URL", "postgresql://bench@localhost/bench")
+
+from fastapi import HTTPException
+
+from app.config import settings
+from app.services import chat
+from app.services.breaker import llm_breaker
+
+MESSAGES = [
+    {"role": "system", "content": chat.system_prompt("backend")},
+    {"role": "user", "content": "I'm ready."},
+]
+
+
+async def one() -> tuple[float | None, int | None]:
+    """Seconds to first chunk, or the error status."""
+    start = time.perf_counter()
+    first = None
+    try:
+        async for _ in chat.stream_ollama(MESSAGES):
+            if first is None:
+                first = time.perf_counter() - start
+    except HTTPException as e:
+        return None, e.status_code
+    return first, None
+
+
+def percentile(values: list[float], p: float) -> str:
+    """The p-th percentile in seconds, or n/a when no call succeeded."""
+    if not values:
+        return "n/a"
+    values = sorted(values)
+    return f"{values[min(len(values) - 1, int(len(values) * p))]:.3f}s"
+
+
+async def scenario(name: str, count: int, **overrides) -> None:
+    for key, value in overrides.items():
+        setattr(settings, key, value)
+    llm_breaker.success()
+    llm_breaker.rejected = 0
+    results = await asyncio.gather(*(one() for _ in range(count)))
+    ttft = [r[0] for r in results if r[0] is not None]
+    errors: dict[int, int] = {}
+    for _, status in results:
+        if status is not None:
+            errors[status] = errors.get(status, 0) + 1
+    print(
+        f"{name:>12}: p50={percentile(ttft, 0.5)} p95={percentile(ttft, 0.95)} "
+        f"p99={percentile(ttft, 0.99)} errors={errors} breaker={llm_breaker.stats()}"
+    )
+
+
+async def run(count: int, stall_rate: float, failure_rate: float):
+    settings.LLM_PROVIDER = "fake"
+    settings.FAKE_LLM_FIRST_TOKEN_MS = 300
+    settings.FAKE_LLM_CHUNK_MS = 1
+    settings.LLM_FIRST_TOKEN_TIMEOUT = 2.0
+    settings.LLM_RETRY_BACKOFF = 0.1
+    llm_breaker.threshold = count * 10  # keep the breaker out of the first two runs
+    print(f"requests: {count}, stall rate: {stall_rate}, failure rate: {failure_rate}")
+
+    await scenario("no hedge", count, FAKE_LLM_STALL_RATE=stall_rate,
+                   FAKE_LLM_FAILURE_RATE=failure_rate, LLM_HEDGE_AFTER=None)
+    await scenario("hedge 0.6s", count, LLM_HEDGE_AFTER=0.6)
+
+    # Provider fully down: a few sequential calls trip the breaker (502);
+    # concurrent ones would all pass it before the first failure is counted.
+    # The wave after that fails fast with 503 without calling the provider.
+    settings.FAKE_LLM_FAILURE_RATE = 1.0
+    settings.LLM_RETRIES = 0
+    settings.LLM_HEDGE_AFTER = None
+    llm_breaker.threshold = 5
+    llm_breaker.success()
+    llm_breaker.rejected = 0
+    tripped = [(await one())[1] for _ in range(llm_breaker.threshold)]
+    print(f"{'down, trip':>12}: statuses={tripped} breaker={llm_breaker.stats()}")
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(one() for _ in range(count)))
+    errors = [status for _, status in results]
+    print(
+        f"{'down, wave':>12}: 503s={errors.count(503)}/{count} "
+        f"wall={time.perf_counter() - start:.4f}s breaker={llm_breaker.stats()}"
+    )
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    stall_rate = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    failure_rate = float(sys.argv[3]) if len(sys.argv) > 3 else 0.05
+    asyncio.run(run(count, stall_rate, failure_rate))
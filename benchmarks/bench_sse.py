@@ -0,0 +1,102 @@
+"""
+SSE encoding benchmark: the old per-chunk json.dumps + is_disconnected loop
+versus services.sse.stream_events (orjson, coalescing, timed disconnect
+checks). Reports CPU time per streamed token and body writes (one send
+syscall each) per answer.
+
+    python -m benchmarks.bench_sse [tokens] [token_interval_ms]
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+
+os.environ.setdefault("SUPABASE_URL", "https://bench.supabase.co")
+os.environ.setdefault("SUPABASE_ANON_KEY", "bench")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "bench")
+os.environ.setdefault("SUPABASE_JWT_SECRET", "bench-secret")
+os.environ.setdefault("DATABASE_URL", "postgresql://bench@localhost/bench")
+
+from starlette.requests import Request
+
+from app.services import sse
+from app.services.replay import Generation
+
+
+def make_request() -> Request:
+    """A real starlette Request whose client never disconnects."""
+    never = asyncio.Event()
+
+    async def receive():
+        receive.calls += 1
+        await never.wait()
+
+    receive.calls = 0
+    return Request({"type": "http", "method": "POST", "path": "/chat/stream", "headers": []}, receive)
+
+
+async def tokens(count: int, interval: float):
+    for i in range(count):
+        await asyncio.sleep(interval)
+        yield {"content": f"tok{i} "}
+
+
+async def before(request: Request, count: int, interval: float) -> int:
+    writes = 0
+    async for chunk in tokens(count, interval):
+        event = {
+            "role": "assistant",
+            "content": chunk["content"],
+            "timestamp": time.time(),
+            "final": False,
+        }
+        _ = f"data: {json.dumps(event)}\n\n".encode()
+        writes += 1
+        if await request.is_disconnected():
+            break
+    return writes
+
+
+async def after(request: Request, count: int, interval: float) -> int:
+    gen = Generation("bench", "bench", grace=10)
+
+    async def produce():
+        async for chunk in tokens(count, interval):
+            gen.publish(chunk["content"])
+        gen.finish()
+
+    producer = asyncio.create_task(produce())
+    writes = 0
+    async for _ in sse.stream_events(request, gen):
+        writes += 1
+    await producer
+    return writes
+
+
+async def measure(fn, count: int, interval: float) -> dict:
+    request = make_request()
+    cpu = time.process_time()
+    wall = time.perf_counter()
+    writes = await fn(request, count, interval)
+    cpu = time.process_time() - cpu
+    wall = time.perf_counter() - wall
+    return {
+        "cpu_us_per_token": round(cpu / count * 1e6, 2),
+        "writes_per_answer": writes,
+        "disconnect_polls": request.receive.calls,
+        "wall_s": round(wall, 3),
+    }
+
+
+async def run(count: int, interval_ms: float):
+    interval = interval_ms / 1000
+    print(f"tokens: {count}, token interval: {interval_ms} ms")
+    for name, fn in (("before", before), ("after", after)):
+        print(f"{name:>6}: {await measure(fn, count, interval)}")
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    interval_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+    asyncio.run(run(count, interval_ms))
@@ -0,0 +1,198 @@
+"""
+Throughput and memory benchmark for the NDJSON export/import in
+app/repo/transfer.py, on a synthetic history generated on the fly.
+
+Without --database-url it runs against an in-process connection that
+serves synthetic cursor rows and discards COPY batches. That measures
+the app side: parsing, validation, batching and serialization. With
+--database-url (and the id of an existing user, since conversations
+reference auth users) it imports into and exports from a real Postgres,
+then deletes what it imported.
+
+    python -m benchmarks.bench_transfer [--conversations 500] [--messages 200] [--chars 400] [--memory]
+    python -m benchmarks.bench_transfer --database-url postgresql://... --user-id <uuid>
+"""
+import argparse
+import asyncio
+import os
+import time
+import tracemalloc
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault("SUPABASE_URL", "https://bench.supabase.co")
+os.environ.setdefault("SUPABASE_ANON_KEY", "bench")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "bench")
+os.environ.setdefault("SUPABASE_JWT_SECRET", "bench-secret")
+os.environ.setdefault("DATABASE_URL", "postgresql://bench@localhost/bench")
+
+from app.config import settings
+from app.repo import transfer
+
+TITLE = "bench-transfer"
+TEXT = (
+    "I would put a token bucket per client in Redis, refill it lazily on each request and "
+    "shard the keys by client id so no single node sees all of the traffic. "
+)
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def synthetic_rows(conversations: int, messages: int, chars: int):
+    """("conversation" | "message", record) pairs, generated lazily."""
+    content = (TEXT * (chars // len(TEXT) + 1))[:chars]
+    conv_ids = [uuid.uuid4() for _ in range(conversations)]
+    for i, conv_id in enumerate(conv_ids):
+        at = EPOCH + timedelta(minutes=i)
+        yield "conversation", {
+            "id": conv_id, "title": TITLE, "domain": "backend", "summary": None,
+            "summarized_until": None, "created_at": at, "updated_at": at,
+        }
+    for i, conv_id in enumerate(conv_ids):
+        for j in range(messages):
+            yield "message", {
+                "id": uuid.uuid4(), "conversation_id": conv_id,
+                "role": "user" if j % 2 else "assistant", "content": content,
+                "token_count": None if j % 2 else chars // 4 + 1, "prompt_tokens": None if j % 2 else 900,
+                "latency_ms": None if j % 2 else 1200,
+                "created_at": EPOCH + timedelta(minutes=i, seconds=j),
+            }
+
+
+async def synthetic_body(conversations: int, messages: int, chars: int, chunk_bytes: int = 64 * 1024):
+    """An export file as an async stream of byte chunks, like request.stream()."""
+    buf = bytearray(transfer._line("export", {"version": transfer.FORMAT_VERSION}))
+    for kind, record in synthetic_rows(conversations, messages, chars):
+        buf += transfer._line(kind, record)
+        if len(buf) >= chunk_bytes:
+            yield bytes(buf)
+            buf.clear()
+    if buf:
+        yield bytes(buf)
+
+
+class DiscardingConnection:
+    """Enough of asyncpg.Connection for transfer.py: synthetic cursors, COPY into the void."""
+
+    def __init__(self, conversations: int, messages: int, chars: int):
+        self.shape = (conversations, messages, chars)
+        self.copied: dict[str, int] = {}
+
+    def transaction(self, **kwargs):
+        return _noop()
+
+    async def execute(self, query: str, *args):
+        if "insert into" in query:
+            table = "import_messages" if "into messages" in query else "import_conversations"
+            return f"INSERT 0 {self.copied.pop(table, 0)}"
+        if query.lstrip().startswith("update"):
+            return "UPDATE 0"
+        return "OK"
+
+    async def fetch(self, query: str, *args):
+        # Imported totals for the analytics rollups; nothing was stored
+        return []
+
+    async def copy_records_to_table(self, table: str, *, records, columns):
+        self.copied[table] = len(records)
+
+    async def cursor(self, query: str, *args, prefetch: int):
+        kind = "message" if "from messages" in query else "conversation"
+        for row_kind, record in synthetic_rows(*self.shape):
+            if row_kind == kind:
+                yield record
+
+
+class DiscardingPool:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def acquire(self):
+        return _noop(self.conn)
+
+
+@asynccontextmanager
+async def _noop(value=None):
+    yield value
+
+
+def report(name: str, rows: int, nbytes: int, seconds: float, peak: int | None):
+    line = (f"{name:>7}: {rows:>9,} rows  {nbytes / 1e6:8.1f} MB  {seconds:6.2f} s  "
+            f"{rows / seconds:>9,.0f} rows/s  {nbytes / 1e6 / seconds:6.1f} MB/s")
+    if peak is not None:
+        line += f"  peak Python memory {peak / 1e6:.1f} MB"
+    print(line)
+
+
+def peak_memory(trace: bool) -> int | None:
+    if not trace:
+        return None
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    return peak
+
+
+async def run(args):
+    rows = args.conversations * (args.messages + 1)
+    if args.database_url:
+        settings.DATABASE_URL = args.database_url
+        user_id = args.user_id
+    else:
+        conn = DiscardingConnection(args.conversations, args.messages, args.chars)
+        pool = DiscardingPool(conn)
+
+        async def get_pool():
+            return pool
+        transfer.get_pool = get_pool
+        user_id = str(uuid.uuid4())
+
+    # Tracing allocations slows Python down several times; it's a separate run
+    if args.memory:
+        tracemalloc.start()
+    sent = 0
+
+    async def counted():
+        nonlocal sent
+        async for chunk in synthetic_body(args.conversations, args.messages, args.chars):
+            sent += len(chunk)
+            yield chunk
+
+    start = time.perf_counter()
+    result = await transfer.import_ndjson(user_id, counted())
+    elapsed = time.perf_counter() - start
+    report("import", rows, sent, elapsed, peak_memory(args.memory))
+    if args.database_url:
+        print(f"         inserted {result['conversations']:,} conversations, {result['messages']:,} messages")
+
+    received = 0
+    start = time.perf_counter()
+    async for chunk in transfer.export_ndjson(user_id):
+        received += len(chunk)
+    elapsed = time.perf_counter() - start
+    report("export", rows, received, elapsed, peak_memory(args.memory))
+    if args.memory:
+        tracemalloc.stop()
+
+    if args.database_url:
+        from app.db import get_pool, close_pool
+        pool = await get_pool()
+        await pool.execute("delete from conversations where user_id = $1 and title = $2", user_id, TITLE)
+        await close_pool()
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--conversations", type=int, default=500)
+    p.add_argument("--messages", type=int, default=200, help="messages per conversation")
+    p.add_argument("--chars", type=int, default=400, help="characters per message")
+    p.add_argument("--memory", action="store_true", help="report peak traced Python memory (slower)")
+    p.add_argument("--database-url")
+    p.add_argument("--user-id", help="existing user to import into (required with --database-url)")
+    args = p.parse_args(argv)
+    if args.database_url and not args.user_id:
+        p.error("--user-id is required with --database-url")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+In-process stand-in for the asyncpg pool returned by app.db.get_pool. It
+answers the queries on the chat path (conversation lookup, history, message
+inserts, summaries) from dicts, with an optional per-query delay to model
+the network round trip to Postgres.
+"""
+import asyncio
+import uuid
+from datetime import datetime, timezone
+
+
+class FakePool:
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency = latency_ms / 1000
+        self.conversations: dict[uuid.UUID, dict] = {}
+        self.messages: dict[uuid.UUID, list[dict]] = {}
+        self.queries = 0
+
+    def add_conversation(self, user_id: str, domain: str = "backend") -> str:
+        conv_id = uuid.uuid4()
+        now = datetime.now(timezone.utc)
+        self.conversations[conv_id] = {
+            "id": conv_id, "user_id": uuid.UUID(user_id), "title": "Load test", "domain": domain,
+            "summary": None, "summarized_until": None, "created_at": now, "updated_at": now,
+        }
+        self.messages[conv_id] = []
+        return str(conv_id)
+
+    async def _roundtrip(self):
+        self.queries += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def _insert_message(self, conv_id, role, content, msg_id=None, created_at=None) -> dict:
+        row = {
+            "id": msg_id or uuid.uuid4(),
+            "role": role,
+            "content": content,
+            "created_at": created_at or datetime.now(timezone.utc),
+        }
+        self.messages[uuid.UUID(str(conv_id))].append(row)
+        return row
+
+    async def fetchrow(self, query: str, *args):
+        await self._roundtrip()
+        if "insert into messages" in query:
+            return self._insert_message(args[0], args[1], args[2])
+        if "from conversations" in query:
+            return self.conversations.get(args[0])
+        raise NotImplementedError(query)
+
+    async def fetch(self, query: str, *args):
+        await self._roundtrip()
+        if "distinct on" in query:  # list_openers
+            return []
+        if "from messages" in query and "order by created_at desc" in query:  # list_recent_messages
+            conv_id, since, limit = args
+            rows = [m for m in self.messages.get(uuid.UUID(str(conv_id)), [])
+                    if since is None or m["created_at"] > since]
+            return rows[-limit:]
+        if "from messages" in query and "created_at < $3" in query:  # list_messages_between
+            conv_id, since, before, limit = args
+            rows = [m for m in self.messages.get(uuid.UUID(str(conv_id)), [])
+                    if (since is None or m["created_at"] > since) and m["created_at"] < before]
+            return rows[:limit]
+        raise NotImplementedError(query)
+
+    async def execute(self, query: str, *args):
+        await self._roundtrip()
+        if "insert into messages" in query:  # write-behind fallback path
+            msg_id, conv_id, role, content, _, _, _, created_at = args
+            self._insert_message(conv_id, role, content, msg_id, created_at)
+        elif "update conversations" in query:
+            conv = self.conversations[args[0]]
+            conv["summary"], conv["summarized_until"] = args[1], args[2]
+        else:
+            raise NotImplementedError(query)
+        return "OK"
+
+    async def executemany(self, query: str, rows):
+        await self._roundtrip()
+        for msg_id, conv_id, role, content, _, _, _, created_at in rows:
+            self._insert_message(conv_id, role, content, msg_id, created_at)
+
+    def get_size(self):
+        return 1
+
+    def get_idle_size(self):
+        return 1
+
+    def get_max_size(self):
+        return 1
+
+    async def close(self):
+        pass
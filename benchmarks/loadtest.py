@@ -0,0 +1,241 @@
+"""
+End-to-end load test for /chat/stream -> stream_ollama -> msg_repo. Runs the
+app under uvicorn in this process, backed by the fake LLM provider and an
+in-process stand-in for Postgres (or the real DATABASE_URL with --real-db).
+Concurrent clients each hold one conversation and stream replies over SSE.
+
+Reports time to first token (p50/p95/p99), throughput, event-loop lag and
+memory per open stream, and writes everything to a JSON file so runs can be
+compared across commits:
+
+    python -m benchmarks.loadtest --clients 100 --turns 3 --out before.json
+    python -m benchmarks.loadtest --clients 100 --turns 3 --compare before.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import time
+import uuid
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--clients", type=int, default=50, help="concurrent SSE clients")
+    p.add_argument("--turns", type=int, default=3, help="messages each client sends")
+    p.add_argument("--first-token-ms", type=int, default=300, help="fake LLM time to first token")
+    p.add_argument("--token-ms", type=int, default=20, help="fake LLM delay between tokens")
+    p.add_argument("--jitter-ms", type=int, default=10, help="fake LLM +/- jitter per token")
+    p.add_argument("--reply-words", type=int, default=120, help="tokens per fake reply")
+    p.add_argument("--db-latency-ms", type=float, default=2.0, help="stand-in Postgres round trip")
+    p.add_argument("--llm-slots", type=int, default=None, help="override LLM_MAX_CONCURRENT")
+    p.add_argument("--real-db", action="store_true", help="use DATABASE_URL instead of the stand-in")
+    p.add_argument("--out", default="loadtest.json", help="where to write results")
+    p.add_argument("--compare", help="previous results file to diff against")
+    return p.parse_args(argv)
+
+
+def configure_env(args):
+    """Settings are read at import, so set them before importing the app."""
+    os.environ.setdefault("SUPABASE_URL", "https://bench.supabase.co")
+    os.environ.setdefault("SUPABASE_ANON_KEY", "bench")
+    os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "bench")
+    os.environ.setdefault("SUPABASE_JWT_SECRET", "bench-secret")
+    os.environ.setdefault("DATABASE_URL", "postgresql://bench@localhost/bench")
+    os.environ["LLM_PROVIDER"] = "fake"
+    os.environ["FAKE_LLM_FIRST_TOKEN_MS"] = str(args.first_token_ms)
+    os.environ["FAKE_LLM_CHUNK_MS"] = str(args.token_ms)
+    os.environ["FAKE_LLM_JITTER_MS"] = str(args.jitter_ms)
+    os.environ["FAKE_LLM_REPLY_WORDS"] = str(args.reply_words)
+    os.environ["QUESTION_BANK_ENABLED"] = "false"  # measure the model path every turn
+    os.environ["LLM_MAX_QUEUE"] = str(max(args.clients, 32))
+    if args.llm_slots is not None:
+        os.environ["LLM_MAX_CONCURRENT"] = str(args.llm_slots)
+
+
+def percentiles(values: list[float]) -> dict:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+    values = sorted(values)
+    pick = lambda q: round(values[min(len(values) - 1, int(len(values) * q))] * 1000, 2)
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": round(values[-1] * 1000, 2)}
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # Peak rather than current outside Linux, still fine for deltas
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Monitor:
+    """Samples event-loop lag, RSS and open streams while the test runs."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.lags: list[float] = []
+        self.peak_rss = 0
+        self.peak_streams = 0
+
+    async def run(self, streams_gauge):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, time.perf_counter() - start - self.interval))
+            self.peak_rss = max(self.peak_rss, rss_bytes())
+            self.peak_streams = max(self.peak_streams, int(streams_gauge.labels().value))
+
+
+async def client(http, token: str, conv_id: str, turns: int, stats: dict):
+    import orjson
+
+    headers = {"Authorization": f"Bearer {token}"}
+    for turn in range(turns):
+        body = {"conversation_id": conv_id, "user_message": f"Answer {turn}: I would start by profiling."}
+        start = time.perf_counter()
+        first = None
+        chars = 0
+        try:
+            async with http.stream("POST", "/chat/stream", json=body, headers=headers) as r:
+                if r.status_code != 200:
+                    stats["errors"][str(r.status_code)] = stats["errors"].get(str(r.status_code), 0) + 1
+                    await r.aread()
+                    continue
+                async for line in r.aiter_lines():
+                    if not line.startswith("data: "):
+                        continue
+                    data = line[6:]
+                    if data == "[DONE]":
+                        break
+                    event = orjson.loads(data)
+                    if event.get("error"):
+                        stats["errors"]["stream"] = stats["errors"].get("stream", 0) + 1
+                    elif event.get("content") and not event.get("final"):
+                        if first is None:
+                            first = time.perf_counter() - start
+                        chars += len(event["content"])
+        except Exception as e:
+            stats["errors"][type(e).__name__] = stats["errors"].get(type(e).__name__, 0) + 1
+            continue
+        if first is not None:
+            stats["ttft"].append(first)
+            stats["durations"].append(time.perf_counter() - start)
+            stats["chars"] += chars
+            stats["replies"] += 1
+
+
+async def run(args) -> dict:
+    import httpx
+    import uvicorn
+
+    from app import db
+    from app.config import settings
+    from app.main import app, limiter
+    from app.services import metrics
+    from benchmarks.bench_verify_token import mint_token
+    from benchmarks.fakepool import FakePool
+
+    limiter.enabled = False  # every client shares 127.0.0.1
+    users = [str(uuid.uuid4()) for _ in range(args.clients)]
+    if args.real_db:
+        from app.repo import conversations as conv_repo
+        convs = [(await conv_repo.create_conversation(u, "Load test", "backend"))["id"] for u in users]
+    else:
+        pool = FakePool(args.db_latency_ms)
+        db._pool = pool
+        convs = [pool.add_conversation(u) for u in users]
+    tokens = [mint_token(u) for u in users]
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+    serve = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    stats = {"ttft": [], "durations": [], "chars": 0, "replies": 0, "errors": {}}
+    monitor = Monitor()
+    baseline_rss = rss_bytes()
+    watcher = asyncio.create_task(monitor.run(metrics.SSE_STREAMS_IN_FLIGHT))
+
+    limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=120, limits=limits) as http:
+        start = time.perf_counter()
+        await asyncio.gather(*(client(http, t, c, args.turns, stats) for t, c in zip(tokens, convs)))
+        wall = time.perf_counter() - start
+
+    watcher.cancel()
+    server.should_exit = True
+    await serve
+
+    streams = max(monitor.peak_streams, 1)
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "compare")}
+                  | {"llm_max_concurrent": settings.LLM_MAX_CONCURRENT},
+        "ttft_ms": percentiles(stats["ttft"]),
+        "reply_ms": percentiles(stats["durations"]),
+        "loop_lag_ms": percentiles(monitor.lags),
+        "throughput": {
+            "wall_s": round(wall, 3),
+            "replies_per_s": round(stats["replies"] / wall, 2),
+            "chars_per_s": round(stats["chars"] / wall, 1),
+        },
+        "memory": {
+            "baseline_rss_mb": round(baseline_rss / 2**20, 1),
+            "peak_rss_mb": round(monitor.peak_rss / 2**20, 1),
+            "peak_streams": monitor.peak_streams,
+            "kb_per_stream": round(max(monitor.peak_rss - baseline_rss, 0) / streams / 1024, 1),
+        },
+        "replies": stats["replies"],
+        "errors": stats["errors"],
+    }
+
+
+def compare(current: dict, previous: dict):
+    """Print metric changes against an earlier run (lower is better except throughput)."""
+    print(f"\ncompared with {previous.get('commit')} ({previous.get('timestamp')}):")
+    for section in ("ttft_ms", "reply_ms", "loop_lag_ms", "throughput", "memory"):
+        for key, now in current[section].items():
+            before = previous.get(section, {}).get(key)
+            if isinstance(now, (int, float)) and isinstance(before, (int, float)) and before:
+                change = (now - before) / before * 100
+                print(f"  {section}.{key}: {before} -> {now} ({change:+.1f}%)")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    configure_env(args)
+    results = asyncio.run(run(args))
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Cold-start report: imports app.main in a fresh interpreter with
+`-X importtime` and breaks the import cost down per module, both for the
+app's own modules and per top-level third-party package.
+
+    python -m benchmarks.startup_report [--top 15] [--json out.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+BENCH_ENV = {
+    "SUPABASE_URL": "https://bench.supabase.co",
+    "SUPABASE_ANON_KEY": "bench",
+    "SUPABASE_SERVICE_ROLE_KEY": "bench",
+    "SUPABASE_JWT_SECRET": "bench-secret",
+    "DATABASE_URL": "postgresql://bench@localhost/bench",
+}
+
+
+def measure(target: str) -> tuple[list[tuple[str, int, int]], float]:
+    """(module, self_us, cumulative_us) rows and wall-clock seconds for one import."""
+    env = {**BENCH_ENV, **os.environ}
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    wall = time.perf_counter() - start
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows, wall
+
+
+def report(target: str, rows: list[tuple[str, int, int]], wall: float, top: int) -> dict:
+    by_package: dict[str, int] = defaultdict(int)
+    for name, self_us, _ in rows:
+        by_package[name.split(".")[0]] += self_us
+    app_modules = sorted(
+        ((name, cumulative) for name, _, cumulative in rows if name.split(".")[0] == "app"),
+        key=lambda r: -r[1],
+    )
+    total = next((cumulative for name, _, cumulative in rows if name == target), 0)
+    return {
+        "process_wall_ms": round(wall * 1000, 1),
+        "import_ms": round(total / 1000, 1),
+        "app_modules_cumulative_ms": {n: round(c / 1000, 1) for n, c in app_modules[:top]},
+        "packages_self_ms": {
+            n: round(c / 1000, 1) for n, c in sorted(by_package.items(), key=lambda r: -r[1])[:top]
+        },
+    }
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--target", default="app.main")
+    p.add_argument("--top", type=int, default=15)
+    p.add_argument("--json", help="also write the report to this file")
+    args = p.parse_args(argv)
+
+    rows, wall = measure(args.target)
+    result = report(args.target, rows, wall, args.top)
+
+    print(f"import {args.target}: {result['import_ms']} ms "
+          f"(process wall {result['process_wall_ms']} ms)")
+    print("\napp modules (cumulative):")
+    for name, ms in result["app_modules_cumulative_ms"].items():
+        print(f"  {ms:8.1f} ms  {name}")
+    print("\npackages (self time):")
+    for name, ms in result["packages_self_ms"].items():
+        print(f"  {ms:8.1f} ms  {name}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
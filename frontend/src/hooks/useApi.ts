@@ -22,6 +22,25 @@ const getAuthHeaders = async () => {
   }
 };
 
+// Follows X-Next-Cursor headers and concatenates every page of a listing
+const fetchAllPages = async <T,>(url: string, headers: HeadersInit): Promise<T[] | null> => {
+  const items: T[] = [];
+  let cursor: string | null = null;
+
+  do {
+    const pageUrl = cursor
+      ? `${url}${url.includes('?') ? '&' : '?'}cursor=${encodeURIComponent(cursor)}`
+      : url;
+    const response = await fetch(pageUrl, { headers });
+    if (!response.ok) return null;
+
+    items.push(...(await response.json()));
+    cursor = response.headers.get('X-Next-Cursor');
+  } while (cursor);
+
+  return items;
+};
+
 // ------------------- Types -------------------
 export interface Conversation {
   id: string;
@@ -47,12 +66,12 @@ export const useConversations = () => {
     try {
       setLoading(true);
       const headers = await getAuthHeaders();
-      const response = await fetch(`${API_BASE_URL}/conversations`, {
-        headers,
-      });
+      const data = await fetchAllPages<Conversation>(
+        `${API_BASE_URL}/conversations`,
+        headers
+      );
 
-      if (response.ok) {
-        const data = await response.json();
+      if (data) {
         setConversations(data);
       }
     } catch (error) {
@@ -150,12 +169,12 @@ export const useMessages = (chatId: string) => {
     try {
       setLoading(true);
       const headers = await getAuthHeaders();
-      const response = await fetch(`${API_BASE_URL}/messages/${chatId}`, {
-        headers,
-      });
+      const data = await fetchAllPages<Message>(
+        `${API_BASE_URL}/messages/${chatId}`,
+        headers
+      );
 
-      if (response.ok) {
-        const data = await response.json();
+      if (data) {
         const messagesWithTimestamps = data.map((msg: Message) => ({
           ...msg,
           id: `server-${msg.id}`, // mark backend messages
@@ -195,75 +214,96 @@ export const useMessages = (chatId: string) => {
 };
 
 // ------------------- Chat Streaming -------------------
+// Reconnects after a dropped stream resume from the last event id instead
+// of starting a new answer. 'expired' means the server no longer has the
+// stream (410): reload the conversation, which has the reply once stored.
+const MAX_STREAM_RESUMES = 3;
+
+export type ChatStreamResult = 'done' | 'failed' | 'expired';
+
 export const sendChatMessage = async (
   chatId: string,
   message: string,
   onChunk?: (chunk: string, isFinal?: boolean) => void,
   onProgress?: (progress: number) => void
-): Promise<boolean> => {
-  try {
-    const headers = await getAuthHeaders();
-    const response = await fetch(`${API_BASE_URL}/chat/stream`, {
-      method: 'POST',
-      headers,
-      body: JSON.stringify({
-        conversation_id: chatId,
-        user_message: message,
-      }),
-    });
+): Promise<ChatStreamResult> => {
+  let lastEventId: string | null = null;
+  let totalReceived = 0;
 
-    if (!response.ok) return false;
+  for (let attempt = 0; attempt <= MAX_STREAM_RESUMES; attempt++) {
+    try {
+      const headers: Record<string, string> = await getAuthHeaders();
+      if (lastEventId) headers['Last-Event-ID'] = lastEventId;
+
+      const response = await fetch(`${API_BASE_URL}/chat/stream`, {
+        method: 'POST',
+        headers,
+        body: JSON.stringify({
+          conversation_id: chatId,
+          user_message: message,
+        }),
+      });
+
+      if (!response.ok) {
+        // A resume that reached another worker, or came too late
+        return response.status === 410 && lastEventId ? 'expired' : 'failed';
+      }
 
-    if (onChunk && response.body) {
-      const reader = response.body.getReader();
-      const decoder = new TextDecoder();
-      let buffer = '';
-      let totalReceived = 0;
-
-      try {
-        while (true) {
-          const { done, value } = await reader.read();
-
-          if (value) {
-            const chunk = decoder.decode(value, { stream: true });
-            buffer += chunk;
-            totalReceived += value.length;
-
-            if (onProgress) onProgress(totalReceived);
-
-            const lines = buffer.split('\n');
-            buffer = lines.pop() || '';
-
-            for (const line of lines) {
-              const trimmed = line.trim();
-              if (trimmed.startsWith('data: ') && trimmed !== 'data: [DONE]') {
-                const content = trimmed.substring(6);
-                if (content.trim()) {
-                  try {
-                    const parsed = JSON.parse(content);
-                    if (parsed.content) {
-                      onChunk(parsed.content, parsed.final || false);
+      if (onChunk && response.body) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        try {
+          while (true) {
+            const { done, value } = await reader.read();
+
+            if (value) {
+              const chunk = decoder.decode(value, { stream: true });
+              buffer += chunk;
+              totalReceived += value.length;
+
+              if (onProgress) onProgress(totalReceived);
+
+              const lines = buffer.split('\n');
+              buffer = lines.pop() || '';
+
+              for (const line of lines) {
+                const trimmed = line.trim();
+                if (trimmed.startsWith('id: ')) {
+                  lastEventId = trimmed.substring(4);
+                } else if (trimmed.startsWith('data: ') && trimmed !== 'data: [DONE]') {
+                  const content = trimmed.substring(6);
+                  if (content.trim()) {
+                    try {
+                      const parsed = JSON.parse(content);
+                      if (parsed.error) return 'failed';
+                      if (parsed.content) {
+                        onChunk(parsed.content, parsed.final || false);
+                      }
+                    } catch {
+                      onChunk(content, false);
                     }
-                  } catch {
-                    onChunk(content, false);
                   }
                 }
               }
             }
-          }
 
-          if (done) break;
+            if (done) break;
+          }
+        } finally {
+          reader.releaseLock();
         }
-      } finally {
-        reader.releaseLock();
       }
-    }
 
-    return true;
-  } catch (error) {
-    console.error('Failed to send message:', error);
-    return false;
+      return 'done';
+    } catch (error) {
+      console.error('Failed to send message:', error);
+      // Nothing to resume from: the request never reached the stream
+      if (!lastEventId) return 'failed';
+    }
   }
+  return 'failed';
 };
 
 // ------------------- User Profile & Auth -------------------
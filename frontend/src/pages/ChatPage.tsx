@@ -19,7 +19,7 @@ const ChatPage = () => {
   const scrollAreaRef = useRef<HTMLDivElement>(null);
   const inputRef = useRef<HTMLInputElement>(null);
 
-  const { messages, loading, setMessages } = useMessages(chatId || '');
+  const { messages, loading, setMessages, refetch } = useMessages(chatId || '');
 
   useEffect(() => {
     if (scrollAreaRef.current) {
@@ -62,7 +62,7 @@ const ChatPage = () => {
 
     let fullResponse = '';
 
-    const success = await sendChatMessage(
+    const result = await sendChatMessage(
       chatId,
       userMessage.content,
       (chunk, isFinal) => {
@@ -93,7 +93,13 @@ const ChatPage = () => {
       }
     );
 
-    if (!success) {
+    if (result === 'expired') {
+      // The stream is gone but the turn was stored; show the server's copy
+      setMessages((prev) =>
+        prev.filter((msg) => msg.id !== userMessage.id && msg.id !== assistantMessageId)
+      );
+      await refetch();
+    } else if (result === 'failed') {
       setMessages((prev) => prev.filter((msg) => msg.id !== assistantMessageId));
     }
 
@@ -0,0 +1,5 @@
+-- Rolling summary of turns that no longer fit the chat context budget.
+-- summarized_until is the created_at of the newest message folded into summary.
+alter table conversations
+    add column if not exists summary text,
+    add column if not exists summarized_until timestamptz;
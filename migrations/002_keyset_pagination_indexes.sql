@@ -0,0 +1,7 @@
+-- Composite indexes backing keyset pagination on /messages and /conversations.
+-- Run outside a transaction (psql -f does this by default).
+create index concurrently if not exists messages_conversation_created_id_idx
+    on messages (conversation_id, created_at, id);
+
+create index concurrently if not exists conversations_user_updated_id_idx
+    on conversations (user_id, updated_at desc, id desc);
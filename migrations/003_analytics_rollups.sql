@@ -0,0 +1,100 @@
+-- Incrementally maintained interview analytics (see app/repo/analytics.py).
+-- Latency histograms use the bucket bounds in LATENCY_BOUNDS_MS:
+-- bucket i counts replies with width_bucket(latency_ms, bounds) = i.
+
+create or replace function int_array_add(a int[], b int[]) returns int[]
+language sql immutable as $$
+    select coalesce(array_agg(coalesce(x, 0) + coalesce(y, 0) order by i), '{}')
+    from unnest(a, b) with ordinality as t(x, y, i)
+$$;
+
+create or replace aggregate int_array_sum(int[]) (
+    sfunc = int_array_add,
+    stype = int[],
+    initcond = '{}'
+);
+
+-- One row per conversation; goes away with the conversation.
+create table if not exists conversation_stats (
+    conversation_id uuid primary key references conversations(id) on delete cascade,
+    user_id uuid not null,
+    domain text,
+    user_turns int not null default 0,
+    assistant_turns int not null default 0,
+    user_chars bigint not null default 0,
+    assistant_chars bigint not null default 0,
+    user_tokens bigint not null default 0,
+    assistant_tokens bigint not null default 0,
+    latency_count int not null default 0,
+    latency_sum_ms bigint not null default 0,
+    latency_hist int[] not null default '{}',
+    first_message_at timestamptz,
+    last_message_at timestamptz
+);
+
+-- One row per user and domain; keeps counting practice from deleted conversations.
+create table if not exists user_domain_stats (
+    user_id uuid not null,
+    domain text not null,
+    conversations int not null default 0,
+    user_turns int not null default 0,
+    assistant_turns int not null default 0,
+    user_chars bigint not null default 0,
+    assistant_chars bigint not null default 0,
+    user_tokens bigint not null default 0,
+    assistant_tokens bigint not null default 0,
+    latency_count int not null default 0,
+    latency_sum_ms bigint not null default 0,
+    latency_hist int[] not null default '{}',
+    session_seconds double precision not null default 0,
+    primary key (user_id, domain)
+);
+
+-- One-time backfill from existing messages; later changes arrive incrementally.
+insert into conversation_stats (
+    conversation_id, user_id, domain,
+    user_turns, assistant_turns, user_chars, assistant_chars, user_tokens, assistant_tokens,
+    latency_count, latency_sum_ms, latency_hist, first_message_at, last_message_at
+)
+select
+    c.id, c.user_id, coalesce(c.domain, 'general'),
+    count(*) filter (where m.role = 'user'),
+    count(*) filter (where m.role = 'assistant'),
+    coalesce(sum(length(m.content)) filter (where m.role = 'user'), 0),
+    coalesce(sum(length(m.content)) filter (where m.role = 'assistant'), 0),
+    coalesce(sum(coalesce(m.token_count, length(m.content) / 4 + 1)) filter (where m.role = 'user'), 0),
+    coalesce(sum(coalesce(m.token_count, length(m.content) / 4 + 1)) filter (where m.role = 'assistant'), 0),
+    count(m.latency_ms),
+    coalesce(sum(m.latency_ms), 0),
+    (
+        select array_agg(count_in_bucket order by b)
+        from (
+            select b, (
+                select count(*)::int from messages h
+                where h.conversation_id = c.id and h.latency_ms is not null
+                  and width_bucket(h.latency_ms, array[250, 500, 1000, 2000, 3000, 5000, 8000, 13000, 20000, 30000, 60000]) = b
+            ) as count_in_bucket
+            from generate_series(0, 11) b
+        ) buckets
+    ),
+    min(m.created_at),
+    max(m.created_at)
+from conversations c
+join messages m on m.conversation_id = c.id
+group by c.id
+on conflict (conversation_id) do nothing;
+
+insert into user_domain_stats (
+    user_id, domain, conversations,
+    user_turns, assistant_turns, user_chars, assistant_chars, user_tokens, assistant_tokens,
+    latency_count, latency_sum_ms, latency_hist, session_seconds
+)
+select
+    user_id, domain, count(*),
+    sum(user_turns), sum(assistant_turns), sum(user_chars), sum(assistant_chars),
+    sum(user_tokens), sum(assistant_tokens),
+    sum(latency_count), sum(latency_sum_ms), int_array_sum(latency_hist),
+    coalesce(sum(extract(epoch from last_message_at - first_message_at)), 0)
+from conversation_stats
+group by user_id, domain
+on conflict (user_id, domain) do nothing;
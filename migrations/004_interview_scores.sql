@@ -0,0 +1,29 @@
+-- End-of-interview evaluations, scored in the background (see app/services/evaluator.py).
+-- One row per conversation: it is both the job (status, attempts) and its result.
+
+create table if not exists interview_scores (
+    conversation_id uuid primary key references conversations(id) on delete cascade,
+    user_id uuid not null,
+    status text not null default 'queued'
+        check (status in ('queued', 'running', 'done', 'failed', 'skipped')),
+    reason text,                  -- what queued it: 'finished' or 'idle'
+    attempts int not null default 0,
+    run_after timestamptz not null default now(),  -- retry backoff
+    error text,
+    score smallint check (score between 1 and 10),
+    summary text,
+    strengths text[],
+    improvements text[],
+    scored_until timestamptz,     -- created_at of the last message the score covers
+    created_at timestamptz not null default now(),
+    updated_at timestamptz not null default now(),
+    finished_at timestamptz
+);
+
+-- The recovery sweep only looks at unfinished rows
+create index if not exists interview_scores_pending_idx
+    on interview_scores (status, run_after) where status in ('queued', 'running');
+
+-- Idle sweep: conversations whose last message is in a recent window
+create index if not exists conversation_stats_last_message_idx
+    on conversation_stats (last_message_at);
@@ -0,0 +1,9 @@
+-- Full-text search over message content (GET /search).
+-- Adding a stored generated column rewrites messages once; run it in a quiet window.
+alter table messages
+    add column if not exists search tsvector
+    generated always as (to_tsvector('english', coalesce(content, ''))) stored;
+
+-- Separate step so the index build doesn't block writes; run outside a transaction.
+create index concurrently if not exists messages_search_idx
+    on messages using gin (search);
@@ -0,0 +1,20 @@
+-- Provider-reported token usage (see app/repo/usage.py).
+-- messages.token_count holds provider-reported completion tokens for
+-- assistant replies (NULL when none were reported); the prompt that
+-- produced a reply is billed separately.
+alter table messages
+    add column if not exists prompt_tokens int;
+
+-- Daily counters per user and domain, flushed from memory in batches.
+create table if not exists token_usage (
+    user_id uuid not null,
+    day date not null,
+    domain text not null,
+    requests int not null default 0,
+    prompt_tokens bigint not null default 0,
+    completion_tokens bigint not null default 0,
+    primary key (user_id, day, domain)
+);
+
+-- Billing reports: who spent what on a given day
+create index if not exists token_usage_day_idx on token_usage (day);
@@ -3,4 +3,7 @@ import uvicorn
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8000))  # Render sets $PORT
-    uvicorn.run("app.main:app", host="0.0.0.0", port=port, workers=1)
+    # WEB_CONCURRENCY workers share DB_MAX_CONNECTIONS and the rate-limit store;
+    # per-process caches that can't be kept coherent across them are off
+    workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+    uvicorn.run("app.main:app", host="0.0.0.0", port=port, workers=workers)
@@ -0,0 +1,46 @@
+import os
+
+import pytest
+
+# Settings are read at import time; the suite never reaches these services
+os.environ.setdefault("SUPABASE_URL", "https://test.supabase.co")
+os.environ.setdefault("SUPABASE_ANON_KEY", "test")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "test")
+os.environ.setdefault("SUPABASE_JWT_SECRET", "test-secret")
+os.environ.setdefault("DATABASE_URL", "postgresql://test@localhost/test")
+
+from app.config import settings  # noqa: E402
+from app.services import fake_llm  # noqa: E402
+from app.services.breaker import llm_breaker  # noqa: E402
+
+
+@pytest.fixture
+def fake_provider(monkeypatch):
+    """Fast, deterministic fake provider; `script` lists outcomes per call."""
+    for key, value in {
+        "LLM_PROVIDER": "fake",
+        "FAKE_LLM_FIRST_TOKEN_MS": 1,
+        "FAKE_LLM_CHUNK_MS": 0,
+        "FAKE_LLM_FAILURE_RATE": 0.5,
+        "FAKE_LLM_STALL_RATE": 0.5,
+        "LLM_FIRST_TOKEN_TIMEOUT": 5.0,
+        "LLM_HEDGE_AFTER": None,
+        "LLM_RETRIES": 0,
+        "LLM_RETRY_BACKOFF": 0.0,
+    }.items():
+        monkeypatch.setattr(settings, key, value)
+
+    script: list[str] = []
+    rolls: list[float] = []
+
+    def random():
+        if not rolls:
+            outcome = script.pop(0) if script else "ok"
+            # fake_llm rolls for failure, then for a stall
+            rolls.extend({"fail": [0.0], "stall": [0.9, 0.0], "ok": [0.9, 0.9]}[outcome])
+        return rolls.pop(0)
+
+    monkeypatch.setattr(fake_llm.random, "random", random)
+    llm_breaker.success()
+    yield script
+    llm_breaker.success()
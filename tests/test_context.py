@@ -0,0 +1,86 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.config import settings
+from app.repo import conversations as conv_repo, messages as msg_repo
+from app.repo.usage import usage_meter
+from app.services import context, fake_llm
+from app.services.breaker import llm_breaker
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def turns(first: int, count: int) -> list[dict]:
+    return [
+        {"id": str(i), "role": "user" if i % 2 else "assistant", "content": f"turn {i}",
+         "timestamp": (START + timedelta(minutes=i)).isoformat()}
+        for i in range(first, first + count)
+    ]
+
+
+@pytest.fixture
+def stored(fake_provider, monkeypatch):
+    """Rows the database holds beyond the window, and the summaries written."""
+    rows: list[dict] = []
+    writes: list[tuple] = []
+
+    async def list_messages_between(conv_id, since, before, limit=100):
+        return [r for r in rows
+                if (since is None or datetime.fromisoformat(r["timestamp"]) > since)
+                and datetime.fromisoformat(r["timestamp"]) < before][:limit]
+
+    async def update_summary(conv_id, summary, until):
+        writes.append((summary, until))
+
+    monkeypatch.setattr(msg_repo, "list_messages_between", list_messages_between)
+    monkeypatch.setattr(conv_repo, "update_summary", update_summary)
+    monkeypatch.setattr(usage_meter, "record", lambda *args: None)
+    return rows, writes
+
+
+def fold(summarized_until=None, overflow=None):
+    overflow = turns(10, 2) if overflow is None else overflow
+    return asyncio.run(context.fold_into_summary("conv", "user", "backend", None, summarized_until, overflow))
+
+
+def test_fold_includes_turns_older_than_the_window(stored):
+    rows, writes = stored
+    rows.extend(turns(0, 10))
+
+    summary, until = fold(summarized_until=START + timedelta(minutes=3))
+    assert summary == fake_llm.SUMMARY
+    assert until == START + timedelta(minutes=11)
+    assert writes == [(summary, until)]
+
+
+def test_fold_stops_at_the_last_turn_it_summarized(stored, monkeypatch):
+    rows, writes = stored
+    rows.extend(turns(0, 10))
+    monkeypatch.setattr(settings, "CONTEXT_MAX_MESSAGES", 4)
+
+    _, until = fold()
+    # Overflow waits for a later fold
+    assert until == START + timedelta(minutes=3)
+
+
+def test_hung_summary_times_out_and_frees_the_conversation(stored, monkeypatch):
+    _, writes = stored
+    monkeypatch.setattr(settings, "FAKE_LLM_FIRST_TOKEN_MS", 10_000)
+    monkeypatch.setattr(settings, "SUMMARY_TIMEOUT", 0.05)
+
+    assert fold() is None
+    assert "conv" not in context._folding
+    assert writes == []
+    assert llm_breaker.failures == 1
+
+
+def test_open_circuit_skips_the_fold(stored, monkeypatch):
+    _, writes = stored
+    monkeypatch.setattr(llm_breaker, "threshold", 1)
+    llm_breaker.failure()
+
+    assert fold() is None
+    assert "conv" not in context._folding
+    assert writes == []
@@ -0,0 +1,34 @@
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from app.services import interview_ws
+from app.services.interview_ws import InterviewSession
+
+STORED_AT = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def test_fold_waits_for_turns_to_get_their_stored_timestamps(monkeypatch):
+    folded = []
+
+    async def add_message(conv_id, role, content, **fields):
+        await asyncio.sleep(0.02)
+        if content == "lost":
+            raise ConnectionError("insert failed")
+        return {"id": content, "role": role, "content": content, "timestamp": STORED_AT.isoformat()}
+
+    async def fold_into_summary(conv_id, user_id, domain, summary, summarized_until, overflow):
+        folded.append([(m["id"], m["timestamp"]) for m in overflow])
+
+    monkeypatch.setattr(interview_ws.msg_repo, "add_message", add_message)
+    monkeypatch.setattr(interview_ws, "fold_into_summary", fold_into_summary)
+    conv = SimpleNamespace(domain="backend", summary=None, summarized_until=None, messages=[], complete=True)
+
+    async def run():
+        session = InterviewSession(None, "user", "conv", None, conv)
+        overflow = [session._record("user", "answer"), session._record("assistant", "lost")]
+        session._fold(overflow)
+        await asyncio.sleep(0.2)
+
+    asyncio.run(run())
+    assert folded == [[("answer", STORED_AT.isoformat())]]
@@ -0,0 +1,215 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from google.api_core import exceptions as api_exceptions
+
+from app.config import settings
+from app.services import breaker, chat, fake_llm
+from app.services.breaker import CircuitBreaker, CircuitOpen, llm_breaker
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(breaker.time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def attempts(monkeypatch):
+    """Every upstream call _first_item starts, in order."""
+    started = []
+
+    class Recorded(chat._Attempt):
+        def __init__(self, messages):
+            super().__init__(messages)
+            started.append(self)
+
+    monkeypatch.setattr(chat, "_Attempt", Recorded)
+    return started
+
+
+MESSAGES = [{"role": "system", "content": "Interviewer"}, {"role": "user", "content": "I'm ready."}]
+
+
+async def collect(messages=MESSAGES) -> list[dict]:
+    return [chunk async for chunk in chat.stream_ollama(messages)]
+
+
+# ---------------- CircuitBreaker ----------------
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    cb = CircuitBreaker(threshold=3, cooldown=30)
+    cb.failure()
+    cb.failure()
+    cb.allow()
+    assert cb.state == "closed"
+
+    cb.failure()
+    assert cb.state == "open"
+    clock.now += 10
+    with pytest.raises(CircuitOpen) as e:
+        cb.allow()
+    assert e.value.retry_after == 20
+    assert cb.rejected == 1
+
+
+def test_breaker_success_resets_failure_count(clock):
+    cb = CircuitBreaker(threshold=2, cooldown=30)
+    cb.failure()
+    cb.success()
+    cb.failure()
+    assert cb.state == "closed"
+
+
+def test_breaker_half_open_lets_one_trial_through(clock):
+    cb = CircuitBreaker(threshold=1, cooldown=30)
+    cb.failure()
+    clock.now += 30
+
+    cb.allow()
+    assert cb.state == "half_open"
+    with pytest.raises(CircuitOpen):
+        cb.allow()
+
+    cb.success()
+    assert cb.state == "closed"
+    cb.allow()
+
+
+def test_breaker_failed_trial_reopens(clock):
+    cb = CircuitBreaker(threshold=5, cooldown=30)
+    for _ in range(5):
+        cb.failure()
+    clock.now += 30
+    cb.allow()
+
+    cb.failure()  # one failure is enough while half open
+    assert cb.state == "open"
+    clock.now += 29
+    with pytest.raises(CircuitOpen):
+        cb.allow()
+
+
+def test_breaker_abandoned_trial_does_not_block_forever(clock):
+    cb = CircuitBreaker(threshold=1, cooldown=30)
+    cb.failure()
+    clock.now += 30
+    cb.allow()  # trial never reports back
+
+    clock.now += 30
+    cb.allow()
+    assert cb.state == "half_open"
+
+
+# ---------------- _first_item ----------------
+
+def test_first_item_returns_first_chunk(fake_provider, attempts):
+    async def run():
+        stream, item = await chat._first_item(MESSAGES)
+        stream.cancel()
+        return item
+
+    assert asyncio.run(run()) == fake_llm.REPLY.split(" ")[0] + " "
+    assert len(attempts) == 1
+
+
+def test_first_item_hedges_a_silent_call_and_cancels_the_loser(fake_provider, attempts):
+    settings.LLM_HEDGE_AFTER = 0.05
+    fake_provider.extend(["stall", "ok"])
+
+    async def run():
+        stream, item = await chat._first_item(MESSAGES)
+        stream.cancel()
+        await asyncio.sleep(0)
+        return stream, item
+
+    stream, item = asyncio.run(run())
+    assert item == fake_llm.REPLY.split(" ")[0] + " "
+    assert len(attempts) == 2
+    assert stream is attempts[1]
+    assert attempts[0].reader.cancelled()
+
+
+def test_first_item_no_hedge_when_first_call_answers(fake_provider, attempts):
+    settings.LLM_HEDGE_AFTER = 0.5
+
+    async def run():
+        stream, _ = await chat._first_item(MESSAGES)
+        stream.cancel()
+
+    asyncio.run(run())
+    assert len(attempts) == 1
+
+
+def test_first_item_times_out_and_cancels_every_call(fake_provider, attempts):
+    settings.LLM_FIRST_TOKEN_TIMEOUT = 0.1
+    settings.LLM_HEDGE_AFTER = 0.02
+    fake_provider.extend(["stall", "stall"])
+
+    async def run():
+        with pytest.raises(asyncio.TimeoutError):
+            await chat._first_item(MESSAGES)
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert len(attempts) == 2
+    assert all(a.reader.cancelled() for a in attempts)
+
+
+def test_first_item_raises_when_every_call_fails(fake_provider, attempts):
+    fake_provider.append("fail")
+
+    with pytest.raises(api_exceptions.ServiceUnavailable):
+        asyncio.run(chat._first_item(MESSAGES))
+
+
+# ---------------- retries and the breaker on the stream ----------------
+
+def test_failure_before_first_chunk_is_retried(fake_provider, attempts):
+    settings.LLM_RETRIES = 1
+    fake_provider.extend(["fail", "ok"])
+
+    chunks = asyncio.run(collect())
+    assert "".join(c["content"] for c in chunks) == fake_llm.REPLY
+    assert chunks[-1]["usage"]["completion_tokens"] > 0
+    assert len(attempts) == 2
+    assert llm_breaker.state == "closed" and llm_breaker.failures == 0
+
+
+def test_retries_exhausted_surfaces_502(fake_provider, attempts):
+    settings.LLM_RETRIES = 1
+    fake_provider.extend(["fail", "fail"])
+
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(collect())
+    assert e.value.status_code == 502
+    assert len(attempts) == 2
+
+
+def test_open_circuit_fails_fast_without_calling_the_provider(fake_provider, attempts, monkeypatch):
+    monkeypatch.setattr(llm_breaker, "threshold", 2)
+    fake_provider.extend(["fail", "fail"])
+
+    async def run():
+        for _ in range(2):
+            with pytest.raises(HTTPException) as e:
+                await collect()
+            assert e.value.status_code == 502
+        with pytest.raises(HTTPException) as e:
+            await collect()
+        return e.value
+
+    error = asyncio.run(run())
+    assert error.status_code == 503
+    assert int(error.headers["Retry-After"]) >= 1
+    assert len(attempts) == 2
@@ -0,0 +1,21 @@
+from datetime import datetime, timedelta, timezone
+
+from app.repo.pagination import decode_cursor, encode_cursor, format_timestamp, paginate
+
+
+def test_timestamps_are_utc_with_every_microsecond_digit():
+    # Postgres' to_char(... 'US') pads the fraction; isoformat() would drop it
+    local = datetime(2026, 1, 1, 12, 30, tzinfo=timezone(timedelta(hours=2)))
+    assert format_timestamp(local) == "2026-01-01T10:30:00.000000+00:00"
+    assert format_timestamp(local.replace(microsecond=120000)) == "2026-01-01T10:30:00.120000+00:00"
+
+
+def test_cache_pages_carry_a_cursor_the_database_path_accepts():
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    rows = [{"id": f"00000000-0000-0000-0000-00000000000{i}", "timestamp": format_timestamp(start + timedelta(seconds=i))}
+            for i in range(3)]
+
+    page, cursor = paginate(rows, 2, "timestamp")
+    assert page == rows[:2]
+    assert cursor == encode_cursor(rows[1]["timestamp"], rows[1]["id"])
+    assert decode_cursor(cursor)[0] == start + timedelta(seconds=1)
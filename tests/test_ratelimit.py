@@ -0,0 +1,98 @@
+import sqlite3
+import time
+
+import pytest
+from limits import parse, storage as limits_storage, strategies
+
+from app import ratelimit
+from app.config import settings
+from app.ratelimit import SQLiteStorage, storage_uri
+
+
+@pytest.fixture
+def uri(tmp_path):
+    return f"sqlite://{tmp_path / 'ratelimit.db'}"
+
+
+def wait_until(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_workers_share_counters(uri):
+    one, two = SQLiteStorage(uri), SQLiteStorage(uri)
+    assert one.incr("k", 60) == 1
+    assert two.incr("k", 60) == 2
+    assert one.incr("k", 60, amount=3) == 5
+    assert two.get("k") == 5
+    assert one.get("other") == 0
+
+
+def test_fixed_window_limit_applies_across_workers(uri):
+    workers = [strategies.FixedWindowRateLimiter(limits_storage.storage_from_string(uri)) for _ in range(2)]
+    limit = parse("3/minute")
+    hits = [workers[i % 2].hit(limit, "ws-turn", "user") for i in range(5)]
+    assert hits == [True, True, True, False, False]
+    assert workers[0].hit(limit, "ws-turn", "someone-else")
+
+
+def test_expired_window_restarts(uri, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ratelimit.time, "time", lambda: now[0])
+    storage = SQLiteStorage(uri)
+    storage.incr("k", 60)
+    storage.incr("k", 60)
+    assert storage.get_expiry("k") == 1060
+
+    now[0] += 60
+    assert storage.get("k") == 0
+    assert storage.incr("k", 60) == 1
+    assert storage.get_expiry("k") == 1120
+
+
+def test_locked_file_queues_hits_instead_of_blocking(uri):
+    storage = SQLiteStorage(uri)
+    storage.incr("k", 60)
+
+    # Another worker mid-write
+    other = sqlite3.connect(uri.split("://", 1)[1], isolation_level=None)
+    other.execute("begin immediate")
+    try:
+        started = time.monotonic()
+        assert storage.incr("k", 60) == 2
+        assert storage.incr("k", 60, amount=2) == 4
+        assert storage.get("k") == 4
+        assert time.monotonic() - started < 0.5
+    finally:
+        other.execute("commit")
+
+    # The background thread writes the queued hits once the lock is free
+    wait_until(lambda: not storage._pending and not storage._inflight)
+    assert other.execute("select value from counters where key='k'").fetchone() == (4,)
+    assert storage.get("k") == 4
+    assert SQLiteStorage(uri).get("k") == 4
+    other.close()
+
+
+def test_clear_and_reset(uri):
+    storage = SQLiteStorage(uri)
+    storage.incr("a", 60)
+    storage.incr("b", 60)
+    storage.clear("a")
+    assert storage.get("a") == 0 and storage.get("b") == 1
+    storage.reset()
+    assert storage.get("b") == 0
+
+
+def test_storage_uri_defaults_to_the_shared_file_with_several_workers(monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_STORAGE_URI", None)
+    monkeypatch.setattr(settings, "WEB_CONCURRENCY", 1)
+    assert storage_uri() == "memory://"
+
+    monkeypatch.setattr(settings, "WEB_CONCURRENCY", 4)
+    assert storage_uri().startswith("sqlite://")
+
+    monkeypatch.setattr(settings, "RATE_LIMIT_STORAGE_URI", "redis://cache:6379")
+    assert storage_uri() == "redis://cache:6379"
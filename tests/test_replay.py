@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+
+from app.config import settings
+from app.services import chat, replay
+from app.services.replay import ReplayBuffer
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(replay.time, "monotonic", lambda: now[0])
+    return now
+
+
+async def produce(gen):
+    """Publish a fake-provider reply into `gen`, the way generate_reply does."""
+    try:
+        async for chunk in chat.stream_ollama([{"role": "user", "content": "I'm ready."}]):
+            if chunk["content"]:
+                gen.publish(chunk["content"])
+        gen.publish(b"[DONE]")
+    finally:
+        gen.finish()
+
+
+def test_find_resolves_last_event_id():
+    buffer = ReplayBuffer(max_generations=4, ttl=60, grace=1)
+    gen = buffer.start("Conv-1", "user")
+    gen.publish("a")
+
+    assert buffer.find("conv-1", gen.event_id(0)) == (gen, 0)
+    assert buffer.find("conv-1", "other:0") is None
+    assert buffer.find("conv-1", f"{gen.id}:x") is None
+    assert buffer.find("conv-2", gen.event_id(0)) is None
+
+
+def test_new_generation_replaces_the_conversations_previous_one():
+    buffer = ReplayBuffer(max_generations=4, ttl=60, grace=1)
+    old = buffer.start("conv", "user")
+    new = buffer.start("conv", "user")
+    assert buffer.find("conv", old.event_id(0)) is None
+    assert buffer.find("conv", new.event_id(0)) == (new, 0)
+
+
+def test_finished_generations_expire_after_ttl(clock):
+    buffer = ReplayBuffer(max_generations=4, ttl=60, grace=1)
+    done = buffer.start("done", "user")
+    done.finish()
+    running = buffer.start("running", "user")
+
+    clock[0] += 60
+    assert buffer.find("done", done.event_id(0)) is not None
+    clock[0] += 1
+    assert buffer.find("done", done.event_id(0)) is None
+    # Only finished generations expire
+    assert buffer.find("running", running.event_id(0)) is not None
+
+
+def test_over_capacity_drops_oldest_finished_first(clock):
+    buffer = ReplayBuffer(max_generations=2, ttl=60, grace=1)
+    running = buffer.start("running", "user")
+    first = buffer.start("first", "user")
+    first.finish()
+    second = buffer.start("second", "user")
+    second.finish()
+    third = buffer.start("third", "user")
+
+    assert buffer.find("running", running.event_id(0)) is not None
+    assert buffer.find("first", first.event_id(0)) is None
+    assert buffer.find("second", second.event_id(0)) is None
+    assert buffer.find("third", third.event_id(0)) is not None
+
+
+def test_detached_generation_is_cancelled_after_grace(fake_provider, monkeypatch):
+    monkeypatch.setattr(settings, "FAKE_LLM_CHUNK_MS", 50)
+
+    async def run():
+        gen = ReplayBuffer(max_generations=4, ttl=60, grace=0.05).start("conv", "user")
+        gen.task = asyncio.create_task(produce(gen))
+        gen.attach()
+        await asyncio.sleep(0.02)
+        gen.detach()
+        await asyncio.wait([gen.task], timeout=1)
+        return gen
+
+    gen = asyncio.run(run())
+    assert gen.task.cancelled()
+    assert gen.done and b"[DONE]" not in gen.events
+
+
+def test_resume_within_grace_keeps_the_generation(fake_provider):
+    async def run():
+        gen = ReplayBuffer(max_generations=4, ttl=60, grace=0.05).start("conv", "user")
+        gen.task = asyncio.create_task(produce(gen))
+        gen.attach()
+        gen.detach()
+        await asyncio.sleep(0.01)
+        gen.attach()  # client reconnected with Last-Event-ID
+        await asyncio.wait([gen.task], timeout=1)
+        return gen
+
+    gen = asyncio.run(run())
+    assert not gen.task.cancelled()
+    assert gen.events[-1] == b"[DONE]"
+
+
+def test_wait_wakes_on_publish_and_times_out():
+    async def run():
+        gen = ReplayBuffer(max_generations=4, ttl=60, grace=1).start("conv", "user")
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.01, gen.publish, "a")
+        started = loop.time()
+        await gen.wait(5)
+        woke = loop.time() - started
+        started = loop.time()
+        await gen.wait(0.02)
+        return woke, loop.time() - started
+
+    woke, timed_out = asyncio.run(run())
+    assert woke < 1
+    assert 0.01 < timed_out < 1
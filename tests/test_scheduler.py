@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+
+from app.config import settings
+from app.repo.usage import usage_meter
+from app.services import reply
+from app.services.scheduler import LLMScheduler, QueueFull
+
+
+def granted(tickets) -> list[str]:
+    return [t.user_id for t in tickets if t.granted]
+
+
+def test_reserve_grants_free_slots_then_queues():
+    s = LLMScheduler(max_concurrent=2, max_queue=1, retry_after=7)
+    a, b = s.reserve("a"), s.reserve("b")
+    c = s.reserve("c")
+    assert a.granted and b.granted and not c.granted
+    assert s.stats() == {"active": 2, "queued": 1, "users_waiting": 1}
+
+    with pytest.raises(QueueFull) as e:
+        s.reserve("d")
+    assert e.value.retry_after == 7
+
+
+def test_free_slots_go_round_robin_across_users():
+    s = LLMScheduler(max_concurrent=1, max_queue=10, retry_after=1)
+    running = s.reserve("a")
+    waiting = [s.reserve(u) for u in ("a", "a", "a", "b", "c")]
+
+    order = []
+    for _ in waiting:
+        s.release(running)
+        (running,) = [t for t in waiting if t.granted and not t.released]
+        order.append(running)
+    assert [waiting.index(t) for t in order] == [0, 3, 4, 1, 2]
+
+
+def test_position_matches_the_order_slots_are_handed_out():
+    s = LLMScheduler(max_concurrent=1, max_queue=10, retry_after=1)
+    running = s.reserve("x")
+    a1, a2, b1, a3, c1 = (s.reserve(u) for u in ("a", "a", "b", "a", "c"))
+
+    assert s.position(running) == 0
+    # Served a1, b1, c1, a2, a3
+    assert [s.position(t) for t in (a1, b1, c1, a2, a3)] == [0, 1, 2, 3, 4]
+
+    s.release(b1)  # gave up while waiting
+    assert [s.position(t) for t in (a1, c1, a2, a3)] == [0, 1, 2, 3]
+
+
+def test_new_caller_does_not_jump_the_queue():
+    s = LLMScheduler(max_concurrent=1, max_queue=10, retry_after=1)
+    running = s.reserve("a")
+    waiting = s.reserve("b")
+    s.release(running)
+    late = s.reserve("c")
+    assert waiting.granted and not late.granted
+
+
+def test_release_is_idempotent():
+    s = LLMScheduler(max_concurrent=1, max_queue=10, retry_after=1)
+    running = s.reserve("a")
+    b, c = s.reserve("b"), s.reserve("c")
+
+    s.release(running)
+    s.release(running)
+    assert granted([b, c]) == ["b"]
+    assert s.stats() == {"active": 1, "queued": 1, "users_waiting": 1}
+
+    s.release(c)
+    s.release(c)
+    assert s.stats() == {"active": 1, "queued": 0, "users_waiting": 0}
+
+    s.release(b)
+    s.release(b)
+    assert s.stats() == {"active": 0, "queued": 0, "users_waiting": 0}
+
+
+def test_run_reply_waits_for_a_slot_and_reports_its_position(fake_provider, monkeypatch):
+    monkeypatch.setattr(reply, "llm_scheduler", LLMScheduler(max_concurrent=1, max_queue=4, retry_after=1))
+    monkeypatch.setattr(usage_meter, "record", lambda *args: None)
+    monkeypatch.setattr(settings, "LLM_QUEUE_POSITION_INTERVAL", 0.001)
+    monkeypatch.setattr(settings, "FAKE_LLM_FIRST_TOKEN_MS", 20)
+    messages = [{"role": "user", "content": "I'm ready."}]
+
+    async def one(user_id: str):
+        positions, chunks = [], []
+
+        async def queued(position):
+            positions.append(position)
+
+        async def chunk(text):
+            chunks.append(text)
+
+        ticket = await reply.admit(user_id)
+        stored = await reply.run_reply(ticket, messages, user_id, None, queued, chunk, lambda text, fields: text)
+        return positions, "".join(chunks), stored
+
+    async def run():
+        return await asyncio.gather(one("a"), one("b"))
+
+    (first_positions, first, _), (second_positions, second, stored) = asyncio.run(run())
+    assert first_positions == [] and set(second_positions) == {1}
+    assert first == second == stored
+    assert reply.llm_scheduler.stats() == {"active": 0, "queued": 0, "users_waiting": 0}
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.config import settings
+from app.repo import usage
+from app.repo.usage import UsageMeter
+
+
+@pytest.fixture
+def meter(monkeypatch):
+    """UsageMeter whose database totals come from `meter.stored`, without a flusher."""
+    meter = UsageMeter(flush_seconds=60, max_users=2)
+    meter.stored = {}
+    meter.loads = []
+
+    async def used_on_day(user_ids, day):
+        meter.loads.extend(user_ids)
+        return {u: meter.stored.get(u, 0) for u in user_ids}
+
+    monkeypatch.setattr(usage, "_used_on_day", used_on_day)
+    monkeypatch.setattr(meter, "_started", lambda: None)
+    monkeypatch.setattr(settings, "USAGE_DAILY_TOKEN_QUOTA", 1000)
+    return meter
+
+
+def test_quota_counts_loaded_and_recorded_usage(meter):
+    meter.stored["a"] = 900
+
+    async def run():
+        await meter.check("A")
+        meter.record("a", "backend", 60, 40)
+        with pytest.raises(HTTPException) as e:
+            await meter.check("a")
+        return e.value
+
+    error = asyncio.run(run())
+    assert error.status_code == 429
+    assert int(error.headers["Retry-After"]) >= 1
+    assert meter.loads == ["a"]
+    assert meter.used_today("a") == 1000
+
+
+def test_active_users_stay_cached_over_idle_ones(meter):
+    async def run():
+        await meter.check("a")
+        await meter.check("b")
+        # "a" keeps taking turns while "b" goes quiet
+        meter.record("a", None, 1, 1)
+        await meter.check("a")
+        await meter.check("c")
+        await meter.check("a")
+
+    asyncio.run(run())
+    assert meter.loads == ["a", "b", "c"]
+    assert meter.used_today("b") is None
+    assert meter.used_today("a") == 2
+
+
+def test_quota_check_keeps_a_user_cached(meter):
+    async def run():
+        await meter.check("a")
+        await meter.check("b")
+        await meter.check("a")
+        await meter.check("c")
+
+    asyncio.run(run())
+    assert meter.used_today("a") == 0
+    assert meter.used_today("b") is None
@@ -0,0 +1,78 @@
+import asyncio
+import uuid
+
+import pytest
+
+from app.config import settings
+from app.repo import messages as msg_repo, writer
+from app.repo.analytics import analytics_rollup
+from app.repo.cache import history_cache
+from app.repo.writer import MessageWriter
+
+
+class Pool:
+    """Accepts inserts except those for conversations in `missing`."""
+
+    def __init__(self):
+        self.missing: set[str] = set()
+        self.rows: list[tuple] = []
+
+    async def executemany(self, query, rows):
+        if any(str(r[1]) in self.missing for r in rows):
+            raise ConnectionError("batch failed")
+        self.rows.extend(rows)
+
+    async def execute(self, query, *row):
+        if str(row[1]) in self.missing:
+            raise ValueError("conversation deleted")
+        self.rows.append(row)
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = Pool()
+    pool.recorded = []
+
+    async def get_pool():
+        return pool
+
+    monkeypatch.setattr(writer, "get_pool", get_pool)
+    real_sleep = asyncio.sleep
+    monkeypatch.setattr(writer.asyncio, "sleep", lambda _: real_sleep(0))  # no retry backoff
+    monkeypatch.setattr(analytics_rollup, "record", lambda *args: pool.recorded.append(args))
+    monkeypatch.setattr(settings, "MESSAGE_WRITE_BEHIND", True)
+    return pool
+
+
+def write(pool, monkeypatch, *messages):
+    """add_message each (conv_id, role, content[, token_count]) through a fresh writer, then flush it."""
+    async def run():
+        message_writer = MessageWriter(batch_size=10, flush_ms=5)
+        monkeypatch.setattr(msg_repo, "message_writer", message_writer)
+        for m in messages:
+            await msg_repo.add_message(*m)
+        assert pool.recorded == []  # nothing counted before the rows exist
+        await message_writer.close()
+
+    asyncio.run(run())
+
+
+def test_analytics_counts_rows_once_they_are_stored(pool, monkeypatch):
+    conv = str(uuid.uuid4())
+    write(pool, monkeypatch, (conv, "user", "hello there"), (conv, "assistant", "Hi!", 3))
+
+    assert len(pool.rows) == 2
+    assert [(r[0], r[1], r[3]) for r in pool.recorded] == [(conv, "user", 3), (conv, "assistant", 3)]
+
+
+def test_dropped_rows_are_not_counted_and_leave_the_cache(pool, monkeypatch):
+    good, gone = str(uuid.uuid4()), str(uuid.uuid4())
+    pool.missing.add(gone)
+    evicted = []
+    monkeypatch.setattr(history_cache, "evict", evicted.append)
+
+    write(pool, monkeypatch, (good, "user", "answer"), (gone, "user", "lost"))
+
+    assert [r[1] for r in pool.rows] == [good]
+    assert [r[0] for r in pool.recorded] == [good]
+    assert evicted == [gone]